@@ -2,7 +2,8 @@
 from abc import ABC, abstractmethod
 from typing import Union
 import os
-from langfuse import Langfuse
+from clients.langfuse import langfuse
+from tools.registry import ToolRegistry
 
 
 class FactCheckingAgentBaseClass(ABC):
@@ -10,22 +11,21 @@ class FactCheckingAgentBaseClass(ABC):
     def __init__(
         self,
         client,
-        tool_list: list,
+        tool_registry: ToolRegistry,
         temperature: float = 0.0,
     ):
-        """Initializes the FactCheckingAgentBaseClass with a list of tools.
+        """Initializes the FactCheckingAgentBaseClass with a registry of tools.
 
-        Each tool should be a dictionary with two keys "function" and "definition".
-
-        The former will hold the function itself, and the latter an openAPI specification dictionary
+        Agents hold no per-request state, so a single instance can be built at startup
+        and shared across requests. Per-request state lives in an AgentRunContext.
         """
         self.client = client
-        self.function_definitions = [tool["definition"] for tool in tool_list]
-        self.function_dict = {
-            tool["definition"]["name"]: tool["function"] for tool in tool_list
-        }
+        self.tool_registry = tool_registry
+        self.include_planning_step = tool_registry.include_planning_step
+        self.fuse_planning = tool_registry.fuse_planning
+        self.function_definitions = tool_registry.definitions
+        self.function_dict = tool_registry.functions
         self.temperature = temperature
-        self.langfuse = Langfuse()
         super().__init__()
 
     @abstractmethod
@@ -50,6 +50,7 @@ class FactCheckingAgentBaseClass(ABC):
         text: Union[str, None] = None,
         image_url: Union[str, None] = None,
         caption: Union[str, None] = None,
+        bilingual: bool = False,
     ):
         """This is a placeholder method that must be implemented by subclasses:
 
@@ -60,6 +61,8 @@ class FactCheckingAgentBaseClass(ABC):
             text: The text content of the report (required if data_type is "text").
             image_url: The URL of the image (required if data_type is "image").
             caption: An optional caption for the image.
+            bilingual: Whether to also produce the Simplified Chinese note in the same
+                summarisation call, returned as community_note_cn if successful.
 
         Returns:
             A dictionary representing the report.
@@ -67,7 +70,7 @@ class FactCheckingAgentBaseClass(ABC):
         pass
 
     async def get_system_prompt(self):
-        prompt = self.langfuse.get_prompt(
+        prompt = langfuse.get_prompt(
             "agent_system_prompt", label=os.getenv("ENVIRONMENT")
         )
         return prompt
@@ -0,0 +1,227 @@
+# /agents/compaction.py
+# Shrinks the conversation history sent to the model between agent turns.
+# The full history is still kept (and stored) as the agent trace; only the
+# copy sent to the model is compacted.
+import json
+import os
+from dataclasses import dataclass
+from typing import List
+from google.genai import types
+
+REFLECTIVE_FUNCTIONS = ("plan_next_step", "infer_intent")
+SEARCH_RESULT_FIELDS = ("title", "link", "snippet")
+COLLAPSED_REFLECTION = {"status": "noted"}
+SCREENSHOT_PREFIX = "Here is the screenshot for "
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """Configures how the agent history is compacted between turns.
+
+    Attributes:
+        enabled: Whether to compact at all.
+        keep_screenshot_turns: Number of model turns a screenshot stays in context
+            before being replaced by a short textual placeholder.
+        keep_search_turns: Number of model turns search results are sent in full
+            before being trimmed to title, link and snippet.
+        collapse_planning: Whether to collapse the echoed responses of
+            plan_next_step and infer_intent once the model has moved on.
+    """
+
+    enabled: bool = True
+    keep_screenshot_turns: int = 2
+    keep_search_turns: int = 1
+    collapse_planning: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CompactionPolicy":
+        return cls(
+            enabled=_env_flag("AGENT_COMPACTION_ENABLED", True),
+            keep_screenshot_turns=int(
+                os.getenv("AGENT_COMPACTION_SCREENSHOT_TURNS", 2)
+            ),
+            keep_search_turns=int(os.getenv("AGENT_COMPACTION_SEARCH_TURNS", 1)),
+            collapse_planning=_env_flag("AGENT_COMPACTION_COLLAPSE_PLANNING", True),
+        )
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() == "true"
+
+
+def _screenshot_placeholder(url: str = None) -> str:
+    target = f"of {url} " if url else ""
+    return f"<Screenshot {target}was shown in an earlier turn and has been removed to save context>"
+
+
+def trim_search_results(results):
+    """Keeps only the title, link and snippet of each search result."""
+    if not isinstance(results, list):
+        return results
+    return [
+        (
+            {key: item[key] for key in SEARCH_RESULT_FIELDS if key in item}
+            if isinstance(item, dict)
+            else item
+        )
+        for item in results
+    ]
+
+
+def _message_turns(messages: List, model_role: str) -> List[int]:
+    """Returns, for each message, the number of model turns that precede it."""
+    turn = 0
+    turns = []
+    for message in messages:
+        role = message.get("role") if isinstance(message, dict) else message.role
+        if role == model_role:
+            turn += 1
+        turns.append(turn)
+    return turns
+
+
+def compact_openai_messages(
+    messages: List[dict], policy: CompactionPolicy
+) -> List[dict]:
+    """Returns a compacted copy of an OpenAI-style message history.
+
+    Messages that are not compacted are passed through as-is, and the input list is
+    never mutated.
+
+    Args:
+        messages: The message history, as kept by the OpenAIAgent.
+        policy: The compaction policy to apply.
+
+    Returns:
+        The list of messages to send to the model.
+    """
+    if not policy.enabled:
+        return messages
+    turns = _message_turns(messages, "assistant")
+    current_turn = turns[-1] if turns else 0
+    tool_call_names = {}
+    compacted = []
+    for message, message_turn in zip(messages, turns):
+        age = current_turn - message_turn
+        role = message.get("role")
+        if role == "assistant":
+            for tool_call in message.get("tool_calls") or []:
+                tool_call_names[tool_call["id"]] = tool_call["function"]["name"]
+            compacted.append(message)
+        elif role == "tool":
+            compacted.append(
+                _compact_openai_tool_message(
+                    message,
+                    tool_call_names.get(message.get("tool_call_id")),
+                    age,
+                    policy,
+                )
+            )
+        elif (
+            role == "user"
+            and message_turn > 0  # never touch the content sent in for checking
+            and age >= policy.keep_screenshot_turns
+            and isinstance(message.get("content"), list)
+        ):
+            compacted.append(_compact_openai_screenshot_message(message))
+        else:
+            compacted.append(message)
+    return compacted
+
+
+def _compact_openai_tool_message(
+    message: dict, function_name: str, age: int, policy: CompactionPolicy
+) -> dict:
+    if function_name in REFLECTIVE_FUNCTIONS and policy.collapse_planning and age >= 1:
+        return {**message, "content": json.dumps(COLLAPSED_REFLECTION)}
+    if function_name == "search_google" and age >= policy.keep_search_turns:
+        try:
+            results = json.loads(message.get("content"))
+        except (TypeError, ValueError):
+            return message
+        if isinstance(results, dict):  # with skippedQueries
+            results = {**results, "result": trim_search_results(results.get("result"))}
+        else:
+            results = trim_search_results(results)
+        return {**message, "content": json.dumps(results)}
+    return message
+
+
+def _compact_openai_screenshot_message(message: dict) -> dict:
+    url = None
+    for part in message["content"]:
+        text = part.get("text") or ""
+        if part.get("type") == "text" and text.startswith(SCREENSHOT_PREFIX):
+            url = text[len(SCREENSHOT_PREFIX) :].split(" returned by ")[0]
+    content = [
+        (
+            {"type": "text", "text": _screenshot_placeholder(url)}
+            if part.get("type") == "image_url"
+            else part
+        )
+        for part in message["content"]
+    ]
+    return {**message, "content": content}
+
+
+def compact_gemini_contents(
+    contents: List[types.Content], policy: CompactionPolicy
+) -> List[types.Content]:
+    """Returns a compacted copy of a Gemini content history.
+
+    Contents that are not compacted are passed through as-is, and the input list is
+    never mutated.
+
+    Args:
+        contents: The content history, as kept by the GeminiAgent.
+        policy: The compaction policy to apply.
+
+    Returns:
+        The list of contents to send to the model.
+    """
+    if not policy.enabled:
+        return contents
+    turns = _message_turns(contents, "model")
+    current_turn = turns[-1] if turns else 0
+    compacted = []
+    for content, content_turn in zip(contents, turns):
+        age = current_turn - content_turn
+        if content.role != "user" or content_turn == 0:
+            compacted.append(content)
+            continue
+        parts = [_compact_gemini_part(part, age, policy) for part in content.parts]
+        if all(new is old for new, old in zip(parts, content.parts)):
+            compacted.append(content)
+        else:
+            compacted.append(content.model_copy(update={"parts": parts}))
+    return compacted
+
+
+def _compact_gemini_part(
+    part: types.Part, age: int, policy: CompactionPolicy
+) -> types.Part:
+    if part.inline_data is not None or part.file_data is not None:
+        if age >= policy.keep_screenshot_turns:
+            return types.Part.from_text(_screenshot_placeholder())
+        return part
+    function_response = part.function_response
+    if function_response is None:
+        return part
+    if (
+        function_response.name in REFLECTIVE_FUNCTIONS
+        and policy.collapse_planning
+        and age >= 1
+    ):
+        return types.Part.from_function_response(
+            name=function_response.name, response={"result": COLLAPSED_REFLECTION}
+        )
+    if function_response.name == "search_google" and age >= policy.keep_search_turns:
+        response = function_response.response or {}
+        return types.Part.from_function_response(
+            name=function_response.name,
+            response={
+                **response,
+                "result": trim_search_results(response.get("result")),
+            },
+        )
+    return part
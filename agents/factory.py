@@ -0,0 +1,49 @@
+# /agents/factory.py
+# Builds the agents used by get_outputs. Agents are shared across requests, so they
+# are created once per provider and planning configuration.
+import functools
+from clients.gemini import gemini_client
+from clients.openai import get_openai_client
+from logger import StructuredLogger
+from models import SupportedModelProvider
+from tools.registry import get_tool_registry
+from .gemini_agent import GeminiAgent
+from .openai_agent import OpenAIAgent
+
+logger = StructuredLogger("agent_factory")
+
+AGENT_MODELS = {
+    SupportedModelProvider.GEMINI: "gemini-2.0-flash-exp",
+    SupportedModelProvider.OPENAI: "gpt-4o",
+    SupportedModelProvider.DEEPSEEK: "deepseek-chat",
+    SupportedModelProvider.GROQ: "llama-3.3-70b-versatile",
+}
+PLANNING_CONFIGURATIONS = ((False, False), (True, False), (True, True))
+
+
+@functools.lru_cache(maxsize=None)
+def get_agent(
+    provider: SupportedModelProvider, include_planning_step: bool, fuse_planning: bool
+):
+    """Returns the shared agent for the given provider and planning configuration.
+
+    Agents, their clients and their tool registries are built once and reused across
+    requests. Per-request state is kept in the AgentRunContext created by each run.
+    """
+    tool_registry = get_tool_registry(include_planning_step, fuse_planning)
+    model = AGENT_MODELS[provider]
+    if provider == SupportedModelProvider.GEMINI:
+        return GeminiAgent(gemini_client, tool_registry, model=model, temperature=0.2)
+    return OpenAIAgent(
+        get_openai_client(provider), tool_registry, model=model, temperature=0.0
+    )
+
+
+def warm_up_agents():
+    """Builds every agent ahead of the first request, skipping unconfigured providers."""
+    for provider in SupportedModelProvider:
+        try:
+            for include_planning_step, fuse_planning in PLANNING_CONFIGURATIONS:
+                get_agent(provider, include_planning_step, fuse_planning)
+        except Exception as e:
+            logger.warn("Could not build agent", provider=provider.value, error=str(e))
@@ -1,20 +1,26 @@
 # /agents/gemini_agent.py:
 
 from .abstract import FactCheckingAgentBaseClass
+from .compaction import CompactionPolicy, compact_gemini_contents
 from typing import Union, List
 from google.genai import types
-from utils.gemini_utils import get_image_part, generate_image_parts, generate_text_parts
+from utils.gemini_utils import (
+    load_image_parts,
+    generate_image_parts,
+    generate_text_parts,
+)
 import asyncio
 import time
 from tools import summarise_report_factory
 import json
 from logger import StructuredLogger
+from metrics import AGENT_TURNS, TOOL_CALL_LATENCY, track_latency
 from langfuse.decorators import observe, langfuse_context
-from langfuse import Langfuse
+from tools.registry import ToolRegistry
+from .run_context import AgentRunContext
 from datetime import datetime
 
 logger = StructuredLogger("gemini_agent")
-langfuse = Langfuse()
 
 
 class GeminiAgent(FactCheckingAgentBaseClass):
@@ -22,41 +28,23 @@ class GeminiAgent(FactCheckingAgentBaseClass):
     def __init__(
         self,
         client,
-        tool_list: list,
-        include_planning_step: bool = True,
+        tool_registry: ToolRegistry,
+        model: str = "gemini-2.0-flash-exp",
         temperature: float = 0.2,
         max_searches: int = 5,
         max_screenshots: int = 5,
+        compaction_policy: CompactionPolicy = None,
     ):
-        """Initializes the FactCheckingAgentBaseClass with a list of tools.
+        """Initializes the GeminiAgent with a registry of tools.
 
-        Each tool should be a dictionary with two keys "function" and "definition".
-
-        The former will hold the function itself, and the latter an openAPI specification dictionary
+        The registry determines whether and how the agent plans between steps.
         """
-        self.include_planning_step = include_planning_step
-        if not self.include_planning_step:
-            tool_list = [
-                tool
-                for tool in tool_list
-                if tool["function"].__name__ != "plan_next_step"
-            ]
-        super().__init__(client, tool_list, temperature)
-        self.function_tool = types.Tool(function_declarations=self.function_definitions)
-        self.search_count = 0
-        self.screenshot_count = 0
+        super().__init__(client, tool_registry, temperature)
+        self.function_tool = tool_registry.gemini_tool
         self.max_searches = max_searches
         self.max_screenshots = max_screenshots
-
-    # getter for remaining screnshots
-    @property
-    def remaining_screenshots(self):
-        return self.max_screenshots - self.screenshot_count
-
-    # getter for remaining searches
-    @property
-    def remaining_searches(self):
-        return self.max_searches - self.search_count
+        self.compaction_policy = compaction_policy or CompactionPolicy.from_env()
+        self.model = model
 
     @staticmethod
     def flatten_and_organise(
@@ -149,7 +137,7 @@ class GeminiAgent(FactCheckingAgentBaseClass):
         return responses
 
     async def call_function(
-        self, function_call: types.FunctionCall
+        self, function_call: types.FunctionCall, run_context: AgentRunContext
     ) -> Union[types.Part, List[types.Part]]:
         """
         Calls a function from the provided function dictionary based on the function call details.
@@ -157,6 +145,7 @@ class GeminiAgent(FactCheckingAgentBaseClass):
         Args:
             function_dict (Dict[str, Callable[..., Any]]): A dictionary mapping function names to their corresponding callables.
             function_call (types.FunctionCall): An object containing the name of the function to call and its arguments.
+            run_context (AgentRunContext): The state of the current run, whose counters are updated.
 
         Returns:
             Union[types.Part, List[types.Part]]: A single Part or a list of Parts containing the function response.
@@ -171,11 +160,37 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             f"Calling function {function_call.name}",
         )
         function_name = function_call.name
-        function_args = function_call.args
+        function_args = dict(function_call.args or {})
+        plan = function_args.pop("plan", None)  # only present when planning is fused
+        if plan is not None:
+            child_logger.info("Plan for this step", plan=plan)
+        if function_name == "search_google":
+            # every query counts as a search, so only run those left in the budget
+            # and tell the model which were skipped
+            queries = [function_args.get("q"), *(function_args.get("queries") or [])]
+            allowed = run_context.take_searches(queries)
+            function_args = {
+                "queries": allowed,
+                "skipped_queries": [
+                    query
+                    for query in dict.fromkeys(queries)
+                    if query and query not in allowed
+                ],
+            }
+        tool_kwargs = {}
+        if function_name == "submit_report_for_review":
+            tool_kwargs["pre_review"] = run_context.pre_review_allowed
         try:
-            result = await self.function_dict[function_name](**function_args)
+            with track_latency(TOOL_CALL_LATENCY, tool=function_name) as labels:
+                result = await self.function_dict[function_name](
+                    **function_args, **tool_kwargs
+                )
+                if not isinstance(result, dict) or result.get("success") is False:
+                    labels["outcome"] = "error"
+            if isinstance(result, dict) and result.get("reviewer") == "rules":
+                run_context.pre_review_rejections += 1
             if function_call.name == "get_website_screenshot":
-                self.screenshot_count += 1
+                run_context.screenshot_count += 1
                 if not result["success"] or result.get("result") is None:
                     child_logger.warn("Screenshot API failed")
                     return types.Part().from_function_response(
@@ -191,27 +206,28 @@ class GeminiAgent(FactCheckingAgentBaseClass):
                                 "result": "Screenshot successfully taken and will be subsequently appended."
                             },
                         ),
-                        get_image_part(
-                            result["result"],
-                        ),
+                        *await load_image_parts(result["result"]),
                     ]
             else:
-                if function_call.name == "search_google":
-                    self.search_count += 1
                 if result.get("result") is None or result.get("success") is False:
                     child_logger.warn(f"Issue with tool call {function_call.name}")
                 else:
                     child_logger.info(
                         f"Function {function_call.name} executed successfully"
                     )
-                return types.Part().from_function_response(
-                    name=function_call.name,
-                    response={
-                        "result": result.get(
-                            "result",
+                response = {
+                    "result": result.get(
+                        "result",
+                        result.get(
+                            "error",
                             f"function {function_call.name} encountered an error",
                         ),
-                    },
+                    ),
+                }
+                if result.get("skippedQueries"):
+                    response["skippedQueries"] = result["skippedQueries"]
+                return types.Part().from_function_response(
+                    name=function_call.name, response=response
                 )
         except Exception as exc:
             child_logger.error(
@@ -226,10 +242,11 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             )
 
     @observe(name="generate_report_agent_gemini")
-    async def generate_report(self, starting_parts):
+    async def generate_report(self, starting_parts, run_context: AgentRunContext):
         """Generates a report based on the provided starting parts.
         args:
             starting_parts: The starting parts of the report.
+            run_context: The state of the current run.
         returns:
             A dictionary representing the report.
         """
@@ -246,19 +263,19 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             while len(messages) < 50 and not completed:
                 system_prompt = prompt.compile(
                     datetime=current_datetime.strftime("%d %b %Y"),
-                    remaining_searches=self.remaining_searches,
-                    remaining_screenshots=self.remaining_screenshots,
+                    remaining_searches=run_context.remaining_searches,
+                    remaining_screenshots=run_context.remaining_screenshots,
                 )
                 if first_step:
                     available_functions = ["infer_intent"]
                     think = False
-                elif think and self.include_planning_step:
+                elif think and self.include_planning_step and not self.fuse_planning:
                     available_functions = ["plan_next_step"]
                 else:
                     banned_functions = ["plan_next_step", "infer_intent"]
-                    if self.remaining_searches == 0:
+                    if run_context.remaining_searches == 0:
                         banned_functions.append("search_google")
-                    if self.remaining_screenshots == 0:
+                    if run_context.remaining_screenshots == 0:
                         banned_functions.append("get_website_screenshot")
 
                     available_functions = [
@@ -273,8 +290,8 @@ class GeminiAgent(FactCheckingAgentBaseClass):
                     )
                 )
                 response = self.client.models.generate_content(
-                    model="gemini-2.0-flash-exp",
-                    contents=messages,
+                    model=self.model,
+                    contents=compact_gemini_contents(messages, self.compaction_policy),
                     config=types.GenerateContentConfig(
                         tools=[self.function_tool],
                         system_instruction=system_prompt,
@@ -291,9 +308,13 @@ class GeminiAgent(FactCheckingAgentBaseClass):
                 for part in response.candidates[0].content.parts:
                     if fn := part.function_call:
                         if fn.name == "submit_report_for_review":
-                            return_dict = fn.args
+                            return_dict = {
+                                key: value
+                                for key, value in fn.args.items()
+                                if key != "plan"
+                            }
 
-                        function_call_promise = self.call_function(fn)
+                        function_call_promise = self.call_function(fn, run_context)
                         function_call_promises.append(function_call_promise)
                     else:
                         messages.append(
@@ -347,6 +368,10 @@ class GeminiAgent(FactCheckingAgentBaseClass):
                 "agent_trace": GeminiAgent.process_trace(messages),
                 "success": False,
             }
+        finally:
+            AGENT_TURNS.labels(model=self.model).observe(
+                sum(1 for message in messages if message.role == "model")
+            )
 
     @observe(name="generate_note_gemini")
     async def generate_note(
@@ -354,6 +379,7 @@ class GeminiAgent(FactCheckingAgentBaseClass):
         text: Union[str, None] = None,
         image_url: Union[str, None] = None,
         caption: Union[str, None] = None,
+        bilingual: bool = False,
     ):
         """Generates a community note based on the provided data type (text or image).
 
@@ -362,6 +388,8 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             text: The text content of the community note (required if data_type is "text").
             image_url: The URL of the image (required if data_type is "image").
             caption: An optional caption for the image.
+            bilingual: Whether to also produce the Simplified Chinese note in the same
+                summarisation call, returned as community_note_cn if successful.
 
         Returns:
             A dictionary representing the community note.
@@ -369,7 +397,10 @@ class GeminiAgent(FactCheckingAgentBaseClass):
         child_logger = logger.child(text=text, image_url=image_url, caption=caption)
         child_logger.info("Generating community note")
         summarise_report = summarise_report_factory(
-            input_text=text, input_image_url=image_url, input_caption=caption
+            input_text=text,
+            input_image_url=image_url,
+            input_caption=caption,
+            bilingual=bilingual,
         )
         # if both text and image_url are provided, throw error:
         if text is not None and image_url is not None:
@@ -385,9 +416,12 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             parts = generate_text_parts(text)
 
         elif image_url is not None:
-            parts = generate_image_parts(image_url, caption)
+            parts = await generate_image_parts(image_url, caption)
 
-        report_dict = await self.generate_report(parts.copy())
+        run_context = AgentRunContext(
+            max_searches=self.max_searches, max_screenshots=self.max_screenshots
+        )
+        report_dict = await self.generate_report(parts.copy(), run_context)
 
         duration = time.time() - start_time  # Calculate duration
 
@@ -399,6 +433,10 @@ class GeminiAgent(FactCheckingAgentBaseClass):
             )
             if summary_results.get("success"):
                 report_dict["community_note"] = summary_results["community_note"]
+                if summary_results.get("community_note_cn"):
+                    report_dict["community_note_cn"] = summary_results[
+                        "community_note_cn"
+                    ]
                 child_logger.info("Community note generated successfully")
             else:
                 report_dict["success"] = False
@@ -1,19 +1,21 @@
 from openai import OpenAI
 from .abstract import FactCheckingAgentBaseClass
+from .compaction import CompactionPolicy, compact_openai_messages
 from typing import Union, List
 import json
 from logger import StructuredLogger
+from metrics import AGENT_TURNS, TOOL_CALL_LATENCY, track_latency
 import time
 from tools import summarise_report_factory
 import asyncio
 from openai.types.chat import ChatCompletionMessageToolCall
 from langfuse.decorators import observe
-import copy
 from datetime import datetime
-from langfuse import Langfuse
+from tools.registry import ToolRegistry
+from .run_context import AgentRunContext
+from utils.image_processing import openai_image_parts
 
 logger = StructuredLogger("openai_agent")
-langfuse = Langfuse()
 
 
 class OpenAIAgent(FactCheckingAgentBaseClass):
@@ -21,71 +23,46 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
     def __init__(
         self,
         client: OpenAI,
-        tool_list: list,
+        tool_registry: ToolRegistry,
         model: str = "gpt-4o",
-        include_planning_step: bool = True,
         temperature: float = 0.2,
         max_searches: int = 5,
         max_screenshots: int = 5,
+        compaction_policy: CompactionPolicy = None,
     ):
-        """Initializes the FactCheckingAgentBaseClass with a list of tools.
+        """Initializes the OpenAIAgent with a registry of tools.
 
-        Each tool should be a dictionary with two keys "function" and "definition".
-
-        The former will hold the function itself, and the latter an openAPI specification dictionary
+        The registry determines whether and how the agent plans between steps.
         """
-        self.include_planning_step = include_planning_step
-        if not self.include_planning_step:
-            tool_list = [
-                tool
-                for tool in tool_list
-                if tool["function"].__name__ != "plan_next_step"
-            ]
-        super().__init__(client, tool_list, temperature)
-        self.available_tools = [
-            OpenAIAgent.add_strict_and_required(definition)
-            for definition in self.function_definitions
-        ]
-        self.search_count = 0
-        self.screenshot_count = 0
+        super().__init__(client, tool_registry, temperature)
+        self.available_tools = tool_registry.openai_tools
         self.max_searches = max_searches
         self.max_screenshots = max_screenshots
+        self.compaction_policy = compaction_policy or CompactionPolicy.from_env()
         self.model = model
 
-    # getter for remaining screnshots
-    @property
-    def remaining_screenshots(self):
-        return self.max_screenshots - self.screenshot_count
-
-    # getter for remaining searches
-    @property
-    def remaining_searches(self):
-        return self.max_searches - self.search_count
-
     @staticmethod
-    def add_strict_and_required(function_definition_dict):
-        def convert_types_to_lowercase(obj):
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    if key == "type" and isinstance(value, str):
-                        obj[key] = value.lower()
-                    elif isinstance(value, (dict, list)):
-                        convert_types_to_lowercase(value)
-            elif isinstance(obj, list):
-                for item in obj:
-                    convert_types_to_lowercase(item)
-
-        copied_definition = copy.deepcopy(
-            function_definition_dict
-        )  # otherwise it will alter the original definition and affect other agents
-
-        copied_definition["parameters"]["additionalProperties"] = False
-        convert_types_to_lowercase(copied_definition["parameters"])
-        copied_definition["strict"] = True
-        return {
-            "type": "function",
-            "function": copied_definition,
-        }
+    def process_trace(messages: List[dict]) -> List[dict]:
+        """Replaces inline image data in the messages, which is too large to store"""
+        return [
+            (
+                {
+                    **message,
+                    "content": [
+                        (
+                            {"type": "image_url", "image_url": {"url": "<INLINE_DATA>"}}
+                            if part.get("type") == "image_url"
+                            and part["image_url"]["url"].startswith("data:")
+                            else part
+                        )
+                        for part in message["content"]
+                    ],
+                }
+                if isinstance(message.get("content"), list)
+                else message
+            )
+            for message in messages
+        ]
 
     @staticmethod
     def flatten_and_organise(
@@ -122,6 +99,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         self,
         is_first_step: bool,
         is_plan_step: bool,
+        run_context: AgentRunContext,
     ):
         """
         Prunes the available tools based on the current state of the agent.
@@ -130,14 +108,14 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         if is_first_step:
             allowed_function_list = ["infer_intent"]
 
-        elif is_plan_step and self.include_planning_step:
+        elif is_plan_step and self.include_planning_step and not self.fuse_planning:
             allowed_function_list = ["plan_next_step"]
 
         else:
             banned_functions = ["plan_next_step", "infer_intent"]
-            if self.remaining_searches == 0:
+            if run_context.remaining_searches == 0:
                 banned_functions.append("search_google")
-            if self.remaining_screenshots == 0:
+            if run_context.remaining_screenshots == 0:
                 banned_functions.append("get_website_screenshot")
             allowed_function_list = [
                 definition["name"]
@@ -152,7 +130,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         ]
 
     async def call_function(
-        self, tool_call: ChatCompletionMessageToolCall
+        self, tool_call: ChatCompletionMessageToolCall, run_context: AgentRunContext
     ) -> Union[List[dict], dict]:
         """
         Calls a function from the provided function dictionary based on the function call details.
@@ -160,6 +138,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         Args:
             function_dict (Dict[str, Callable[..., Any]]): A dictionary mapping function names to their corresponding callables.
             function_call (types.FunctionCall): An object containing the name of the function to call and its arguments.
+            run_context (AgentRunContext): The state of the current run, whose counters are updated.
 
         Returns:
             Union[types.Part, List[types.Part]]: A single Part or a list of Parts containing the function response.
@@ -180,12 +159,25 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         )
 
         def generate_result(result: Union[dict, str], tool_call_id: str):
+            if isinstance(result, str):
+                content = result
+            else:
+                content = result.get(
+                    "result",
+                    result.get(
+                        "error", f"function {function_name} encountered an error"
+                    ),
+                )
+                if result.get("skippedQueries"):
+                    content = {
+                        "result": content,
+                        "skippedQueries": result["skippedQueries"],
+                    }
+                content = json.dumps(content)
             return {
                 "role": "tool",
                 "tool_call_id": tool_call_id,
-                "content": (
-                    result if isinstance(result, str) else json.dumps(result["result"])
-                ),
+                "content": content,
             }
 
         try:
@@ -210,11 +202,38 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
                 tool_call_id,
             )
 
+        plan = function_args.pop("plan", None)  # only present when planning is fused
+        if plan is not None:
+            child_logger.info("Plan for this step", plan=plan)
+        if function_name == "search_google":
+            # every query counts as a search, so only run those left in the budget
+            # and tell the model which were skipped
+            queries = [function_args.get("q"), *(function_args.get("queries") or [])]
+            allowed = run_context.take_searches(queries)
+            function_args = {
+                "queries": allowed,
+                "skipped_queries": [
+                    query
+                    for query in dict.fromkeys(queries)
+                    if query and query not in allowed
+                ],
+            }
+        tool_kwargs = {}
+        if function_name == "submit_report_for_review":
+            tool_kwargs["pre_review"] = run_context.pre_review_allowed
+
         try:
-            result = await self.function_dict[function_name](**function_args)
+            with track_latency(TOOL_CALL_LATENCY, tool=function_name) as labels:
+                result = await self.function_dict[function_name](
+                    **function_args, **tool_kwargs
+                )
+                if not isinstance(result, dict) or result.get("success") is False:
+                    labels["outcome"] = "error"
+            if isinstance(result, dict) and result.get("reviewer") == "rules":
+                run_context.pre_review_rejections += 1
             if function_name == "get_website_screenshot":
                 url = function_args.get("url", "unknown URL")
-                self.screenshot_count += 1
+                run_context.screenshot_count += 1
                 if not result["success"] or result.get("result") is None:
                     child_logger.warn("Screenshot API failed")
                     return generate_result(
@@ -234,18 +253,11 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
                                     "type": "text",
                                     "text": f"Here is the screenshot for {url} returned by {function_name}",
                                 },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": result["result"],
-                                    },
-                                },
+                                *await openai_image_parts(result["result"]),
                             ],
                         },
                     ]
             else:
-                if function_name == "search_google":
-                    self.search_count += 1
                 if result.get("result") is None or result.get("success") is False:
                     child_logger.warn(f"Issue with tool call {function_name}")
                 else:
@@ -266,10 +278,13 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             )
 
     @observe(name="generate_report_agent_openai_style")
-    async def generate_report(self, starting_content) -> dict:
+    async def generate_report(
+        self, starting_content, run_context: AgentRunContext
+    ) -> dict:
         """Generates a report based on the provided starting parts.
         args:
             starting_parts: The starting parts of the report.
+            run_context: The state of the current run.
         returns:
             A dictionary representing the report.
         """
@@ -279,8 +294,8 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         current_datetime = datetime.now()
         system_prompt = prompt.compile(
             datetime=current_datetime.strftime("%d %b %Y"),
-            remaining_searches=self.remaining_searches,
-            remaining_screenshots=self.remaining_screenshots,
+            remaining_searches=run_context.remaining_searches,
+            remaining_screenshots=run_context.remaining_screenshots,
         )
         messages = [
             {"role": "system", "content": system_prompt},
@@ -293,18 +308,19 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             while len(messages) < 50 and not completed:
                 system_prompt = prompt.compile(
                     datetime=current_datetime.strftime("%d %b %Y"),
-                    remaining_searches=self.remaining_searches,
-                    remaining_screenshots=self.remaining_screenshots,
+                    remaining_searches=run_context.remaining_searches,
+                    remaining_screenshots=run_context.remaining_screenshots,
                 )
                 messages[0]["content"] = system_prompt
 
                 completion = self.client.chat.completions.create(
                     model=self.model,
-                    messages=messages,
+                    messages=compact_openai_messages(messages, self.compaction_policy),
                     temperature=0,
                     tools=self.prune_tools(
                         is_first_step=first_step,
                         is_plan_step=think,
+                        run_context=run_context,
                     ),
                     tool_choice="required",
                     langfuse_prompt=prompt,
@@ -324,7 +340,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
                 function_call_promises = []
 
                 for tool_call in tool_calls:
-                    function_call_promise = self.call_function(tool_call)
+                    function_call_promise = self.call_function(tool_call, run_context)
                     function_call_promises.append(function_call_promise)
 
                 function_results = await asyncio.gather(*function_call_promises)
@@ -334,7 +350,9 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
                     if tool_call_response.get("completed"):
                         return_object = tool_call_response.get("return_object")
                         return_object["success"] = True
-                        return_object["agent_trace"] = messages
+                        return_object["agent_trace"] = OpenAIAgent.process_trace(
+                            messages
+                        )
                         return return_object
                 messages.extend(tool_call_responses)
                 think = not think
@@ -342,7 +360,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             logger.error("Report couldn't be generated after 50 turns")
             return {
                 "error": "Report couldn't be generated after 50 turns",
-                "agent_trace": messages,
+                "agent_trace": OpenAIAgent.process_trace(messages),
                 "success": False,
             }
         except Exception as e:
@@ -353,9 +371,13 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             )
             return {
                 "error": str(e),
-                "agent_trace": messages,
+                "agent_trace": OpenAIAgent.process_trace(messages),
                 "success": False,
             }
+        finally:
+            AGENT_TURNS.labels(model=self.model).observe(
+                sum(1 for message in messages if message.get("role") == "assistant")
+            )
 
     @observe(name="generate_note_openai_style")
     async def generate_note(
@@ -363,6 +385,7 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
         text: Union[str, None] = None,
         image_url: Union[str, None] = None,
         caption: Union[str, None] = None,
+        bilingual: bool = False,
     ) -> dict:
         """Generates a community note based on the provided data type (text or image).
 
@@ -371,13 +394,18 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             text: The text content of the community note (required if data_type is "text").
             image_url: The URL of the image (required if data_type is "image").
             caption: An optional caption for the image.
+            bilingual: Whether to also produce the Simplified Chinese note in the same
+                summarisation call, returned as community_note_cn if successful.
 
         Returns:
             A dictionary representing the community note.
         """
         child_logger = logger.child(text=text, image_url=image_url, caption=caption)
         summarise_report = summarise_report_factory(
-            input_text=text, input_image_url=image_url, input_caption=caption
+            input_text=text,
+            input_image_url=image_url,
+            input_caption=caption,
+            bilingual=bilingual,
         )
         child_logger.info("Generating community note")
         # if both text and image_url are provided, throw error:
@@ -404,10 +432,13 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
                     "type": "text",
                     "text": f"User sent in the following image with this caption: {caption}",
                 },
-                {"type": "image_url", "image_url": {"url": image_url}},
+                *await openai_image_parts(image_url),
             ]
 
-        report_dict = await self.generate_report(content.copy())
+        run_context = AgentRunContext(
+            max_searches=self.max_searches, max_screenshots=self.max_screenshots
+        )
+        report_dict = await self.generate_report(content.copy(), run_context)
 
         duration = time.time() - start_time  # Calculate duration
         report_dict["agent_time_taken"] = duration
@@ -417,6 +448,10 @@ class OpenAIAgent(FactCheckingAgentBaseClass):
             )
             if summary_results.get("success"):
                 report_dict["community_note"] = summary_results["community_note"]
+                if summary_results.get("community_note_cn"):
+                    report_dict["community_note_cn"] = summary_results[
+                        "community_note_cn"
+                    ]
                 child_logger.info("Community note generated successfully")
             else:
                 report_dict["success"] = False
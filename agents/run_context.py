@@ -0,0 +1,44 @@
+# /agents/run_context.py
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class AgentRunContext:
+    """Per-request state of an agent run.
+
+    Agents are long-lived and shared across requests, so anything that changes during
+    a single run, like the search and screenshot budgets, lives here instead.
+    """
+
+    max_searches: int = 5
+    max_screenshots: int = 5
+    search_count: int = 0
+    screenshot_count: int = 0
+    # reports rejected by the checks in tools/pre_review.py, after which the LLM
+    # reviewer decides, in case the checks can't be satisfied
+    max_pre_review_rejections: int = 2
+    pre_review_rejections: int = 0
+
+    # getter for remaining screnshots
+    @property
+    def remaining_screenshots(self):
+        return self.max_screenshots - self.screenshot_count
+
+    # getter for remaining searches
+    @property
+    def remaining_searches(self):
+        return self.max_searches - self.search_count
+
+    @property
+    def pre_review_allowed(self):
+        return self.pre_review_rejections < self.max_pre_review_rejections
+
+    def take_searches(self, queries: List[str]) -> List[str]:
+        """Returns as many of the queries as the remaining searches allow, counting
+        them as used. Counting before the search runs keeps the budget correct when
+        several searches are called in the same turn."""
+        queries = list(dict.fromkeys(query for query in queries if query))
+        allowed = queries[: max(self.remaining_searches, 0)]
+        self.search_count += len(allowed)
+        return allowed
@@ -2,22 +2,42 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import asyncio
+import os
 import joblib
-from fastapi import FastAPI, BackgroundTasks
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, BackgroundTasks, Response
 from pydantic import BaseModel
+from typing import List
 from sentence_transformers import SentenceTransformer
 
 from handlers import (
     perform_ocr,
+    perform_batch_ocr,
+    merge_messages,
+    ocr_config,
     check_should_review,
     check_is_sensitive,
     redact,
     get_outputs,
 )
+from agents.factory import warm_up_agents
+from clients.http import http_client
+from clients.trace_store import trace_storage
+from clients.write_queue import write_queue
+from clients.storage import storage
+from clients.identity_tokens import identity_tokens, warm_up_identity_token
 from fastapi import HTTPException
 import json
-from models import CommunityNoteRequest, AgentResponse, SupportedModelProvider
-from middleware import RequestIDMiddleware  # Import the middleware
+from models import (
+    CommunityNoteRequest,
+    AgentResponse,
+    SupportedModelProvider,
+    PlanningMode,
+)
+from middleware import RequestIDMiddleware, MetricsMiddleware, DeadlineMiddleware
+from metrics import OCR_LATENCY, render_metrics, track_latency
 from context import request_id_var  # Import the context variable
 from logger import StructuredLogger
 from langfuse.decorators import observe, langfuse_context
@@ -29,13 +49,36 @@ langfuse_context.configure(
 
 logger = StructuredLogger("checkmate-ml-api")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build long-lived clients and tool schemas before serving the first request
+    warm_up_agents()
+    await warm_up_identity_token(os.environ.get("SCREENSHOT_HOSTNAME"))
+    write_queue.start()
+    yield
+    await write_queue.stop()
+    storage.close()
+    inference_executor.shutdown(wait=False)
+    await identity_tokens.aclose()
+    await http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add the middleware to the application
 app.add_middleware(RequestIDMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 embedding_model = SentenceTransformer("files/all-MiniLM-L6-v2")
 L1_svc = joblib.load("files/L1_svc.joblib")
+# Runs the local models for async endpoints, so that they don't block the event loop
+# or compete with sync endpoints for the threadpool
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", 2)),
+    thread_name_prefix="inference",
+)
 
 
 class ItemText(BaseModel):
@@ -46,12 +89,38 @@ class ItemUrl(BaseModel):
     url: str
 
 
+class ItemUrls(BaseModel):
+    urls: List[str]
+    # Whether the images are screenshots of one conversation, whose extracted
+    # messages should also be merged into a single text
+    merge: bool = False
+
+
+def predict_L1_categories(texts: List[str]) -> List[str]:
+    """Classifies several texts with one embedding pass."""
+    embeddings = embedding_model.encode(texts)
+    return [
+        "irrelevant" if prediction == "trivial" else prediction
+        for prediction in L1_svc.predict(embeddings)
+    ]
+
+
+def predict_L1_category(text: str) -> str:
+    return predict_L1_categories([text])[0]
+
+
 def cleanup(background_tasks: BackgroundTasks, log_message: str = None):
     if log_message:
         background_tasks.add_task(logger.info, log_message)
     background_tasks.add_task(langfuse_context.flush)
 
 
+@app.get("/metrics")
+def get_metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.post("/embed")
 def get_embedding(item: ItemText, background_tasks: BackgroundTasks):
     logger.info("Processing embedding request", text=item.text[:100])
@@ -64,9 +133,7 @@ def get_embedding(item: ItemText, background_tasks: BackgroundTasks):
 @app.post("/getL1Category")
 def get_L1_category(item: ItemText, background_tasks: BackgroundTasks):
     logger.info("Processing L1 category request", text=item.text[:100])
-    embedding = embedding_model.encode(item.text)
-    prediction = L1_svc.predict(embedding.reshape(1, -1))[0]
-    result = {"prediction": "irrelevant" if prediction == "trivial" else prediction}
+    result = {"prediction": predict_L1_category(item.text)}
     cleanup(background_tasks, "L1 category prediction complete")
     return result
 
@@ -94,24 +161,61 @@ def get_needs_checking(item: ItemText, background_tasks: BackgroundTasks):
 
 
 @app.post("/ocr-v2")
-def get_ocr(item: ItemUrl, background_tasks: BackgroundTasks):
+async def get_ocr(item: ItemUrl, background_tasks: BackgroundTasks):
     logger.info("Processing OCR request", url=item.url)
-    results = perform_ocr(item.url, langfuse_observation_id=request_id_var.get())
+    results = await perform_ocr(item.url, langfuse_observation_id=request_id_var.get())
     if "extracted_message" in results and results["extracted_message"]:
         extracted_message = results["extracted_message"]
         logger.info(
             "Message extracted from image", extracted_text=extracted_message[:100]
         )
-        prediction = get_L1_category(
-            ItemText(text=extracted_message), background_tasks
-        ).get("prediction", "unsure")
-        results["prediction"] = prediction
+        with track_latency(OCR_LATENCY, stage="classification"):
+            results["prediction"] = await asyncio.get_running_loop().run_in_executor(
+                inference_executor, predict_L1_category, extracted_message
+            )
     else:
         results["prediction"] = "unsure"
     cleanup(background_tasks, "OCR processing complete")
     return results
 
 
+@app.post("/ocr-v2/batch")
+async def get_batch_ocr(item: ItemUrls, background_tasks: BackgroundTasks):
+    if not 0 < len(item.urls) <= ocr_config.batch_max_images:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Send between 1 and {ocr_config.batch_max_images} image URLs",
+        )
+    logger.info("Processing batch OCR request", urls=item.urls)
+    results = await perform_batch_ocr(
+        item.urls, langfuse_observation_id=request_id_var.get()
+    )
+    texts = [result["extracted_message"] for result in results]
+    texts = [text for text in texts if text]
+    merged_message = merge_messages(texts) if item.merge else None
+    if merged_message:
+        texts.append(merged_message)
+    predictions = []
+    if texts:
+        with track_latency(OCR_LATENCY, stage="classification"):
+            predictions = await asyncio.get_running_loop().run_in_executor(
+                inference_executor, predict_L1_categories, texts
+            )
+    predictions = iter(predictions)
+    for result in results:
+        result["prediction"] = (
+            next(predictions) if result["extracted_message"] else "unsure"
+        )
+    response = {"results": results}
+    if item.merge:
+        response["merged_message"] = merged_message or None
+        response["merged_prediction"] = (
+            next(predictions) if merged_message else "unsure"
+        )
+    cleanup(background_tasks, "Batch OCR processing complete")
+    return response
+
+
 @app.post("/redact")
 def get_redact(item: ItemText, background_tasks: BackgroundTasks):
     logger.info("Processing redaction request", text=item.text[:100])
@@ -173,6 +277,8 @@ async def get_community_note_api_handler(
             image_url=request.image_url,
             caption=request.caption,
             addPlanning=request.addPlanning,
+            planning_mode=request.planningMode or PlanningMode.SEPARATE,
+            bilingual_summary=request.bilingualSummary or False,
             provider=provider,
             langfuse_observation_id=request_id_var.get(),  # set langfuse trace ID as request ID
         )
@@ -193,6 +299,17 @@ async def get_community_note_api_handler(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/v2/agentCalls/{request_id}/trace")
+async def get_agent_trace(request_id: str):
+    """Returns the agent trace of a stored agent call, loading it from the trace
+    store if it was stored out of line."""
+    document = await asyncio.to_thread(storage.get, "agent_calls", request_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Agent call not found")
+    document = await trace_storage.rehydrate(document)
+    return {"requestId": request_id, "agentTrace": document.get("agentTrace")}
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,119 @@
+# benchmarks/agent_replay.py
+# Records a get_outputs run into a cassette, then replays it offline to measure and
+# profile our own overhead (agent loop, tracing, serialisation) without the latency
+# and variance of the upstream services.
+import argparse
+import asyncio
+import cProfile
+import pstats
+import statistics
+import time
+from models import PlanningMode, SupportedModelProvider
+from utils.record_replay import RECORD, REPLAY, use_cassette
+
+
+async def run_pipeline(inputs: dict):
+    # imported here so that clients are created within the cassette
+    from handlers.agent_generation import get_outputs
+
+    return await get_outputs(
+        text=inputs.get("text"),
+        image_url=inputs.get("image_url"),
+        caption=inputs.get("caption"),
+        addPlanning=inputs.get("addPlanning", False),
+        planning_mode=PlanningMode(inputs.get("planning_mode", "separate")),
+        bilingual_summary=inputs.get("bilingual_summary", False),
+        provider=SupportedModelProvider(inputs.get("provider", "openai")),
+    )
+
+
+def record(args):
+    inputs = {
+        "text": args.text,
+        "image_url": args.image_url,
+        "caption": args.caption,
+        "addPlanning": args.planning is not None,
+        "planning_mode": args.planning or PlanningMode.SEPARATE.value,
+        "bilingual_summary": args.bilingual,
+        "provider": args.provider,
+    }
+    with use_cassette(args.cassette, RECORD) as cassette:
+        cassette.metadata["inputs"] = inputs
+        start_time = time.perf_counter()
+        result = asyncio.run(run_pipeline(inputs))
+        cassette.metadata["total_time"] = time.perf_counter() - start_time
+    print(
+        f"Recorded {len(cassette.interactions)} calls and "
+        f"{len(cassette.documents)} documents in {cassette.metadata['total_time']:.2f} s"
+    )
+    print(f"success: {result.success}, en: {result.en}")
+
+
+def replay(args):
+    latency_scale = 0 if args.latency == "zero" else 1
+    profiler = cProfile.Profile() if args.profile else None
+    timings = []
+    for _ in range(args.iterations):
+        with use_cassette(args.cassette, REPLAY, latency_scale) as cassette:
+            start_time = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            result = asyncio.run(run_pipeline(cassette.metadata["inputs"]))
+            if profiler:
+                profiler.disable()
+            timings.append(time.perf_counter() - start_time)
+    print(f"success: {result.success}, en: {result.en}")
+    print(
+        f"{args.iterations} replays with {args.latency} latency: "
+        f"mean {statistics.mean(timings) * 1000:.1f} ms, "
+        f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms"
+    )
+    if cassette.metadata.get("total_time"):
+        print(f"recorded run: {cassette.metadata['total_time'] * 1000:.1f} ms")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record a get_outputs run, or replay it offline"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("cassette")
+    record_parser.add_argument("--text")
+    record_parser.add_argument("--image-url")
+    record_parser.add_argument("--caption")
+    record_parser.add_argument(
+        "--provider",
+        choices=[provider.value for provider in SupportedModelProvider],
+        default=SupportedModelProvider.OPENAI.value,
+    )
+    record_parser.add_argument(
+        "--planning", choices=[mode.value for mode in PlanningMode]
+    )
+    record_parser.add_argument("--bilingual", action="store_true")
+    record_parser.set_defaults(handler=record)
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("cassette")
+    replay_parser.add_argument(
+        "--latency", choices=["original", "zero"], default="zero"
+    )
+    replay_parser.add_argument("--iterations", type=int, default=10)
+    replay_parser.add_argument(
+        "--profile",
+        type=int,
+        nargs="?",
+        const=30,
+        help="Print the N functions with the highest cumulative time",
+    )
+    replay_parser.set_defaults(handler=replay)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
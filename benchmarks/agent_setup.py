@@ -0,0 +1,70 @@
+# benchmarks/agent_setup.py
+# Measures the per-request cost of setting up an agent, comparing the previous
+# behaviour (new Langfuse client, HTTP client and tool schemas on every request)
+# with shared agents and a per-request AgentRunContext.
+import argparse
+import statistics
+import time
+import tracemalloc
+from langfuse import Langfuse
+from agents.openai_agent import OpenAIAgent
+from agents.run_context import AgentRunContext
+from clients.openai import create_openai_client
+from agents.factory import AGENT_MODELS, get_agent
+from models import SupportedModelProvider
+from tools.registry import AGENT_TOOLS, build_tool_registry
+
+
+def per_request_setup(provider: SupportedModelProvider, include_planning_step: bool):
+    """Reproduces the setup previously done by get_outputs on every request."""
+    langfuse = Langfuse()
+    agent = OpenAIAgent(
+        create_openai_client(provider),
+        build_tool_registry(AGENT_TOOLS, include_planning_step),
+        model=AGENT_MODELS[provider],
+    )
+    return agent, langfuse
+
+
+def shared_setup(provider: SupportedModelProvider, include_planning_step: bool):
+    agent = get_agent(provider, include_planning_step, False)
+    return agent, AgentRunContext(
+        max_searches=agent.max_searches, max_screenshots=agent.max_screenshots
+    )
+
+
+def measure(setup, iterations: int, *args):
+    timings = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        setup(*args)
+        timings.append(time.perf_counter() - start_time)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-request agent setup")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--planning", action="store_true")
+    args = parser.parse_args()
+
+    provider = SupportedModelProvider.OPENAI
+    shared_setup(provider, args.planning)  # the startup cost, paid once
+    for name, setup in (("per request", per_request_setup), ("shared", shared_setup)):
+        results = measure(setup, args.iterations, provider, args.planning)
+        print(
+            f"{name:>12}: mean {results['mean_ms']:.3f} ms, "
+            f"p95 {results['p95_ms']:.3f} ms, peak memory {results['peak_kib']:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bilingual_summary.py
+# Compares the latency and token use of summarising a report and then translating
+# the note (the default chain) with producing both notes in one bilingual call.
+# Unlike the other benchmarks, this one calls the live LLM APIs.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from typing import List
+from clients.openai import get_async_openai_client
+from models import SupportedModelProvider
+from tools import summarise_report_factory, translate_text
+
+
+def load_calls(path: str) -> List[dict]:
+    """Loads exported agent_calls documents that have a report."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data]
+    return [call for call in data if call.get("report")]
+
+
+@contextmanager
+def record_usage(usage: dict):
+    """Adds up the token usage of every chat completion made within the block."""
+    completions = get_async_openai_client(
+        SupportedModelProvider.OPENAI
+    ).chat.completions
+    create = completions.create
+
+    async def create_and_record(*args, **kwargs):
+        response = await create(*args, **kwargs)
+        if response.usage is not None:
+            usage["prompt_tokens"] += response.usage.prompt_tokens
+            usage["completion_tokens"] += response.usage.completion_tokens
+        usage["calls"] += 1
+        return response
+
+    completions.create = create_and_record
+    try:
+        yield usage
+    finally:
+        completions.create = create
+
+
+async def run_chain(call: dict, bilingual: bool) -> dict:
+    summarise_report = summarise_report_factory(
+        input_text=call.get("text"),
+        input_image_url=call.get("image_url"),
+        input_caption=call.get("caption"),
+        bilingual=bilingual,
+    )
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+    with record_usage(usage):
+        start_time = time.perf_counter()
+        summary = await summarise_report(report=call["report"])
+        fell_back = False
+        if summary.get("success") and not summary.get("community_note_cn"):
+            fell_back = bilingual
+            await translate_text(summary["community_note"], language="cn")
+        latency = time.perf_counter() - start_time
+    return {
+        **usage,
+        "latency": latency,
+        "success": summary.get("success", False),
+        "fell_back": fell_back,
+    }
+
+
+def summarise(name: str, results: List[dict]):
+    latencies = sorted(result["latency"] for result in results)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{name:>10}: mean {statistics.mean(latencies):.2f} s, p95 {p95:.2f} s, "
+        f"prompt tokens {statistics.mean(r['prompt_tokens'] for r in results):.0f}, "
+        f"completion tokens {statistics.mean(r['completion_tokens'] for r in results):.0f}, "
+        f"LLM calls {statistics.mean(r['calls'] for r in results):.1f}, "
+        f"failures {sum(not r['success'] for r in results)}, "
+        f"fallbacks {sum(r['fell_back'] for r in results)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Compare summarise + translate with a single bilingual summary"
+    )
+    parser.add_argument(
+        "calls", nargs="+", help="JSON files with agent_calls documents"
+    )
+    args = parser.parse_args()
+
+    calls = [call for path in args.calls for call in load_calls(path)]
+    chained, bilingual = [], []
+    for call in calls:
+        chained.append(await run_chain(call, bilingual=False))
+        bilingual.append(await run_chain(call, bilingual=True))
+    print(f"{len(calls)} reports")
+    if calls:
+        summarise("chained", chained)
+        summarise("bilingual", bilingual)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
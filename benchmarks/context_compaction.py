@@ -0,0 +1,110 @@
+# benchmarks/context_compaction.py
+# Replays recorded agent traces turn by turn and reports the estimated input tokens
+# sent to the model at each turn, with and without context compaction.
+import argparse
+import json
+from dataclasses import replace
+from typing import List
+from google.genai import types
+from agents.compaction import (
+    CompactionPolicy,
+    compact_gemini_contents,
+    compact_openai_messages,
+)
+from utils.token_estimation import (
+    estimate_gemini_content_tokens,
+    estimate_openai_message_tokens,
+)
+
+PLACEHOLDER_IMAGE = types.Part.from_bytes(data=b"", mime_type="image/jpeg")
+
+
+def load_trace(path: str) -> List[dict]:
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("agentTrace") or []
+    return data
+
+
+def _to_gemini_part(part: dict) -> types.Part:
+    # Gemini traces are stored with image bytes replaced by placeholder strings
+    if isinstance(part.get("inline_data"), str) or isinstance(
+        part.get("file_data"), str
+    ):
+        return PLACEHOLDER_IMAGE
+    return types.Part.model_validate(part)
+
+
+def _to_gemini_contents(trace: List[dict]) -> List[types.Content]:
+    return [
+        types.Content(
+            role=content["role"],
+            parts=[_to_gemini_part(part) for part in content.get("parts", [])],
+        )
+        for content in trace
+    ]
+
+
+def benchmark_trace(trace: List[dict], policy: CompactionPolicy) -> List[tuple]:
+    """Returns (turn, tokens_before, tokens_after) for every model turn in the trace."""
+    is_gemini = bool(trace) and "parts" in trace[0]
+    if is_gemini:
+        history = _to_gemini_contents(trace)
+        model_role, compact, estimate = (
+            "model",
+            compact_gemini_contents,
+            estimate_gemini_content_tokens,
+        )
+    else:
+        history = trace
+        model_role, compact, estimate = (
+            "assistant",
+            compact_openai_messages,
+            estimate_openai_message_tokens,
+        )
+    rows = []
+    for index, message in enumerate(history):
+        role = message.role if is_gemini else message.get("role")
+        if role != model_role:
+            continue
+        sent = history[:index]  # what was sent to produce this turn
+        rows.append((len(rows) + 1, estimate(sent), estimate(compact(sent, policy))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate tokens sent per agent turn with and without compaction"
+    )
+    parser.add_argument("traces", nargs="+", help="JSON files with agent traces")
+    parser.add_argument("--screenshot-turns", type=int, default=None)
+    parser.add_argument("--search-turns", type=int, default=None)
+    args = parser.parse_args()
+
+    overrides = {"enabled": True}
+    if args.screenshot_turns is not None:
+        overrides["keep_screenshot_turns"] = args.screenshot_turns
+    if args.search_turns is not None:
+        overrides["keep_search_turns"] = args.search_turns
+    policy = replace(CompactionPolicy.from_env(), **overrides)
+
+    total_before, total_after = 0, 0
+    for path in args.traces:
+        rows = benchmark_trace(load_trace(path), policy)
+        print(f"\n{path}")
+        print(f"{'turn':>4} {'before':>8} {'after':>8} {'saved':>7}")
+        for turn, before, after in rows:
+            saved = 1 - after / before if before else 0
+            print(f"{turn:>4} {before:>8} {after:>8} {saved:>7.1%}")
+            total_before += before
+            total_after += after
+    if total_before:
+        print(
+            f"\nTotal estimated input tokens: {total_before} -> {total_after} "
+            f"({1 - total_after / total_before:.1%} saved)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/image_preprocessing.py
+# Compares the size and estimated token cost of images sent to the models as they
+# are, and after preprocessing (see utils/image_processing.py), along with the time
+# taken to preprocess them. Runs on the given screenshots, or on generated ones.
+import argparse
+import base64
+import dataclasses
+import io
+import os
+import random
+import time
+from PIL import Image, ImageDraw, ImageFilter
+from utils.image_processing import (
+    ImageProcessingConfig,
+    detect_mime_type,
+    image_processing_config,
+    preprocess_image,
+)
+from utils.token_estimation import (
+    estimate_gemini_image_tokens,
+    estimate_openai_image_tokens,
+)
+
+
+def generate_screenshot(width: int, height: int, seed: int = 0) -> bytes:
+    """Draws a page of text blocks and images, saved as PNG like a real screenshot."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    top = 40
+    while top < height - 40:
+        if rng.random() < 0.2:
+            block_height = rng.randint(150, 400)
+            # photos are what make real screenshots large
+            photo = Image.merge(
+                "RGB",
+                [
+                    Image.effect_noise((width - 80, block_height), rng.randint(20, 80))
+                    for _ in range(3)
+                ],
+            ).filter(ImageFilter.GaussianBlur(1))
+            image.paste(photo, (40, top))
+            top += block_height + 30
+            continue
+        for _ in range(rng.randint(2, 8)):
+            draw.text(
+                (40, top),
+                " ".join("lorem ipsum dolor sit amet" for _ in range(width // 180)),
+                fill=(30, 30, 30),
+            )
+            top += 22
+        top += 30
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def sample_images(paths):
+    if paths:
+        for path in paths:
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read()
+        return
+    yield "full page 1280x6000", generate_screenshot(1280, 6000)
+    yield "phone 1080x2400", generate_screenshot(1080, 2400, seed=1)
+    yield "desktop 1920x1080", generate_screenshot(1920, 1080, seed=2)
+
+
+def base64_size(data: bytes) -> int:
+    return len(base64.b64encode(data))
+
+
+def measure(name: str, data: bytes, config: ImageProcessingConfig, args) -> dict:
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+    timings = []
+    for _ in range(args.iterations):
+        start_time = time.perf_counter()
+        processed = preprocess_image(data, config)
+        timings.append(time.perf_counter() - start_time)
+    processed_bytes = sum(base64_size(image.data) for image in processed)
+    bytes_saved = (base64_size(data) - processed_bytes) * args.turns
+    return {
+        "name": name,
+        "original": f"{width}x{height} {detect_mime_type(data)}",
+        "processed": ", ".join(f"{image.width}x{image.height}" for image in processed),
+        "original_kib": len(data) / 1024,
+        "processed_kib": sum(len(image.data) for image in processed) / 1024,
+        "openai_tokens": (
+            estimate_openai_image_tokens(width, height),
+            sum(
+                estimate_openai_image_tokens(image.width, image.height)
+                for image in processed
+            ),
+        ),
+        "gemini_tokens": (
+            estimate_gemini_image_tokens(width, height),
+            sum(
+                estimate_gemini_image_tokens(image.width, image.height)
+                for image in processed
+            ),
+        ),
+        "preprocess_ms": min(timings) * 1000,
+        "upload_ms_saved": bytes_saved * 8 / (args.bandwidth_mbps * 1e6) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the savings of preprocessing images for the models"
+    )
+    parser.add_argument("paths", nargs="*", help="Screenshots to measure")
+    parser.add_argument("--tile", action="store_true", help="Tile tall images")
+    parser.add_argument(
+        "--max-dimension", type=int, default=image_processing_config.max_dimension
+    )
+    parser.add_argument("--quality", type=int, default=image_processing_config.quality)
+    parser.add_argument(
+        "--turns",
+        type=int,
+        default=5,
+        help="Number of requests each image is sent in, as later turns resend it",
+    )
+    parser.add_argument(
+        "--bandwidth-mbps",
+        type=float,
+        default=20,
+        help="Upload bandwidth used to estimate the time saved",
+    )
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    config = dataclasses.replace(
+        image_processing_config,
+        max_dimension=args.max_dimension,
+        quality=args.quality,
+        tile_tall_images=args.tile,
+    )
+    for name, data in sample_images(args.paths):
+        result = measure(name, data, config, args)
+        print(f"{result['name']}: {result['original']} -> {result['processed']}")
+        print(
+            f"  size {result['original_kib']:.0f} KiB -> "
+            f"{result['processed_kib']:.0f} KiB, "
+            f"preprocessing {result['preprocess_ms']:.0f} ms"
+        )
+        print(
+            f"  tokens per turn: OpenAI {result['openai_tokens'][0]} -> "
+            f"{result['openai_tokens'][1]}, Gemini {result['gemini_tokens'][0]} -> "
+            f"{result['gemini_tokens'][1]}"
+        )
+        print(
+            f"  upload time saved over {args.turns} turns at "
+            f"{args.bandwidth_mbps:g} Mbps: {result['upload_ms_saved']:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# benchmarks/load_test.py
+# Drives the API at increasing concurrency against local stand-ins for every
+# upstream (see stub_upstreams.py), and reports throughput, latency percentiles,
+# event-loop lag and memory for each endpoint. Runs without network access.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+import httpx
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from models import PlanningMode, SupportedModelProvider
+from benchmarks.stub_upstreams import StubConfig, StubDatabase, StubServer
+
+MESSAGE = (
+    "URGENT: You are eligible for the $600 Assurance Package payout. Claim it by "
+    "today at https://gov-payout-sg.com/claim or it will be forfeited."
+)
+ENDPOINTS = {
+    "community-note": "/v2/getCommunityNote",
+    "needs-checking": "/getNeedsChecking",
+    "sensitivity": "/sensitivity-filter",
+}
+LAG_INTERVAL = 0.05
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def current_rss_mib() -> float:
+    """Returns the resident memory of this process, falling back to its peak."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_service_account(directory: str, token_uri: str) -> str:
+    """Writes service account credentials whose identity tokens come from the stub."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path = os.path.join(directory, "service_account.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "type": "service_account",
+                "project_id": "load-test",
+                "private_key_id": "load-test",
+                "private_key": pem,
+                "client_email": "load-test@load-test.iam.gserviceaccount.com",
+                "client_id": "0",
+                "token_uri": token_uri,
+            },
+            f,
+        )
+    return path
+
+
+def configure_environment(stub_url: str, credentials_path: str):
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{stub_url}/v1",
+            "DEEPSEEK_API_KEY": "stub",
+            "DEEPSEEK_BASE_URL": f"{stub_url}/v1",
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": f"{stub_url}/v1",
+            "GOOGLE_API_KEY": "stub",
+            "GEMINI_BASE_URL": f"{stub_url}/",
+            "SERPER_API_KEY": "stub",
+            "SERPER_URL": f"{stub_url}/search",
+            "RMSE_HOSTNAME": stub_url,
+            "RMSE_API_KEY": "stub",
+            "SCREENSHOT_HOSTNAME": stub_url,
+            "GOOGLE_APPLICATION_CREDENTIALS": credentials_path,
+            "LANGFUSE_HOST": stub_url,
+            "LANGFUSE_PUBLIC_KEY": "stub",
+            "LANGFUSE_SECRET_KEY": "stub",
+        }
+    )
+
+
+class LagMonitor:
+    """Samples event-loop lag and resident memory while a stage runs."""
+
+    def __init__(self):
+        self.lags = []
+        self.peak_rss = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start_time = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lags.append(time.perf_counter() - start_time - LAG_INTERVAL)
+            self.peak_rss = max(self.peak_rss, current_rss_mib())
+
+    def start(self):
+        self.lags = []
+        self.peak_rss = current_rss_mib()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # let the current interval finish, so that a loop blocked until now is recorded
+        await asyncio.sleep(LAG_INTERVAL)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def request_for(endpoint: str, provider: str, planning: str = None):
+    if endpoint == "community-note":
+        body = {"text": MESSAGE}
+        if planning:
+            body.update(addPlanning=True, planningMode=planning)
+        return ENDPOINTS[endpoint], {"provider": provider}, body
+    return ENDPOINTS[endpoint], {}, {"text": MESSAGE}
+
+
+async def run_stage(
+    client: httpx.AsyncClient, endpoint: str, concurrency: int, duration: float, args
+) -> dict:
+    path, params, body = request_for(endpoint, args.provider, args.planning)
+    latencies, statuses = [], {}
+    monitor = LagMonitor()
+    rss_start = current_rss_mib()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            try:
+                response = await client.post(path, params=params, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start_time)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    monitor.start()
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    await monitor.stop()
+    completed = len(latencies)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": completed,
+        "throughput_rps": completed / elapsed if elapsed else 0.0,
+        "error_rate": (1 - statuses.get("200", 0) / completed if completed else 0.0),
+        "statuses": statuses,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "loop_lag_p50_ms": percentile(monitor.lags, 50) * 1000,
+        "loop_lag_p99_ms": percentile(monitor.lags, 99) * 1000,
+        "loop_lag_max_ms": max(monitor.lags, default=0.0) * 1000,
+        "rss_start_mib": rss_start,
+        "rss_peak_mib": monitor.peak_rss,
+        "rss_end_mib": current_rss_mib(),
+    }
+
+
+def print_stage(result: dict):
+    print(
+        f"{result['endpoint']:>15} c={result['concurrency']:<4} "
+        f"{result['throughput_rps']:7.2f} req/s  "
+        f"p50 {result['latency_p50_ms']:8.0f} ms  "
+        f"p95 {result['latency_p95_ms']:8.0f} ms  "
+        f"p99 {result['latency_p99_ms']:8.0f} ms  "
+        f"errors {result['error_rate']:6.1%}  "
+        f"lag p99 {result['loop_lag_p99_ms']:7.1f} ms  "
+        f"max {result['loop_lag_max_ms']:7.1f} ms  "
+        f"rss {result['rss_end_mib']:7.1f} MiB (peak {result['rss_peak_mib']:.1f})"
+    )
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_load_test(args, stub_config: StubConfig) -> List[dict]:
+    # imported after the environment points every client at the stand-ins
+    import clients.firestore_db as firestore_db
+    from app import app
+
+    stub_db = StubDatabase(stub_config)
+    firestore_db.get_db = lambda: stub_db
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    )
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=f"http://{host}:{port}", timeout=args.timeout, limits=limits
+    ) as client:
+        for endpoint in args.endpoints:
+            path, params, body = request_for(endpoint, args.provider, args.planning)
+            await client.post(path, params=params, json=body)  # warm up
+            for concurrency in args.concurrency:
+                result = await run_stage(
+                    client, endpoint, concurrency, args.duration, args
+                )
+                print_stage(result)
+                results.append(result)
+
+    server.should_exit = True
+    await serve_task
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the API against local stand-ins for its upstreams"
+    )
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        choices=list(ENDPOINTS),
+        default=["needs-checking", "community-note"],
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 2, 4, 8, 16, 32],
+        help="Comma-separated concurrency levels",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds per concurrency level"
+    )
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument(
+        "--provider",
+        choices=[provider.value for provider in SupportedModelProvider],
+        default=SupportedModelProvider.OPENAI.value,
+    )
+    parser.add_argument("--planning", choices=[mode.value for mode in PlanningMode])
+    parser.add_argument(
+        "--stub-config", help="JSON file with latency and error profiles"
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiplies every upstream latency, e.g. 0 to measure our own overhead",
+    )
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    stub_config = StubConfig()
+    if args.stub_config:
+        with open(args.stub_config) as f:
+            stub_config = StubConfig.from_dict(json.load(f))
+    stub_config = stub_config.scaled(args.latency_scale)
+
+    stub_server = StubServer(stub_config).start()
+    with tempfile.TemporaryDirectory() as directory:
+        credentials_path = write_service_account(directory, f"{stub_server.url}/token")
+        configure_environment(stub_server.url, credentials_path)
+        results = asyncio.run(run_load_test(args, stub_config))
+    stub_server.stop()
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "arguments": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "stub_config": stub_config.to_dict(),
+            "upstream_requests": stub_server.app.state.request_counts,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
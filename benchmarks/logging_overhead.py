@@ -0,0 +1,151 @@
+# benchmarks/logging_overhead.py
+# Measures the time and memory allocated per log line by StructuredLogger, and by
+# the previous implementation, which built a new Logger and StreamHandler for each
+# child logger and serialised every value twice.
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import logger
+from logger import JsonFormatter, StructuredLogger
+
+
+class PreviousStructuredLogger(logging.Logger):
+    """StructuredLogger before the logging core was rewritten."""
+
+    def __init__(self, name="pino_logger", level=logging.INFO, context=None):
+        super().__init__(name, level)
+        self.context = context or {}
+        handler = logging.StreamHandler()
+        handler.setFormatter(PreviousJsonFormatter())
+        self.addHandler(handler)
+
+    def log(self, level, message, **kwargs):
+        for key, value in kwargs.items():
+            try:
+                json.dumps(value)
+            except TypeError:
+                kwargs[key] = str(value)
+        merged_context = {**self.context, **kwargs}
+        super().log(level, message, extra={"extra_data": merged_context})
+
+    def info(self, message, **kwargs):
+        self.log(logging.INFO, message, **kwargs)
+
+    def child(self, **new_context):
+        return PreviousStructuredLogger(
+            name=self.name, level=self.level, context={**self.context, **new_context}
+        )
+
+
+class PreviousJsonFormatter(JsonFormatter):
+    def formatTime(self, record, datefmt=None):
+        return logging.Formatter.formatTime(self, record, datefmt)
+
+    def format(self, record):
+        log_record = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "file": record.pathname,
+            "line": record.lineno,
+            "request_id": None,
+        }
+        if hasattr(record, "extra_data"):
+            log_record.update(record.extra_data)
+        return json.dumps(log_record)
+
+
+def handle_request(log, i: int, lines: int):
+    """Logs like a handler: a child logger per request, then a few lines."""
+    child = log.child(message="Is this a scam? " * 5, request=i)
+    for line in range(lines):
+        child.info(
+            "Processing step",
+            step=line,
+            started=datetime.datetime(2025, 1, 1),
+            result={"needs_checking": True, "score": 0.87},
+        )
+
+
+def measure(log, requests: int, lines: int) -> dict:
+    handle_request(log, 0, lines)  # warm up
+    gc.collect()
+    start_time = time.perf_counter()
+    for i in range(requests):
+        handle_request(log, i, lines)
+    elapsed = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(requests):
+        handle_request(log, i, lines)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(
+        stat.size_diff
+        for stat in after.compare_to(before, "filename")
+        if stat.size_diff > 0
+    )
+    gc.collect()
+    return {
+        "us_per_line": elapsed / (requests * lines) * 1e6,
+        "retained_bytes_per_request": allocated / requests,
+    }
+
+
+def peak_bytes_per_line(log, lines: int) -> float:
+    """Returns the peak memory allocated while logging a request, per line."""
+    handle_request(log, 0, lines)
+    tracemalloc.start()
+    handle_request(log, 1, lines)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure time and memory per log line, before and after"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=5, help="Log lines per request")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        previous_stderr, sys.stderr = sys.stderr, devnull
+        previous_stream = logger.handler.setStream(devnull)
+        try:
+            results = {
+                "previous": PreviousStructuredLogger("benchmark"),
+                "current": StructuredLogger("benchmark"),
+            }
+            for name, log in results.items():
+                results[name] = {
+                    **measure(log, args.requests, args.lines),
+                    "peak_bytes_per_line": peak_bytes_per_line(log, args.lines),
+                }
+        finally:
+            sys.stderr = previous_stderr
+            logger.handler.setStream(previous_stream)
+
+    print(
+        f"{'logger':<10} {'us/line':>8} {'peak bytes/line':>16} "
+        f"{'retained bytes/request':>23}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['us_per_line']:>8.1f} "
+            f"{result['peak_bytes_per_line']:>16.0f} "
+            f"{result['retained_bytes_per_request']:>23.0f}"
+        )
+    print(f"\norjson: {'yes' if logger.orjson is not None else 'no, using json'}")
+
+
+if __name__ == "__main__":
+    main()
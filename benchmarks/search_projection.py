@@ -0,0 +1,89 @@
+# benchmarks/search_projection.py
+# Replays recorded agent traces with their search results projected as
+# search_google now returns them, and reports the estimated input tokens sent per
+# request with the raw and the projected results.
+import argparse
+import copy
+import json
+from dataclasses import replace
+from typing import List
+from agents.compaction import CompactionPolicy
+from benchmarks.context_compaction import benchmark_trace, load_trace
+from tools.search_projection import SearchProjection, project_results
+
+
+def _project(results, projection: SearchProjection):
+    if not isinstance(results, list):
+        return results
+    return project_results(results, projection=projection)
+
+
+def project_trace(trace: List[dict], projection: SearchProjection) -> List[dict]:
+    """Returns a copy of the trace with the search_google results projected."""
+    trace = copy.deepcopy(trace)
+    search_call_ids = set()
+    for message in trace:
+        # Gemini traces
+        for part in message.get("parts") or []:
+            response = part.get("function_response")
+            if response and response.get("name") == "search_google":
+                result = (response.get("response") or {}).get("result")
+                response["response"]["result"] = _project(result, projection)
+        # OpenAI traces
+        for tool_call in message.get("tool_calls") or []:
+            if tool_call["function"]["name"] == "search_google":
+                search_call_ids.add(tool_call["id"])
+        if message.get("role") == "tool" and message["tool_call_id"] in search_call_ids:
+            try:
+                results = json.loads(message["content"])
+            except (TypeError, ValueError):
+                continue
+            message["content"] = json.dumps(_project(results, projection))
+    return trace
+
+
+def total_tokens(trace: List[dict], policy: CompactionPolicy) -> int:
+    """Returns the estimated input tokens sent over all turns, after compaction."""
+    return sum(after for _, _, after in benchmark_trace(trace, policy))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate tokens sent per request with raw and projected results"
+    )
+    parser.add_argument("traces", nargs="+", help="JSON files with agent traces")
+    parser.add_argument("--snippet-chars", type=int, default=None)
+    parser.add_argument(
+        "--no-compaction",
+        action="store_true",
+        help="Measure without context compaction, which trims older search results",
+    )
+    args = parser.parse_args()
+
+    projection = SearchProjection.from_env()
+    if args.snippet_chars is not None:
+        projection = replace(projection, snippet_chars=args.snippet_chars)
+    projection = replace(projection, enabled=True)
+    policy = replace(CompactionPolicy.from_env(), enabled=not args.no_compaction)
+
+    total_before, total_after = 0, 0
+    print(f"{'trace':<40} {'raw':>8} {'projected':>10} {'saved':>7}")
+    for path in args.traces:
+        trace = load_trace(path)
+        before = total_tokens(trace, policy)
+        after = total_tokens(project_trace(trace, projection), policy)
+        saved = 1 - after / before if before else 0
+        print(f"{path[-40:]:<40} {before:>8} {after:>10} {saved:>7.1%}")
+        total_before += before
+        total_after += after
+    if total_before:
+        print(
+            f"\nMean estimated input tokens per request: "
+            f"{total_before / len(args.traces):.0f} -> "
+            f"{total_after / len(args.traces):.0f} "
+            f"({1 - total_after / total_before:.1%} saved)"
+        )
+
+
+if __name__ == "__main__":
+    main()
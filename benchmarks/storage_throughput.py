@@ -0,0 +1,128 @@
+# benchmarks/storage_throughput.py
+# Measures the throughput of each storage backend under concurrent writes from the
+# handlers: agents and OCR queue documents from the event loop, and the filters and
+# PII masking submit them from the threadpool. Firestore is replaced by the stand-in
+# of stub_upstreams.py unless --live-firestore is given.
+import argparse
+import asyncio
+import datetime
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from typing import List
+import clients.firestore_db as firestore_db
+from benchmarks.stub_upstreams import StubConfig, StubDatabase
+from clients.storage import StorageConfig
+from clients.write_queue import WriteQueue, WriteQueueConfig
+
+# (collection, written from a thread, document)
+HANDLER_WRITES = (
+    (
+        "agent_calls",
+        False,
+        {
+            "success": True,
+            "report": "The message is very likely a phishing scam. " * 20,
+            "agentTraceRef": {"uri": "gs://traces/agent_traces/id.json.gz"},
+            "model": "gemini-2.0-flash",
+        },
+    ),
+    (
+        "ocr_extractions",
+        False,
+        {"imageUrl": "gs://bucket/image.png", "success": True, "text": "Hello " * 50},
+    ),
+    ("trivial_filters", True, {"messageToCheck": "hi", "success": True}),
+    ("sensitivity_filter", True, {"message": "hello " * 10, "success": True}),
+    ("pii_masks", True, {"originalText": "Call John at 9123 4567", "success": True}),
+)
+
+
+async def handler(queue: WriteQueue, writer: int, writes: int, latencies: List):
+    """Writes documents like a handler serving `writes` requests one after another."""
+    collection, threaded, document = HANDLER_WRITES[writer % len(HANDLER_WRITES)]
+    for i in range(writes):
+        data = {**document, "timestamp": datetime.datetime.now(datetime.timezone.utc)}
+        start_time = time.perf_counter()
+        if threaded:
+            await asyncio.to_thread(queue.submit, collection, f"{writer}-{i}", data)
+        else:
+            await queue.put(collection, f"{writer}-{i}", data)
+        latencies.append(time.perf_counter() - start_time)
+
+
+async def measure(queue: WriteQueue, queued: bool, writers: int, writes: int):
+    latencies = []
+    if queued:
+        queue.start()
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        *(handler(queue, writer, writes, latencies) for writer in range(writers))
+    )
+    await queue.stop()
+    elapsed = time.perf_counter() - start_time
+    latencies.sort()
+    return {
+        "writes_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure storage backend throughput under concurrent writes"
+    )
+    parser.add_argument(
+        "--backends", nargs="+", default=["sqlite", "file", "firestore"]
+    )
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--writes", type=int, default=200, help="Writes per handler")
+    parser.add_argument(
+        "--firestore-latency",
+        type=float,
+        default=0.05,
+        help="Median latency in seconds of a write to the Firestore stand-in",
+    )
+    parser.add_argument("--live-firestore", action="store_true")
+    args = parser.parse_args()
+
+    if not args.live_firestore:
+        stub_config = StubConfig()
+        stub_config.profiles["firestore"] = replace(
+            stub_config.profiles["firestore"], median_latency=args.firestore_latency
+        )
+        stub_db = StubDatabase(stub_config)
+        firestore_db.get_db = lambda: stub_db
+
+    print(
+        f"{'backend':<10} {'mode':<7} {'handlers':>8} {'writes/s':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for backend_name in args.backends:
+            for writers in map(int, args.concurrency.split(",")):
+                for queued in (False, True):
+                    backend = StorageConfig(
+                        backend=backend_name,
+                        sqlite_path=f"{directory}/{backend_name}-{writers}-{queued}.db",
+                        file_path=f"{directory}/{backend_name}-{writers}-{queued}.jsonl",
+                    ).create_backend()
+                    queue = WriteQueue(WriteQueueConfig(), backend)
+                    result = asyncio.run(measure(queue, queued, writers, args.writes))
+                    backend.close()
+                    print(
+                        f"{backend_name:<10} {'queued' if queued else 'direct':<7} "
+                        f"{writers:>8} {result['writes_per_second']:>10.0f} "
+                        f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+                    )
+    print(
+        "\ndirect: each handler writes its documents itself, as without the "
+        "write-behind queue. queued: documents go through the queue, which commits "
+        "them in batches. Latencies are those seen by the handlers."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+# benchmarks/stub_upstreams.py
+# Local stand-ins for every upstream service the API calls: the OpenAI-compatible
+# chat completions API, the Gemini API, Serper, RMSE, the screenshot service, the
+# Google token endpoint, Langfuse and Firestore. Each responds with a configurable
+# latency and error distribution, so that load tests run without network access.
+#
+# The LLM stand-ins follow a fixed script: they infer intent, plan, search, check
+# URLs and take screenshots as often as configured, then submit a report. JSON
+# responses are generated from the requested schema.
+import asyncio
+import base64
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from prompts import (
+    agent,
+    review_report,
+    sensitivity_filter,
+    summarise_report,
+    translation,
+    trivial_filter,
+)
+from utils.token_estimation import estimate_openai_message_tokens, estimate_text_tokens
+
+UPSTREAMS = (
+    "openai",
+    "gemini",
+    "serper",
+    "rmse",
+    "screenshot",
+    "token",
+    "langfuse",
+    "firestore",
+)
+REPORT = (
+    "The message claims to be from a government agency and asks the recipient to "
+    "click a link to claim a cash payout. Searches show no such scheme has been "
+    "announced, and the linked domain was registered recently and imitates an "
+    "official domain. The message is therefore very likely a phishing scam. "
+) * 3
+
+
+@dataclass(frozen=True)
+class UpstreamProfile:
+    """The latency and error distribution of a stand-in upstream.
+
+    Attributes:
+        median_latency: Median response time in seconds. Latencies are log-normally
+            distributed around it.
+        sigma: Shape of the log-normal distribution. 0 makes latency constant.
+        error_rate: Share of requests that fail with `error_status`.
+        error_status: HTTP status of failed requests.
+    """
+
+    median_latency: float = 0.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    error_status: int = 500
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.median_latency <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median_latency
+        return rng.lognormvariate(0, self.sigma) * self.median_latency
+
+
+DEFAULT_PROFILES = {
+    "openai": UpstreamProfile(median_latency=1.5),
+    "gemini": UpstreamProfile(median_latency=1.0),
+    "serper": UpstreamProfile(median_latency=0.4),
+    "rmse": UpstreamProfile(median_latency=0.8),
+    "screenshot": UpstreamProfile(median_latency=3.0),
+    "token": UpstreamProfile(median_latency=0.05),
+    "langfuse": UpstreamProfile(median_latency=0.05),
+    "firestore": UpstreamProfile(median_latency=0.05),
+}
+
+
+@dataclass
+class StubConfig:
+    """Configures the stand-ins.
+
+    Attributes:
+        profiles: The latency and error distribution of each upstream.
+        searches: Number of searches the scripted agent makes before submitting.
+        url_checks: Number of RMSE checks the scripted agent makes.
+        screenshots: Number of screenshots the scripted agent takes.
+        seed: Seed of the random number generator, so that runs are comparable.
+    """
+
+    profiles: Dict[str, UpstreamProfile] = field(
+        default_factory=lambda: dict(DEFAULT_PROFILES)
+    )
+    searches: int = 2
+    url_checks: int = 1
+    screenshots: int = 1
+    seed: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StubConfig":
+        profiles = dict(DEFAULT_PROFILES)
+        for name, profile in data.get("profiles", {}).items():
+            if name not in UPSTREAMS:
+                raise ValueError(f"Unknown upstream: {name}")
+            profiles[name] = UpstreamProfile(**profile)
+        return cls(
+            profiles=profiles,
+            **{key: value for key, value in data.items() if key != "profiles"},
+        )
+
+    def scaled(self, latency_scale: float) -> "StubConfig":
+        return StubConfig(
+            profiles={
+                name: UpstreamProfile(
+                    median_latency=profile.median_latency * latency_scale,
+                    sigma=profile.sigma,
+                    error_rate=profile.error_rate,
+                    error_status=profile.error_status,
+                )
+                for name, profile in self.profiles.items()
+            },
+            searches=self.searches,
+            url_checks=self.url_checks,
+            screenshots=self.screenshots,
+            seed=self.seed,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "profiles": {
+                name: profile.__dict__ for name, profile in self.profiles.items()
+            },
+            "searches": self.searches,
+            "url_checks": self.url_checks,
+            "screenshots": self.screenshots,
+            "seed": self.seed,
+        }
+
+
+def example_value(name: str, schema: dict):
+    """Returns a plausible value for a JSON (or Gemini OpenAPI) schema."""
+    schema_type = str(schema.get("type", "string")).lower()
+    if schema.get("enum") or schema.get("values"):
+        return (schema.get("enum") or schema.get("values"))[0]
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        required = schema.get("required", list(properties))
+        return {key: example_value(key, properties[key]) for key in required}
+    if schema_type == "array":
+        return [example_value(name, schema.get("items", {}))]
+    if schema_type == "boolean":
+        return True
+    if schema_type in ("integer", "number"):
+        return 1
+    if name in ("url", "urls", "sources"):
+        return "https://example.com/claim"
+    if name in ("q", "queries"):
+        return "government cash payout scheme"
+    if name in ("report", "community_note", "feedback", "reasoning"):
+        return REPORT
+    return f"stub {name}"
+
+
+def choose_function(offered: list, called: dict, config: StubConfig) -> str:
+    """Picks the next function to call, following the agent script."""
+    if len(offered) == 1:
+        return offered[0]
+    for name in ("infer_intent", "plan_next_step"):
+        if name in offered and not called.get(name):
+            return name
+    for name, limit in (
+        ("search_google", config.searches),
+        ("check_malicious_url", config.url_checks),
+        ("get_website_screenshot", config.screenshots),
+    ):
+        if name in offered and called.get(name, 0) < limit:
+            return name
+    if "submit_report_for_review" in offered:
+        return "submit_report_for_review"
+    return offered[0]
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    call_ids = itertools.count()
+    app.state.request_counts = {name: 0 for name in UPSTREAMS}
+
+    async def respond(upstream: str, body) -> JSONResponse:
+        profile = config.profiles[upstream]
+        app.state.request_counts[upstream] += 1
+        await asyncio.sleep(profile.sample_latency(rng))
+        if rng.random() < profile.error_rate:
+            return JSONResponse(
+                {"error": {"message": f"stub {upstream} error", "type": "stub"}},
+                status_code=profile.error_status,
+            )
+        return JSONResponse(body)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        messages = payload.get("messages", [])
+        tools = payload.get("tools") or []
+        message = {"role": "assistant", "content": None}
+        if tools:
+            called = {}
+            for previous in messages:
+                for tool_call in previous.get("tool_calls") or []:
+                    name = tool_call["function"]["name"]
+                    called[name] = called.get(name, 0) + 1
+            definitions = {tool["function"]["name"]: tool["function"] for tool in tools}
+            name = choose_function(list(definitions), called, config)
+            arguments = example_value(name, definitions[name]["parameters"])
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{next(call_ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+            ]
+            finish_reason = "tool_calls"
+        else:
+            response_format = payload.get("response_format") or {}
+            schema = response_format.get("json_schema", {}).get("schema")
+            message["content"] = (
+                json.dumps(example_value("response", schema)) if schema else REPORT
+            )
+            finish_reason = "stop"
+        prompt_tokens = estimate_openai_message_tokens(messages)
+        completion_tokens = estimate_text_tokens(json.dumps(message))
+        return await respond(
+            "openai",
+            {
+                "id": f"chatcmpl-{next(call_ids)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {"index": 0, "message": message, "finish_reason": finish_reason}
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+    @app.post("/{api_version}/models/{model_action}")
+    async def generate_content(api_version: str, model_action: str, request: Request):
+        payload = await request.json()
+        called = {}
+        for content in payload.get("contents", []):
+            for part in content.get("parts", []):
+                function_call = part.get("functionCall") or part.get("function_call")
+                if function_call:
+                    name = function_call["name"]
+                    called[name] = called.get(name, 0) + 1
+        definitions = {
+            definition["name"]: definition
+            for tool in payload.get("tools", [])
+            for definition in tool.get("functionDeclarations")
+            or tool.get("function_declarations")
+            or []
+        }
+        calling_config = (payload.get("toolConfig") or {}).get(
+            "functionCallingConfig"
+        ) or {}
+        offered = calling_config.get("allowedFunctionNames") or list(definitions)
+        name = choose_function(offered, called, config)
+        part = {
+            "functionCall": {
+                "name": name,
+                "args": example_value(name, definitions[name].get("parameters", {})),
+            }
+        }
+        return await respond(
+            "gemini",
+            {
+                "candidates": [
+                    {
+                        "content": {"role": "model", "parts": [part]},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": estimate_text_tokens(json.dumps(payload)),
+                    "candidatesTokenCount": estimate_text_tokens(json.dumps(part)),
+                },
+            },
+        )
+
+    @app.post("/search")
+    async def search(request: Request):
+        payload = await request.json()
+        organic = [
+            {
+                "title": f"Result {position} for {payload.get('q')}",
+                "link": f"https://example.com/result/{position}",
+                "snippet": REPORT[:160],
+                "position": position,
+            }
+            for position in range(1, 11)
+        ]
+        return await respond("serper", {"organic": organic})
+
+    @app.post("/evaluate")
+    async def evaluate(request: Request):
+        return await respond(
+            "rmse",
+            {
+                "success": True,
+                "overall_result": {"classification": "MALICIOUS", "score": 0.9},
+            },
+        )
+
+    @app.post("/get-screenshot")
+    async def get_screenshot(request: Request):
+        return await respond(
+            "screenshot",
+            {"success": True, "result": "https://storage.googleapis.com/stub/s.png"},
+        )
+
+    @app.post("/token")
+    async def token(request: Request):
+        return await respond("token", {"id_token": make_unsigned_jwt()})
+
+    @app.get("/api/public/v2/prompts/{name}")
+    async def get_prompt(name: str):
+        return await respond("langfuse", get_stub_prompt(name))
+
+    @app.post("/api/public/ingestion")
+    async def ingestion(request: Request):
+        return await respond("langfuse", {"successes": [], "errors": []})
+
+    return app
+
+
+def make_unsigned_jwt(lifetime: int = 3600) -> str:
+    """Returns an identity token that google-auth can decode without verifying."""
+
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    payload = {"exp": int(time.time()) + lifetime, "iat": int(time.time())}
+    return f"{encode({'alg': 'RS256', 'typ': 'JWT'})}.{encode(payload)}.c3R1Yg"
+
+
+def get_stub_prompt(name: str) -> dict:
+    """Serves the prompts defined in prompts/ as Langfuse would."""
+    chat_prompts = {
+        "review_report": (review_report.compile_messages_array(), review_report.config),
+        "sensitivity_filter": (
+            sensitivity_filter.compile_messages_array(),
+            sensitivity_filter.config,
+        ),
+        "summarise_report": (
+            summarise_report.compile_messages_array(),
+            summarise_report.config,
+        ),
+        "summarise_report_bilingual": (
+            summarise_report.compile_messages_array(bilingual=True),
+            summarise_report.bilingual_config,
+        ),
+        "translation": (translation.compile_messages_array(), translation.config),
+        "trivial_filter": (
+            trivial_filter.compile_messages_array(),
+            trivial_filter.config,
+        ),
+    }
+    prompt = {"name": name, "version": 1, "labels": ["production"], "tags": []}
+    if name in chat_prompts:
+        messages, config = chat_prompts[name]
+        return {**prompt, "type": "chat", "prompt": messages, "config": config}
+    if name == "agent_system_prompt":
+        return {
+            **prompt,
+            "type": "text",
+            "prompt": agent.agent_system_prompt,
+            "config": {},
+        }
+    return {**prompt, "type": "text", "prompt": f"stub {name} prompt", "config": {}}
+
+
+class StubDatabase:
+    """In-memory stand-in for the Firestore client. Writes block for the latency
+    configured for "firestore", like the synchronous Firestore client does."""
+
+    def __init__(self, config: StubConfig):
+        self.profile = config.profiles["firestore"]
+        self.rng = random.Random(config.seed)
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def collection(self, name: str):
+        return StubCollection(self, name)
+
+    def batch(self):
+        return StubBatch(self)
+
+    def write(self, collection: str, document_id: str, data: dict):
+        self.write_all([(collection, document_id, data)])
+
+    def write_all(self, writes: list):
+        """Writes several documents in one round trip, like a batch commit."""
+        with self.lock:
+            latency = self.profile.sample_latency(self.rng)
+            failed = self.rng.random() < self.profile.error_rate
+        time.sleep(latency)
+        if failed:
+            raise RuntimeError("stub firestore error")
+        with self.lock:
+            for collection, document_id, data in writes:
+                self.documents[(collection, document_id)] = data
+
+
+class StubBatch:
+    def __init__(self, db: StubDatabase):
+        self.db = db
+        self.writes = []
+
+    def set(self, document: "StubDocument", data: dict):
+        self.writes.append((document.collection, document.document_id, data))
+
+    def commit(self):
+        self.db.write_all(self.writes)
+
+
+class StubCollection:
+    def __init__(self, db: StubDatabase, name: str):
+        self.db = db
+        self.name = name
+
+    def document(self, document_id: str):
+        return StubDocument(self.db, self.name, document_id)
+
+
+class StubDocument:
+    def __init__(self, db: StubDatabase, collection: str, document_id: str):
+        self.db = db
+        self.collection = collection
+        self.document_id = document_id
+
+    def set(self, data: dict):
+        self.db.write(self.collection, self.document_id, data)
+
+
+class StubServer:
+    """Runs the stand-ins on a local port in a background thread."""
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+        self.app = create_stub_app(config)
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                self.app, host=host, port=port, log_level="warning", lifespan="off"
+            )
+        )
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,73 @@
+# benchmarks/tool_concurrency.py
+# Runs many search_google calls concurrently against the local Serper stand-in, and
+# compares event-loop lag and wall time between the previous blocking requests
+# implementation and the shared async HTTP client.
+import argparse
+import asyncio
+import json
+import os
+import time
+import requests
+from benchmarks.load_test import LagMonitor, configure_environment, percentile
+from benchmarks.stub_upstreams import StubConfig, StubServer, UpstreamProfile
+
+
+async def blocking_search(q):
+    """The previous implementation, which blocked the event loop on each request."""
+    response = requests.request(
+        "POST",
+        os.environ["SERPER_URL"],
+        headers={"X-API-KEY": os.environ.get("SERPER_API_KEY")},
+        data=json.dumps({"q": q, "location": "Singapore", "gl": "sg"}),
+    )
+    return {"result": response.json().get("organic")}
+
+
+async def measure(search, calls: int) -> dict:
+    await search("warm up")
+    monitor = LagMonitor()
+    monitor.start()
+    await asyncio.sleep(0)  # let the monitor start its first interval
+    start_time = time.perf_counter()
+    await asyncio.gather(*(search(f"query {index}") for index in range(calls)))
+    elapsed = time.perf_counter() - start_time
+    await monitor.stop()
+    return {
+        "wall_time_s": elapsed,
+        "loop_lag_p99_ms": percentile(monitor.lags, 99) * 1000,
+        "loop_lag_max_ms": max(monitor.lags, default=0.0) * 1000,
+    }
+
+
+async def run(calls: int):
+    # imported after the environment points Serper at the stand-in
+    from tools.search_google import search_google
+
+    for name, search in (("blocking", blocking_search), ("shared", search_google)):
+        results = await measure(search, calls)
+        print(
+            f"{name:>9}: {calls} calls in {results['wall_time_s']:.2f} s, "
+            f"loop lag p99 {results['loop_lag_p99_ms']:.1f} ms, "
+            f"max {results['loop_lag_max_ms']:.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare blocking and shared async HTTP clients for tool calls"
+    )
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    config = StubConfig()
+    config.profiles["serper"] = UpstreamProfile(median_latency=args.latency, sigma=0)
+    config.profiles["langfuse"] = UpstreamProfile()
+    stub_server = StubServer(config).start()
+    configure_environment(stub_server.url, credentials_path="")
+    asyncio.run(run(args.calls))
+    stub_server.stop()
+
+
+if __name__ == "__main__":
+    main()
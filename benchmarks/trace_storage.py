@@ -0,0 +1,114 @@
+# benchmarks/trace_storage.py
+# Reports the size and time of writing agent_calls documents with their agent trace
+# inline, as before, and with the trace stored out of line as a compressed blob.
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from typing import List
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.types import Document
+from benchmarks.context_compaction import load_trace
+from clients.trace_store import TraceStorage, TraceStorageConfig
+
+
+def synthetic_trace(searches: int, seed: int = 0) -> List[dict]:
+    """Returns an OpenAI-style trace with the given number of search_google calls."""
+    rng = random.Random(seed)
+    words = "scam bank account transfer police singapore verify link urgent".split()
+    trace = [{"role": "user", "content": "Is this message a scam? " * 20}]
+    for i in range(searches):
+        call_id = f"call_{i}"
+        trace.append(
+            {
+                "role": "assistant",
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {"name": "search_google", "arguments": "{}"},
+                    }
+                ],
+            }
+        )
+        results = [
+            {
+                "title": " ".join(rng.choices(words, k=8)),
+                "link": f"https://example.com/{rng.randrange(10**6)}",
+                "snippet": " ".join(rng.choices(words, k=40)),
+            }
+            for _ in range(10)
+        ]
+        trace.append(
+            {"role": "tool", "tool_call_id": call_id, "content": json.dumps(results)}
+        )
+    return trace
+
+
+def write_size(document: dict) -> int:
+    """Returns the encoded size of a document as sent to Firestore."""
+    encoded = Document(fields=_helpers.encode_dict(document))
+    return Document.pb(encoded).ByteSize()
+
+
+async def benchmark(trace: List[dict], storage: TraceStorage, iterations: int):
+    document = {"requestId": "benchmark", "success": True, "agentTrace": trace}
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        inline_bytes = write_size(document)
+    inline_seconds = (time.perf_counter() - start_time) / iterations
+
+    start_time = time.perf_counter()
+    for i in range(iterations):
+        offloaded = await storage.offload(f"benchmark-{i}", document)
+        document_bytes = write_size(offloaded)
+    offloaded_seconds = (time.perf_counter() - start_time) / iterations
+    blob_bytes = offloaded["agentTraceRef"]["storedBytes"]
+    return inline_bytes, inline_seconds, document_bytes, blob_bytes, offloaded_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare writing agent traces inline and out of line"
+    )
+    parser.add_argument(
+        "traces",
+        nargs="*",
+        help="JSON files with agent traces. Defaults to synthetic traces",
+    )
+    parser.add_argument("--codec", choices=["gzip", "zstd"], default="gzip")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.traces:
+        traces = [(path[-30:], load_trace(path)) for path in args.traces]
+    else:
+        traces = [(f"{n} searches", synthetic_trace(n)) for n in (1, 4, 16)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = TraceStorage(
+            TraceStorageConfig(backend="local", directory=directory, codec=args.codec)
+        )
+        print(
+            f"{'trace':<30} {'inline':>10} {'ms':>7} "
+            f"{'document':>10} {'blob':>9} {'ms':>7}"
+        )
+        for name, trace in traces:
+            inline_bytes, inline_seconds, document_bytes, blob_bytes, seconds = (
+                asyncio.run(benchmark(trace, storage, args.iterations))
+            )
+            print(
+                f"{name:<30} {inline_bytes:>10} {inline_seconds * 1000:>7.2f} "
+                f"{document_bytes:>10} {blob_bytes:>9} {seconds * 1000:>7.2f}"
+            )
+    print(
+        "\ninline: document bytes and encode time with the trace inline. document, "
+        "blob: bytes written to Firestore and to the trace store, with the time to "
+        "compress and store the trace and encode the document."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,15 @@
+import functools
 from google.cloud import firestore
+from metrics import FIRESTORE_WRITE_LATENCY, track_latency
 
-db = firestore.Client(database="checkmate-ml")
+
+@functools.lru_cache(maxsize=None)
+def get_db():
+    """Returns the shared Firestore client, creating it on first use."""
+    return firestore.Client(database="checkmate-ml")
+
+
+def save_document(collection: str, document_id: str, data: dict):
+    """Sets a document in the given collection, recording the write latency."""
+    with track_latency(FIRESTORE_WRITE_LATENCY, collection=collection):
+        get_db().collection(collection).document(document_id).set(data)
@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import functools
 import time
 from logger import StructuredLogger
+from metrics import LLM_CALL_LATENCY, track_latency
 from langfuse.decorators import observe, langfuse_context
 
 logger = StructuredLogger("gemini_client")
@@ -52,8 +53,15 @@ def retry_once_per_model(wait_time=2, fallback_models=None):
     return decorator
 
 
-# Initialize the gemini client
-gemini_client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+# Initialize the gemini client. GEMINI_BASE_URL points it at a proxy or stand-in.
+gemini_client = genai.Client(
+    api_key=os.environ.get("GOOGLE_API_KEY"),
+    http_options=(
+        {"base_url": os.environ["GEMINI_BASE_URL"]}
+        if os.environ.get("GEMINI_BASE_URL")
+        else None
+    ),
+)
 
 
 # Preserve a reference to the original method
@@ -64,7 +72,10 @@ original_generate_content = gemini_client.models.generate_content
 @observe(as_type="generation", capture_output=False)
 def generate_content_with_custom_observation(*args, **kwargs):
     # Call the original method using the preserved reference
-    response = original_generate_content(*args, **kwargs)
+    with track_latency(
+        LLM_CALL_LATENCY, provider="gemini", model=kwargs.get("model", "unknown")
+    ):
+        response = original_generate_content(*args, **kwargs)
     # Update the current observation with custom input and output
     langfuse_context.update_current_observation(output=response.candidates[0].content)
     if kwargs.get("langfuse_prompt"):
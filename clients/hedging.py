@@ -0,0 +1,170 @@
+# clients/hedging.py
+# Hedged requests for short, idempotent LLM calls such as translation and
+# summarisation. If a call has not returned by a percentile of the latencies
+# observed at its call site, a duplicate request is sent, optionally to a
+# secondary provider, and whichever finishes first wins.
+import asyncio
+import functools
+import os
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+from clients.openai import get_async_openai_client
+from logger import StructuredLogger
+from metrics import HEDGED_LLM_CALLS
+from models import SupportedModelProvider
+
+logger = StructuredLogger("hedging")
+
+
+@dataclass(frozen=True)
+class HedgingPolicy:
+    """Configures when hedge requests are sent.
+
+    Attributes:
+        enabled: Whether to hedge at all.
+        percentile: Percentile of the observed latency after which a hedge is sent.
+        max_hedge_rate: Maximum share of recent calls at a call site that may be
+            hedged, which bounds the extra cost.
+        min_samples: Number of latencies to observe at a call site before hedging.
+        window_size: Number of recent calls kept per call site.
+        secondary_provider: Provider to send hedge requests to. Defaults to the
+            provider of the original request.
+        secondary_model: Model to use with the secondary provider.
+    """
+
+    enabled: bool = False
+    percentile: float = 95.0
+    max_hedge_rate: float = 0.1
+    min_samples: int = 20
+    window_size: int = 200
+    secondary_provider: Optional[SupportedModelProvider] = None
+    secondary_model: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "HedgingPolicy":
+        secondary_provider = os.getenv("LLM_HEDGING_SECONDARY_PROVIDER")
+        return cls(
+            enabled=os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true",
+            percentile=float(os.getenv("LLM_HEDGING_PERCENTILE", 95.0)),
+            max_hedge_rate=float(os.getenv("LLM_HEDGING_MAX_RATE", 0.1)),
+            min_samples=int(os.getenv("LLM_HEDGING_MIN_SAMPLES", 20)),
+            window_size=int(os.getenv("LLM_HEDGING_WINDOW_SIZE", 200)),
+            secondary_provider=(
+                SupportedModelProvider(secondary_provider)
+                if secondary_provider
+                else None
+            ),
+            secondary_model=os.getenv("LLM_HEDGING_SECONDARY_MODEL"),
+        )
+
+
+class CallSiteStats:
+    """Recent latencies and hedging decisions of a single call site."""
+
+    def __init__(self, window_size: int):
+        self.latencies = deque(maxlen=window_size)
+        self.hedged = deque(maxlen=window_size)
+
+    def record_latency(self, latency: float):
+        self.latencies.append(latency)
+
+    def record_call(self, hedged: bool):
+        self.hedged.append(hedged)
+
+    def hedge_delay(self, percentile: float, min_samples: int) -> Optional[float]:
+        """Returns the observed latency percentile, or None if too few samples."""
+        if len(self.latencies) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+    def can_hedge(self, max_hedge_rate: float) -> bool:
+        return sum(self.hedged) < max_hedge_rate * len(self.hedged)
+
+
+class Hedger:
+    """Runs calls with hedging, tracking latencies separately for each call site."""
+
+    def __init__(self, policy: HedgingPolicy):
+        self.policy = policy
+        self.stats = defaultdict(lambda: CallSiteStats(policy.window_size))
+
+    async def run(
+        self,
+        call_site: str,
+        primary: Callable[[], Awaitable],
+        hedge: Optional[Callable[[], Awaitable]] = None,
+    ):
+        """Awaits `primary()`, sending `hedge()` if it is slow, and returns the first
+        successful result. The losing attempt is cancelled. If both attempts fail,
+        the exception of the primary attempt is raised.
+        """
+        stats = self.stats[call_site]
+        primary_start_time = time.perf_counter()
+        attempts = {asyncio.ensure_future(primary()): "primary"}
+        hedged = False
+        try:
+            delay = stats.hedge_delay(self.policy.percentile, self.policy.min_samples)
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and stats.can_hedge(self.policy.max_hedge_rate):
+                    hedged = True
+                    attempt = asyncio.ensure_future((hedge or primary)())
+                    attempts[attempt] = "hedge"
+                    logger.info(
+                        "Sending hedge request", call_site=call_site, delay=delay
+                    )
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    if attempt.exception() is not None:
+                        continue
+                    # Measured from the primary's start whichever attempt wins: the
+                    # primary's latency, or if the hedge won, a lower bound of it.
+                    # Recording only the hedge's latency would drop the slow tail
+                    # the delay is estimated from.
+                    stats.record_latency(time.perf_counter() - primary_start_time)
+                    if hedged:
+                        HEDGED_LLM_CALLS.labels(
+                            call_site=call_site, winner=attempts[attempt]
+                        ).inc()
+                    return attempt.result()
+            return next(iter(attempts)).result()
+        finally:
+            stats.record_call(hedged)
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+
+hedger = Hedger(HedgingPolicy.from_env())
+
+
+async def create_chat_completion(
+    call_site: str, provider=SupportedModelProvider.OPENAI, **kwargs
+):
+    """Creates a chat completion, hedged if enabled in the hedging policy.
+
+    Only use this for idempotent, deterministic calls, since a hedged call may be
+    sent twice. If a secondary provider is configured, it must accept the same
+    request, e.g. the same response_format.
+    """
+    client = get_async_openai_client(provider)
+    primary = functools.partial(client.chat.completions.create, **kwargs)
+    policy = hedger.policy
+    if not policy.enabled:
+        return await primary()
+    hedge = None
+    if policy.secondary_provider is not None:
+        secondary_client = get_async_openai_client(policy.secondary_provider)
+        hedge = functools.partial(
+            secondary_client.chat.completions.create,
+            **{**kwargs, "model": policy.secondary_model or kwargs.get("model")},
+        )
+    return await hedger.run(call_site, primary, hedge)
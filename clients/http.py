@@ -0,0 +1,121 @@
+# clients/http.py
+# The process-wide async HTTP client used by the tools. Sharing one client keeps
+# connections alive across calls instead of opening a new TCP/TLS connection for
+# each, and avoids blocking the event loop with synchronous requests.
+import asyncio
+import importlib.util
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+
+DEFAULT_HOST_TIMEOUTS = {"google.serper.dev": 10.0}
+
+
+@dataclass(frozen=True)
+class HttpClientConfig:
+    """Configures the shared HTTP client.
+
+    Attributes:
+        max_connections: Maximum number of concurrent connections.
+        max_keepalive_connections: Maximum number of idle connections kept alive.
+        keepalive_expiry: Seconds an idle connection is kept alive.
+        timeout: Default timeout in seconds for each request.
+        connect_timeout: Timeout in seconds for establishing a connection.
+        host_timeouts: Timeouts in seconds that override the default for a host.
+        http2: Whether to negotiate HTTP/2. Only used if the h2 package is installed.
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+    host_timeouts: Dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_HOST_TIMEOUTS)
+    )
+    http2: bool = True
+
+    @classmethod
+    def from_env(cls) -> "HttpClientConfig":
+        host_timeouts = dict(DEFAULT_HOST_TIMEOUTS)
+        # e.g. HTTP_HOST_TIMEOUTS='{"screenshot.example.com": 90}'
+        host_timeouts.update(json.loads(os.getenv("HTTP_HOST_TIMEOUTS", "{}")))
+        return cls(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30.0)),
+            timeout=float(os.getenv("HTTP_TIMEOUT", 60.0)),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", 5.0)),
+            host_timeouts=host_timeouts,
+            http2=os.getenv("HTTP_HTTP2", "true").lower() == "true",
+        )
+
+    def timeout_for(self, url: str) -> httpx.Timeout:
+        host = urlsplit(str(url)).hostname
+        timeout = self.host_timeouts.get(host, self.timeout)
+        return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+
+
+class SharedHttpClient:
+    """An httpx.AsyncClient shared by every tool in the process.
+
+    The underlying client is created on first use. Since connections belong to the
+    event loop they were opened on, a new client is created if it is used from a
+    different loop, e.g. across asyncio.run calls in scripts and tests.
+    """
+
+    def __init__(self, config: HttpClientConfig):
+        self.config = config
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.config.http2 and importlib.util.find_spec("h2") is not None
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                self.config.timeout, connect=self.config.connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._create_client()
+            self._loop = loop
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends a request, using the timeout configured for the host by default."""
+        kwargs.setdefault("timeout", self.config.timeout_for(url))
+        return await self.client.request(method, url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs):
+        """Returns a context manager yielding the response before its body is read,
+        see httpx.AsyncClient.stream."""
+        kwargs.setdefault("timeout", self.config.timeout_for(url))
+        return self.client.stream(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+http_client = SharedHttpClient(HttpClientConfig.from_env())
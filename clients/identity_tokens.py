@@ -0,0 +1,137 @@
+# clients/identity_tokens.py
+# Caches the Google identity tokens used to call private Cloud Run services such as
+# the screenshot service. Tokens are fetched once per audience and refreshed in the
+# background shortly before they expire, so requests rarely wait for a fetch.
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from google.auth import jwt
+from google.auth.transport.requests import Request
+from google.oauth2.id_token import fetch_id_token
+from logger import StructuredLogger
+from metrics import IDENTITY_TOKEN_FETCH_LATENCY, IDENTITY_TOKEN_REQUESTS, track_latency
+
+logger = StructuredLogger("identity_tokens")
+
+
+@dataclass(frozen=True)
+class IdentityTokenPolicy:
+    """Configures how identity tokens are cached.
+
+    Attributes:
+        refresh_ahead: Seconds before expiry at which a cached token is refreshed in
+            the background, while it is still being served.
+        expiry_margin: Seconds before expiry after which a cached token is no longer
+            served, and callers wait for a new one.
+        default_lifetime: Lifetime assumed for tokens whose expiry can't be read.
+    """
+
+    refresh_ahead: float = 300.0
+    expiry_margin: float = 30.0
+    default_lifetime: float = 3600.0
+
+    @classmethod
+    def from_env(cls) -> "IdentityTokenPolicy":
+        return cls(
+            refresh_ahead=float(os.getenv("IDENTITY_TOKEN_REFRESH_AHEAD", 300.0)),
+            expiry_margin=float(os.getenv("IDENTITY_TOKEN_EXPIRY_MARGIN", 30.0)),
+        )
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    token: str
+    expires_at: float  # time.time() at which the token expires
+
+
+def fetch_token(audience: str) -> str:
+    """Fetches an identity token from the metadata server or the OAuth endpoint."""
+    return fetch_id_token(Request(), audience)
+
+
+class IdentityTokenProvider:
+    """Serves identity tokens per audience from a cache, fetching each at most once
+    at a time. Safe to use from concurrent tasks.
+    """
+
+    def __init__(
+        self,
+        policy: IdentityTokenPolicy,
+        fetch: Callable[[str], str] = fetch_token,
+    ):
+        self.policy = policy
+        self.fetch = fetch
+        self._tokens: Dict[str, CachedToken] = {}
+        self._fetches: Dict[str, asyncio.Task] = {}
+
+    def expiry_of(self, token: str) -> float:
+        try:
+            return float(jwt.decode(token, verify=False)["exp"])
+        except (ValueError, KeyError):
+            return time.time() + self.policy.default_lifetime
+
+    async def _fetch(self, audience: str, path: str) -> CachedToken:
+        with track_latency(IDENTITY_TOKEN_FETCH_LATENCY, path=path):
+            token = await asyncio.to_thread(self.fetch, audience)
+        cached = CachedToken(token, self.expiry_of(token))
+        self._tokens[audience] = cached
+        return cached
+
+    def _start_fetch(self, audience: str, path: str) -> asyncio.Task:
+        """Returns the fetch in progress for the audience, starting one if needed."""
+        task = self._fetches.get(audience)
+        if (
+            task is None
+            or task.done()
+            or task.get_loop() is not asyncio.get_running_loop()
+        ):
+            task = asyncio.create_task(self._fetch(audience, path))
+            task.add_done_callback(lambda task: self._fetch_done(audience, task))
+            self._fetches[audience] = task
+        return task
+
+    def _fetch_done(self, audience: str, task: asyncio.Task):
+        if self._fetches.get(audience) is task:
+            del self._fetches[audience]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warn(
+                "Failed to fetch identity token",
+                audience=audience,
+                error=str(task.exception()),
+            )
+
+    async def get_token(self, audience: str) -> str:
+        """Returns a valid identity token for the audience."""
+        cached = self._tokens.get(audience)
+        remaining = cached.expires_at - time.time() if cached else 0.0
+        if remaining > self.policy.expiry_margin:
+            if remaining <= self.policy.refresh_ahead:
+                IDENTITY_TOKEN_REQUESTS.labels(result="refreshing").inc()
+                self._start_fetch(audience, "background")
+            else:
+                IDENTITY_TOKEN_REQUESTS.labels(result="hit").inc()
+            return cached.token
+        IDENTITY_TOKEN_REQUESTS.labels(result="miss").inc()
+        # shielded, so that a cancelled caller doesn't cancel the fetch for the others
+        cached = await asyncio.shield(self._start_fetch(audience, "critical"))
+        return cached.token
+
+    async def aclose(self):
+        for task in list(self._fetches.values()):
+            task.cancel()
+        self._fetches.clear()
+
+
+identity_tokens = IdentityTokenProvider(IdentityTokenPolicy.from_env())
+
+
+async def warm_up_identity_token(audience: Optional[str]):
+    """Fetches the token for the audience ahead of the first request, if configured."""
+    if not audience:
+        return
+    try:
+        await identity_tokens.get_token(audience)
+    except Exception as e:
+        logger.warn("Failed to warm up identity token", audience=audience, error=str(e))
@@ -0,0 +1,7 @@
+from langfuse import Langfuse
+
+# Shared Langfuse client, used to fetch prompts. Each client starts its own background
+# flushing thread, so it should be created once per process rather than per request.
+langfuse = Langfuse()
+
+__all__ = ["langfuse"]
@@ -1,12 +1,41 @@
-from langfuse.openai import OpenAI
+from langfuse.openai import AsyncOpenAI, OpenAI
+import functools
 import os
 from logger import StructuredLogger
 from models import SupportedModelProvider
+from metrics import LLM_CALL_LATENCY, track_latency
 
 logger = StructuredLogger("openai_client")
 
 
-def create_openai_client(provider=SupportedModelProvider.OPENAI):
+def observe_llm_latency(create, provider: str):
+    """Wraps a chat completions `create` method to record its latency per model."""
+
+    @functools.wraps(create)
+    def wrapper(*args, **kwargs):
+        with track_latency(
+            LLM_CALL_LATENCY, provider=provider, model=kwargs.get("model", "unknown")
+        ):
+            return create(*args, **kwargs)
+
+    return wrapper
+
+
+def observe_async_llm_latency(create, provider: str):
+    """Async counterpart of observe_llm_latency, for AsyncOpenAI clients."""
+
+    @functools.wraps(create)
+    async def wrapper(*args, **kwargs):
+        with track_latency(
+            LLM_CALL_LATENCY, provider=provider, model=kwargs.get("model", "unknown")
+        ):
+            return await create(*args, **kwargs)
+
+    return wrapper
+
+
+def get_provider_credentials(provider=SupportedModelProvider.OPENAI):
+    """Returns the API key and base URL configured for an OpenAI-compatible provider."""
     if provider == SupportedModelProvider.OPENAI:
         api_key = os.getenv("OPENAI_API_KEY")
         base_url = None
@@ -18,9 +47,42 @@ def create_openai_client(provider=SupportedModelProvider.OPENAI):
         base_url = os.getenv("GROQ_BASE_URL")
     else:
         raise ValueError(f"Unsupported model provider: {provider}")
+    return api_key, base_url
+
+
+def create_openai_client(provider=SupportedModelProvider.OPENAI):
+    api_key, base_url = get_provider_credentials(provider)
     client = OpenAI(api_key=api_key, base_url=base_url)
+    client.chat.completions.create = observe_llm_latency(
+        client.chat.completions.create, SupportedModelProvider(provider).value
+    )
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client(provider=SupportedModelProvider.OPENAI):
+    """Returns the long-lived client for the given provider, creating it on first use.
+
+    Clients hold a connection pool, so they should be reused across requests rather
+    than created per request.
+    """
+    return create_openai_client(provider)
+
+
+def create_async_openai_client(provider=SupportedModelProvider.OPENAI):
+    api_key, base_url = get_provider_credentials(provider)
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    client.chat.completions.create = observe_async_llm_latency(
+        client.chat.completions.create, SupportedModelProvider(provider).value
+    )
     return client
 
 
+@functools.lru_cache(maxsize=None)
+def get_async_openai_client(provider=SupportedModelProvider.OPENAI):
+    """Returns the long-lived async client for the given provider."""
+    return create_async_openai_client(provider)
+
+
 # Default client for backward compatibility
-openai_client = create_openai_client()
+openai_client = get_openai_client(SupportedModelProvider.OPENAI)
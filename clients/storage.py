@@ -0,0 +1,211 @@
+# clients/storage.py
+# Stores the documents the service keeps: agent calls, filter and PII mask results and
+# OCR extractions. The backend is selected with STORAGE_BACKEND: Firestore in
+# production, or an embedded SQLite database to run without GCP credentials, e.g. on
+# premises, locally or in benchmarks.
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional
+from google.api_core import exceptions
+import clients.firestore_db as firestore_db
+from metrics import FIRESTORE_WRITE_LATENCY, track_latency
+
+
+@dataclass(frozen=True)
+class PendingWrite:
+    collection: str
+    document_id: str
+    data: dict
+
+
+class StorageBackend(ABC):
+    """Stores documents by collection and ID. Called from a worker thread."""
+
+    @abstractmethod
+    def write_batch(self, writes: List[PendingWrite]):
+        """Stores every document of the batch, replacing existing ones, or raises."""
+
+    @abstractmethod
+    def get(self, collection: str, document_id: str) -> Optional[dict]:
+        """Returns a document, or None if it doesn't exist."""
+
+    def is_transient(self, error: Exception) -> bool:
+        """Returns whether a failed write may succeed if retried, rather than being
+        rejected for its contents."""
+        return not isinstance(error, (ValueError, TypeError))
+
+    def close(self):
+        """Releases the backend's connections."""
+
+
+class FirestoreBackend(StorageBackend):
+    """Commits each batch as one Firestore batch write."""
+
+    def write_batch(self, writes: List[PendingWrite]):
+        db = firestore_db.get_db()
+        with track_latency(FIRESTORE_WRITE_LATENCY, collection="batch"):
+            batch = db.batch()
+            for write in writes:
+                batch.set(
+                    db.collection(write.collection).document(write.document_id),
+                    write.data,
+                )
+            batch.commit()
+
+    def is_transient(self, error: Exception) -> bool:
+        # e.g. documents over 1 MiB, invalid values, or batches over the request
+        # size limit
+        return super().is_transient(error) and not isinstance(
+            error,
+            (
+                exceptions.InvalidArgument,
+                exceptions.FailedPrecondition,
+                exceptions.PermissionDenied,
+            ),
+        )
+
+    def get(self, collection: str, document_id: str) -> Optional[dict]:
+        snapshot = (
+            firestore_db.get_db().collection(collection).document(document_id).get()
+        )
+        return snapshot.to_dict() if snapshot.exists else None
+
+
+class SqliteBackend(StorageBackend):
+    """Stores documents as JSON in a SQLite database in WAL mode, inserting each
+    batch in one transaction. Values JSON can't represent, such as timestamps, are
+    stored as strings."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, document_id TEXT NOT NULL, "
+                "data TEXT NOT NULL, PRIMARY KEY (collection, document_id))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def write_batch(self, writes: List[PendingWrite]):
+        rows = [
+            (write.collection, write.document_id, json.dumps(write.data, default=str))
+            for write in writes
+        ]
+        with self._lock:
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", rows
+                )
+
+    def is_transient(self, error: Exception) -> bool:
+        # Operational errors, e.g. a locked database, may clear up
+        return super().is_transient(error) and not isinstance(
+            error, (sqlite3.IntegrityError, sqlite3.ProgrammingError)
+        )
+
+    def get(self, collection: str, document_id: str) -> Optional[dict]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT data FROM documents WHERE collection = ? "
+                    "AND document_id = ?",
+                    (collection, document_id),
+                )
+                .fetchone()
+            )
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class FileBackend(StorageBackend):
+    """Appends documents to a local JSON lines file, for inspecting what the service
+    stores."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write_batch(self, writes: List[PendingWrite]):
+        lines = "".join(
+            json.dumps(
+                {
+                    "collection": write.collection,
+                    "document_id": write.document_id,
+                    "data": write.data,
+                },
+                default=str,
+            )
+            + "\n"
+            for write in writes
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def get(self, collection: str, document_id: str) -> Optional[dict]:
+        """Returns the last write of a document. Reads the whole file."""
+        document = None
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    write = json.loads(line)
+                    if (write["collection"], write["document_id"]) == (
+                        collection,
+                        document_id,
+                    ):
+                        document = write["data"]
+        return document
+
+
+@dataclass(frozen=True)
+class StorageConfig:
+    """Configures where documents are stored.
+
+    Attributes:
+        backend: "firestore", "sqlite", or "file" to append documents to a file.
+        sqlite_path: Database file of the "sqlite" backend.
+        file_path: File the "file" backend writes to.
+    """
+
+    backend: str = "firestore"
+    sqlite_path: str = "checkmate.db"
+    file_path: str = "writes.jsonl"
+
+    @classmethod
+    def from_env(cls) -> "StorageConfig":
+        return cls(
+            backend=os.getenv("STORAGE_BACKEND", "firestore"),
+            sqlite_path=os.getenv("STORAGE_SQLITE_PATH", "checkmate.db"),
+            file_path=os.getenv("STORAGE_FILE_PATH", "writes.jsonl"),
+        )
+
+    def create_backend(self) -> StorageBackend:
+        if self.backend == "sqlite":
+            return SqliteBackend(self.sqlite_path)
+        if self.backend == "file":
+            return FileBackend(self.file_path)
+        if self.backend != "firestore":
+            raise ValueError(f"Unknown storage backend: {self.backend}")
+        return FirestoreBackend()
+
+
+storage = StorageConfig.from_env().create_backend()
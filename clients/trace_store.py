@@ -0,0 +1,214 @@
+# clients/trace_store.py
+# Stores agent traces outside their agent_calls documents. Long traces are slow to
+# serialise, costly to write and can approach the 1 MiB Firestore document limit, so
+# they are written as compressed JSON blobs, and documents keep a reference to the
+# blob with a few summary stats.
+import asyncio
+import functools
+import gzip
+import importlib.util
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import quote
+from logger import StructuredLogger
+
+logger = StructuredLogger("trace_store")
+
+EXTENSIONS = {"gzip": ".json.gz", "zstd": ".json.zst"}
+
+
+def _zstd():
+    import zstandard
+
+    return zstandard
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class TraceStore(ABC):
+    """Stores blobs by key. Called from a worker thread."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> str:
+        """Stores a blob, returning its URI."""
+
+    @abstractmethod
+    def get(self, uri: str) -> bytes:
+        """Returns a blob stored by `put`."""
+
+
+class LocalTraceStore(TraceStore):
+    """Stores blobs as files under a directory."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        """Returns the path of a key, raising ValueError if it is outside the root."""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Trace path {path} is outside {self.root}")
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+        return f"file://{path}"
+
+    def get(self, uri: str) -> bytes:
+        with open(self._path(uri.removeprefix("file://")), "rb") as f:
+            return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage_client():
+    """Returns the shared GCS client, creating it on first use."""
+    from google.cloud import storage
+
+    return storage.Client()
+
+
+class GcsTraceStore(TraceStore):
+    """Stores blobs in a GCS bucket."""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def put(self, key: str, data: bytes) -> str:
+        blob = get_storage_client().bucket(self.bucket).blob(key)
+        blob.upload_from_string(data, content_type="application/octet-stream")
+        return f"gs://{self.bucket}/{key}"
+
+    def get(self, uri: str) -> bytes:
+        bucket, name = uri.removeprefix("gs://").split("/", 1)
+        return get_storage_client().bucket(bucket).blob(name).download_as_bytes()
+
+
+@dataclass(frozen=True)
+class TraceStorageConfig:
+    """Configures where agent traces are stored.
+
+    Attributes:
+        backend: "gcs", "local", or "" to keep traces inline in their documents.
+            Defaults to "gcs" if a bucket is configured, and "" otherwise.
+        bucket: GCS bucket of the "gcs" backend.
+        directory: Directory of the "local" backend.
+        prefix: Prefix of the keys traces are stored under.
+        codec: "gzip", or "zstd" if the zstandard package is installed.
+    """
+
+    backend: str = ""
+    bucket: str = ""
+    directory: str = "traces"
+    prefix: str = "agent_traces/"
+    codec: str = "gzip"
+
+    @classmethod
+    def from_env(cls) -> "TraceStorageConfig":
+        bucket = os.getenv("TRACE_STORE_BUCKET", "")
+        codec = os.getenv("TRACE_COMPRESSION", "gzip")
+        if codec == "zstd" and importlib.util.find_spec("zstandard") is None:
+            logger.warn("zstandard is not installed, compressing traces with gzip")
+            codec = "gzip"
+        return cls(
+            backend=os.getenv("TRACE_STORE", "gcs" if bucket else ""),
+            bucket=bucket,
+            directory=os.getenv("TRACE_STORE_DIR", "traces"),
+            prefix=os.getenv("TRACE_STORE_PREFIX", "agent_traces/"),
+            codec=codec,
+        )
+
+    def create_store(self) -> Optional[TraceStore]:
+        if self.backend == "gcs":
+            return GcsTraceStore(self.bucket)
+        if self.backend == "local":
+            return LocalTraceStore(self.directory)
+        return None
+
+
+def count_tool_calls(trace: List[dict]) -> int:
+    """Counts the tool calls in an OpenAI or Gemini trace."""
+    return sum(
+        len(message.get("tool_calls") or [])
+        + sum(1 for part in message.get("parts") or [] if part.get("function_call"))
+        for message in trace
+    )
+
+
+class TraceStorage:
+    """Moves agent traces out of their documents into a `TraceStore`."""
+
+    def __init__(self, config: TraceStorageConfig, store: TraceStore = None):
+        self.config = config
+        self.store = store or config.create_store()
+
+    def _offload(self, request_id: str, trace: List[dict]) -> dict:
+        start_time = time.perf_counter()
+        raw = json.dumps(trace, separators=(",", ":"), default=str).encode("utf-8")
+        data = compress(raw, self.config.codec)
+        # Request IDs come from the x-request-id header, so they are escaped to
+        # keep path separators out of keys
+        name = quote(request_id, safe="-_.")
+        key = f"{self.config.prefix}{name}{EXTENSIONS[self.config.codec]}"
+        uri = self.store.put(key, data)
+        return {
+            "uri": uri,
+            "codec": self.config.codec,
+            "messages": len(trace),
+            "toolCalls": count_tool_calls(trace),
+            "rawBytes": len(raw),
+            "storedBytes": len(data),
+            "writeSeconds": round(time.perf_counter() - start_time, 4),
+        }
+
+    async def offload(self, request_id: str, document: dict) -> dict:
+        """Returns the document with its agentTrace replaced by an agentTraceRef,
+        once the trace is stored. The trace stays inline if storing it fails, or if
+        no store is configured."""
+        trace = document.get("agentTrace")
+        if self.store is None or not trace:
+            return document
+        try:
+            reference = await asyncio.to_thread(self._offload, request_id, trace)
+        except Exception as e:
+            logger.warn("Could not store trace, keeping it inline", error=str(e))
+            return document
+        return {**document, "agentTrace": None, "agentTraceRef": reference}
+
+    async def rehydrate(self, document: dict) -> dict:
+        """Returns the document with its agentTrace loaded from its agentTraceRef."""
+        reference = document.get("agentTraceRef")
+        if not reference or document.get("agentTrace"):
+            return document
+        # Read with the store matching the URI, since the trace may have been
+        # written with another backend than the one configured now
+        uri = reference["uri"]
+        store = (
+            GcsTraceStore("")
+            if uri.startswith("gs://")
+            else LocalTraceStore(self.config.directory)
+        )
+        data = await asyncio.to_thread(store.get, uri)
+        trace = json.loads(decompress(data, reference.get("codec", "gzip")))
+        return {**document, "agentTrace": trace}
+
+
+trace_storage = TraceStorage(TraceStorageConfig.from_env())
@@ -0,0 +1,241 @@
+# clients/write_queue.py
+# Write-behind persistence. Handlers queue the documents they store instead of
+# writing them on the request path, and a worker commits queued documents in
+# batches, retrying failed commits with backoff.
+import asyncio
+import os
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from clients.storage import PendingWrite, StorageBackend, storage
+from logger import StructuredLogger
+from metrics import WRITE_QUEUE_BATCH_SIZE, WRITE_QUEUE_WRITES
+
+logger = StructuredLogger("write_queue")
+
+# Maximum number of writes in a Firestore batch
+FIRESTORE_MAX_BATCH = 500
+
+
+@dataclass(frozen=True)
+class WriteQueueConfig:
+    """Configures the write-behind queue.
+
+    Attributes:
+        max_size: Maximum number of queued writes. When the queue is full, callers
+            wait for space, for at most `put_timeout` seconds, after which they
+            write the document themselves.
+        put_timeout: Maximum seconds a caller waits for space in a full queue.
+        batch_size: Maximum number of documents committed in one batch.
+        linger: Seconds the worker waits for more writes before committing a batch
+            that isn't full.
+        max_retries: Number of times a failed commit is retried before its
+            documents are dropped.
+        initial_backoff: Seconds before the first retry, doubling on each retry.
+        max_backoff: Maximum seconds between retries.
+        shutdown_timeout: Maximum seconds spent flushing the queue on shutdown.
+    """
+
+    max_size: int = 1000
+    put_timeout: float = 5.0
+    batch_size: int = 100
+    linger: float = 0.05
+    max_retries: int = 5
+    initial_backoff: float = 0.5
+    max_backoff: float = 10.0
+    shutdown_timeout: float = 20.0
+
+    @classmethod
+    def from_env(cls) -> "WriteQueueConfig":
+        return cls(
+            max_size=int(os.getenv("WRITE_QUEUE_MAX_SIZE", 1000)),
+            put_timeout=float(os.getenv("WRITE_QUEUE_PUT_TIMEOUT", 5.0)),
+            batch_size=min(
+                int(os.getenv("WRITE_QUEUE_BATCH_SIZE", 100)), FIRESTORE_MAX_BATCH
+            ),
+            linger=float(os.getenv("WRITE_QUEUE_LINGER", 0.05)),
+            max_retries=int(os.getenv("WRITE_QUEUE_MAX_RETRIES", 5)),
+            shutdown_timeout=float(os.getenv("WRITE_QUEUE_SHUTDOWN_TIMEOUT", 20.0)),
+        )
+
+
+class WriteQueue:
+    """Queues document writes and commits them in batches on a worker task.
+
+    The queue runs on the event loop it was started on, see `start`. Until then, and
+    after `stop`, documents are written directly.
+    """
+
+    def __init__(self, config: WriteQueueConfig, backend: StorageBackend = None):
+        self.config = config
+        self.backend = backend or storage
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Tasks scheduled by `submit` from the event loop thread
+        self._submissions = set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Starts the worker on the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.config.max_size)
+        self._worker = self._loop.create_task(self._run())
+
+    async def stop(self):
+        """Commits the queued writes, for at most `shutdown_timeout` seconds, then
+        stops the worker."""
+        await self.flush(self.config.shutdown_timeout)
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        if self._queue is not None and not self._queue.empty():
+            logger.error(
+                "Dropped queued writes on shutdown", writes=self._queue.qsize()
+            )
+            WRITE_QUEUE_WRITES.labels(outcome="dropped").inc(self._queue.qsize())
+        self._worker = self._queue = self._loop = None
+
+    async def flush(self, timeout: float = None):
+        """Waits until the writes queued so far are committed or dropped."""
+        if self._submissions:
+            await asyncio.gather(*self._submissions, return_exceptions=True)
+        if self.running:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warn("Timed out flushing writes", writes=self._queue.qsize())
+
+    async def _write_directly(self, write: PendingWrite):
+        await self._commit([write])
+
+    async def put(self, collection: str, document_id: str, data: dict):
+        """Queues a document write. Waits if the queue is full."""
+        write = PendingWrite(collection, document_id, data)
+        if not self.running or asyncio.get_running_loop() is not self._loop:
+            return await self._write_directly(write)
+        try:
+            await asyncio.wait_for(self._queue.put(write), self.config.put_timeout)
+            WRITE_QUEUE_WRITES.labels(outcome="queued").inc()
+        except asyncio.TimeoutError:
+            WRITE_QUEUE_WRITES.labels(outcome="overflow").inc()
+            await self._write_directly(write)
+
+    def submit(self, collection: str, document_id: str, data: dict):
+        """Queues a document write from synchronous code, e.g. a handler run on the
+        threadpool. Blocks while the queue is full, unless called from the event
+        loop, where the write is scheduled instead. Writes directly if the queue
+        isn't running."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if not self.running:
+            self._commit_sync([PendingWrite(collection, document_id, data)])
+        elif running_loop is self._loop:
+            task = running_loop.create_task(self.put(collection, document_id, data))
+            self._submissions.add(task)
+            task.add_done_callback(self._submissions.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(
+                self.put(collection, document_id, data), self._loop
+            ).result()
+
+    async def _next_batch(self) -> List[PendingWrite]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.config.linger
+        while len(batch) < self.config.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _deduplicate(writes: List[PendingWrite]) -> List[PendingWrite]:
+        """Keeps the last write of each document, since a batch may set each
+        document only once."""
+        latest: Dict[Tuple[str, str], PendingWrite] = {}
+        for write in writes:
+            latest.pop((write.collection, write.document_id), None)
+            latest[(write.collection, write.document_id)] = write
+        return list(latest.values())
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.config.initial_backoff * 2**attempt, self.config.max_backoff)
+        return delay * (0.5 + random.random() / 2)
+
+    async def _commit(self, writes: List[PendingWrite]):
+        writes = self._deduplicate(writes)
+        WRITE_QUEUE_BATCH_SIZE.observe(len(writes))
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                await asyncio.to_thread(self.backend.write_batch, writes)
+                WRITE_QUEUE_WRITES.labels(outcome="written").inc(len(writes))
+                return
+            except Exception as e:
+                if attempt == self.config.max_retries or not (
+                    self.backend.is_transient(e)
+                ):
+                    await asyncio.to_thread(self._write_separately, writes, e)
+                    return
+                WRITE_QUEUE_WRITES.labels(outcome="retried").inc(len(writes))
+                logger.warn("Retrying failed batch write", error=str(e))
+                await asyncio.sleep(self._backoff(attempt))
+
+    def _commit_sync(self, writes: List[PendingWrite]):
+        try:
+            self.backend.write_batch(writes)
+            WRITE_QUEUE_WRITES.labels(outcome="written").inc(len(writes))
+        except Exception as e:
+            self._write_separately(writes, e)
+
+    def _write_separately(
+        self, writes: List[PendingWrite], error: Exception, split: bool = False
+    ):
+        """Writes the documents of a failed batch in halves, so that documents the
+        backend rejects, e.g. for being too large, don't drop the rest of the batch.
+        Halves are split further only while the backend rejects their contents, so
+        that an outage costs two more writes rather than one per document. Not
+        retried."""
+        if len(writes) == 1 or split and self.backend.is_transient(error):
+            self._log_dropped(writes, error)
+            return
+        middle = len(writes) // 2
+        for half in (writes[:middle], writes[middle:]):
+            try:
+                self.backend.write_batch(half)
+                WRITE_QUEUE_WRITES.labels(outcome="written").inc(len(half))
+            except Exception as e:
+                self._write_separately(half, e, split=True)
+
+    def _log_dropped(self, writes: List[PendingWrite], error: Exception):
+        WRITE_QUEUE_WRITES.labels(outcome="dropped").inc(len(writes))
+        logger.error(
+            "Dropped writes after failing to store them",
+            documents=[f"{w.collection}/{w.document_id}" for w in writes],
+            error=str(error),
+        )
+
+
+write_queue = WriteQueue(WriteQueueConfig.from_env())
@@ -1,3 +1,15 @@
 import contextvars
+import time
 
 request_id_var = contextvars.ContextVar("request_id", default="TEST_ID")
+# time.monotonic() by which the current request should be answered, if any
+deadline_var = contextvars.ContextVar("deadline", default=None)
+
+
+def remaining_time(default: float = None) -> float:
+    """Returns the seconds left until the current request's deadline, or `default` if
+    the request has no deadline."""
+    deadline = deadline_var.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.monotonic())
@@ -0,0 +1,72 @@
+from langfuse import Langfuse
+from handlers.agent_generation import get_outputs
+from models import PlanningMode
+from .custom_eval_functions.helpfulness import helpfulness_eval
+import asyncio
+import time
+
+langfuse = Langfuse()
+
+
+def count_llm_turns(output):
+    """Counts the number of model responses in the agent trace."""
+    return sum(
+        1
+        for message in output.agentTrace or []
+        if message.get("role") in ("assistant", "model")
+    )
+
+
+async def evaluate_planning_modes(experiment_name, dataset_name="test"):
+    """Compares note quality and latency of separate vs fused planning."""
+    dataset = langfuse.get_dataset(dataset_name)
+    summary = {}
+
+    for planning_mode in PlanningMode:
+        scores, latencies, turns = [], [], []
+        print(f"Running {planning_mode.value} planning on dataset: {dataset_name}")
+
+        for item in dataset.items:
+            run_name = f"{experiment_name}_{planning_mode.value}_{dataset_name}"
+            with item.observe(run_name=run_name) as trace_id:
+                inputs = {
+                    **item.input,
+                    "addPlanning": True,
+                    "planning_mode": planning_mode,
+                }
+                inputs["image_url"] = (
+                    inputs["image_url"] if inputs["text"] is None else None
+                )  # If text available, drop image_url
+
+                start_time = time.time()
+                output = await get_outputs(**inputs)
+                latency = time.time() - start_time
+
+                latencies.append(latency)
+                turns.append(count_llm_turns(output))
+                langfuse.score(trace_id=trace_id, name="total_latency", value=latency)
+
+                # Score only if text is available for now
+                if inputs["text"] is not None:
+                    score_value = helpfulness_eval(input_text=inputs, output=output)
+                    langfuse.score(
+                        trace_id=trace_id, name="custom_eval_score", value=score_value
+                    )
+                    scores.append(score_value)
+            print(f"Item {item.id} done")
+
+        summary[planning_mode.value] = {
+            "average_score": round(sum(scores) / len(scores), 2) if scores else None,
+            "average_latency": round(sum(latencies) / len(latencies), 2),
+            "average_llm_turns": round(sum(turns) / len(turns), 2),
+        }
+
+    print("All done!")
+    for planning_mode, results in summary.items():
+        print(f"{planning_mode}: {results}")
+    langfuse.flush()
+
+
+if __name__ == "__main__":
+    # Run the evaluation
+    asyncio.run(evaluate_planning_modes("planning_mode_eval"))
@@ -1,5 +1,7 @@
 # gunicorn_conf.py
 from multiprocessing import cpu_count
+import os
+import shutil
 
 bind = "127.0.0.1:8000"
 
@@ -12,3 +14,20 @@ loglevel = 'debug'
 accesslog = '/opt/checkmate-ml-models/access_log'
 errorlog =  '/opt/checkmate-ml-models/error_log'
 
+
+# Prometheus multiprocess mode, so that /metrics aggregates samples across workers
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/checkmate-ml-prometheus"
+)
+
+
+def on_starting(server):
+    # Stale samples from a previous run would otherwise be aggregated
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
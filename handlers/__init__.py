@@ -1,4 +1,4 @@
-from .ocr_v2 import perform_ocr
+from .ocr_v2 import perform_ocr, perform_batch_ocr, merge_messages, ocr_config
 from .trivial_filter import check_should_review
 from .sensitivity_filter import check_is_sensitive
 from .pii_mask import redact
@@ -6,6 +6,9 @@ from .agent_generation import get_outputs
 
 __all__ = [
     "perform_ocr",
+    "perform_batch_ocr",
+    "merge_messages",
+    "ocr_config",
     "check_should_review",
     "check_is_sensitive",
     "redact",
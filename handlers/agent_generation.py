@@ -1,25 +1,15 @@
-from tools import (
-    search_google_tool,
-    get_screenshot_tool,
-    check_malicious_url_tool,
-    review_report_tool,
-    plan_next_step_tool,
-    infer_intent_tool,
-    translate_text,
-)
+from tools import translate_text
 import json
 
-from agents.openai_agent import OpenAIAgent
-from agents.gemini_agent import GeminiAgent
-from clients.gemini import gemini_client
-from clients.openai import create_openai_client
+from agents.factory import get_agent
 from datetime import datetime
 from typing import Union, List
-from models import SavedAgentCall, SupportedModelProvider
+from models import SavedAgentCall, SupportedModelProvider, PlanningMode
 from context import request_id_var  # Import the context variable
 from logger import StructuredLogger
 from langfuse.decorators import observe, langfuse_context
-from clients.firestore_db import db
+from clients.trace_store import trace_storage
+from clients.write_queue import write_queue
 import os
 
 system_prompt = """# Context
@@ -91,6 +81,8 @@ async def get_outputs(
     image_url: Union[str, None] = None,
     caption: Union[str, None] = None,
     addPlanning: bool = False,
+    planning_mode: PlanningMode = PlanningMode.SEPARATE,
+    bilingual_summary: bool = False,
     provider: SupportedModelProvider = SupportedModelProvider.OPENAI,
     **kwargs,
 ):
@@ -106,57 +98,24 @@ async def get_outputs(
         image_url=image_url,
         caption=caption,
         addPlanning=addPlanning,
+        planning_mode=planning_mode.value,
+        bilingual_summary=bilingual_summary,
     )
     child_logger.info("Entered agent_generation function")
     request_id = request_id_var.get()
-    model = None
 
     try:
         current_datetime = datetime.now()
-        if provider == SupportedModelProvider.GEMINI:
-            model = "gemini"
-            agent = GeminiAgent(
-                gemini_client,
-                tool_list=[
-                    search_google_tool,
-                    get_screenshot_tool,
-                    check_malicious_url_tool,
-                    review_report_tool,
-                    plan_next_step_tool,
-                    infer_intent_tool,
-                ],
-                include_planning_step=addPlanning,
-                temperature=0.2,
-            )
-        else:
-            openai_client = create_openai_client(provider)
-            if provider == SupportedModelProvider.OPENAI:
-                model = "gpt-4o"
-            elif provider == SupportedModelProvider.DEEPSEEK:
-                model = "deepseek-chat"
-            elif provider == SupportedModelProvider.GROQ:
-                model = "llama-3.3-70b-versatile"
-
-            agent = OpenAIAgent(
-                openai_client,
-                tool_list=[
-                    search_google_tool,
-                    get_screenshot_tool,
-                    check_malicious_url_tool,
-                    review_report_tool,
-                    plan_next_step_tool,
-                    infer_intent_tool,
-                ],
-                include_planning_step=addPlanning,
-                temperature=0.0,
-                model=model,
-            )
-
-        outputs = await agent.generate_note(text, image_url, caption)
+        agent = get_agent(provider, addPlanning, planning_mode == PlanningMode.FUSED)
+
+        outputs = await agent.generate_note(
+            text, image_url, caption, bilingual=bilingual_summary
+        )
         community_note = outputs.get("community_note", None)
-        chinese_note = community_note
+        chinese_note = outputs.get("community_note_cn", None) or community_note
 
-        if community_note is not None:
+        # translate separately unless the summariser already returned the Chinese note
+        if community_note is not None and not outputs.get("community_note_cn"):
             try:
                 chinese_note = await translate_text(community_note, language="cn")
             except Exception as e:
@@ -205,8 +164,10 @@ async def get_outputs(
                 tags.append("error")
                 langfuse_context.update_current_trace(tags=tags)
             try:
-                doc_ref = db.collection("agent_calls").document(request_id)
-                doc_ref.set(response.model_dump())
+                document = await trace_storage.offload(
+                    request_id, response.model_dump()
+                )
+                await write_queue.put("agent_calls", request_id, document)
             except Exception as e:
                 child_logger.error(f"Error storing response in Firestore: {e}")
 
@@ -1,12 +1,18 @@
+import asyncio
 import vertexai
 from vertexai import generative_models
 import json
 import requests
 import os
+from dataclasses import dataclass
+from typing import List
 from langfuse.decorators import observe, langfuse_context
 from context import request_id_var  # Import the context variable
-from clients.firestore_db import db
+from clients.write_queue import write_queue
 from logger import StructuredLogger
+from metrics import OCR_LATENCY, track_latency
+from utils.image_fetcher import image_fetcher
+from utils.ocr_cache import ocr_cache
 
 logger = StructuredLogger("ocr_extraction")
 
@@ -27,7 +33,44 @@ if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") is None:
 else:
     vertexai.init(location=REGION)
 
-multimodal_model = generative_models.GenerativeModel("gemini-1.5-pro")
+OCR_MODEL = "gemini-1.5-pro"
+multimodal_model = generative_models.GenerativeModel(OCR_MODEL)
+
+
+@dataclass(frozen=True)
+class OcrConfig:
+    """Configures calls to the OCR model.
+
+    Attributes:
+        max_concurrency: Maximum number of concurrent OCR model calls. Further
+            requests wait for a free slot, so bursts of images don't exceed the
+            model's quota.
+        timeout: Maximum seconds for an OCR model call.
+        batch_max_images: Maximum number of images in a batch request.
+        batch_concurrency: Maximum number of images of one batch request processed
+            at once, so that one batch doesn't take every OCR slot.
+    """
+
+    max_concurrency: int = 8
+    timeout: float = 60.0
+    batch_max_images: int = 10
+    batch_concurrency: int = 4
+
+    @classmethod
+    def from_env(cls) -> "OcrConfig":
+        return cls(
+            max_concurrency=int(os.getenv("OCR_MAX_CONCURRENCY", 8)),
+            timeout=float(os.getenv("OCR_TIMEOUT", 60.0)),
+            batch_max_images=int(os.getenv("OCR_BATCH_MAX_IMAGES", 10)),
+            batch_concurrency=int(os.getenv("OCR_BATCH_CONCURRENCY", 4)),
+        )
+
+
+ocr_config = OcrConfig.from_env()
+ocr_slots = asyncio.Semaphore(ocr_config.max_concurrency)
+
+OCR_FIELDS = ("image_type", "sender", "subject", "extracted_message")
+EMPTY_RESULT = {field: None for field in OCR_FIELDS}
 
 # Model config
 model_config = {"temperature": 0}
@@ -49,8 +92,106 @@ if prompt is None:
     raise Exception("Prompt not found in prompts.json!")
 
 
+async def generate_ocr(image: generative_models.Part) -> str:
+    """Runs the OCR model on an image once a slot is free, returning its text."""
+    with track_latency(OCR_LATENCY, stage="queue"):
+        await ocr_slots.acquire()
+    try:
+        with track_latency(OCR_LATENCY, stage="model"):
+            response = await asyncio.wait_for(
+                multimodal_model.generate_content_async(
+                    [prompt, image],
+                    generation_config=model_config,
+                    safety_settings=safety_config,
+                ),
+                timeout=ocr_config.timeout,
+            )
+    finally:
+        ocr_slots.release()
+    return response.text
+
+
+async def _record_error(img_url, document_id, error: Exception, child_logger) -> str:
+    error_message = str(error) or type(error).__name__
+    child_logger.error("Error in OCR extraction", error=error_message)
+    await write_queue.put(
+        "ocr_extractions",
+        document_id,
+        {"imageUrl": img_url, "success": False, "error": error_message},
+    )
+    return error_message
+
+
+async def extract_from_image(img_url, document_id, child_logger) -> dict:
+    """Runs OCR on an image, or returns the cached result of a similar image, and
+    stores the result under `document_id` in the background. Raises on failure."""
+    image_key = None
+    # Download the image once, to look it up in the cache and, on a miss, to
+    # send it to the model inline
+    try:
+        fetched_image = await image_fetcher.fetch(img_url)
+    except Exception as e:
+        child_logger.warn(
+            "Could not download image, passing its URL to the model", error=str(e)
+        )
+        image = generative_models.Part.from_uri(img_url, mime_type="image/jpeg")
+    else:
+        if ocr_cache.config.enabled:
+            image_key, cached = await asyncio.to_thread(
+                ocr_cache.lookup, fetched_image.data
+            )
+            if cached is not None:
+                await write_queue.put(
+                    "ocr_extractions",
+                    document_id,
+                    {
+                        "imageUrl": img_url,
+                        "success": True,
+                        # the caller adds to the returned dict
+                        "response": dict(cached),
+                        "cached": True,
+                    },
+                )
+                return cached
+        image = generative_models.Part.from_data(
+            fetched_image.data, mime_type=fetched_image.mime_type
+        )
+
+    generated_text = await generate_ocr(image)
+
+    # strip everything before the first '{' and after the last '}'
+    generated_text = generated_text[generated_text.find("{") :]
+    generated_text = generated_text[: generated_text.rfind("}") + 1]
+
+    return_dict = json.loads(generated_text)
+    # Validate response structure
+    assert "image_type" in return_dict
+    assert "sender" in return_dict
+    assert "subject" in return_dict
+    assert "extracted_message" in return_dict
+
+    if return_dict["image_type"] not in ["email", "convo", "letter", "others"]:
+        return_dict["image_type"] = "others"
+
+    if image_key is not None:
+        await asyncio.to_thread(
+            ocr_cache.set,
+            image_key,
+            {field: return_dict[field] for field in OCR_FIELDS},
+        )
+
+    # Store in Firestore without delaying the response
+    await write_queue.put(
+        "ocr_extractions",
+        document_id,
+        {"imageUrl": img_url, "success": True, "response": dict(return_dict)},
+    )
+
+    return return_dict
+
+
 @observe(name="ocr_extraction")
-def perform_ocr(img_url, **kwargs):
+async def perform_ocr(img_url, **kwargs):
     """
     function to perform OCR on the image
     """
@@ -59,52 +200,62 @@ def perform_ocr(img_url, **kwargs):
         tags=[os.environ.get("ENVIRONMENT", "missing"), "ocr", "single_call"]
     )
     request_id = request_id_var.get()
-    doc_ref = db.collection("ocr_extractions").document(request_id)
 
     try:
-        image = generative_models.Part.from_uri(img_url, mime_type="image/jpeg")
-        response = multimodal_model.generate_content(
-            [prompt, image],
-            generation_config=model_config,
-            safety_settings=safety_config,
-        )
+        return await extract_from_image(img_url, request_id, child_logger)
+    except Exception as e:
+        await _record_error(img_url, request_id, e, child_logger)
+        return dict(EMPTY_RESULT)
+
 
-        generated_text = response.text
-        # strip everything before the first '{' and after the last '}'
-        generated_text = generated_text[generated_text.find("{") :]
-        generated_text = generated_text[: generated_text.rfind("}") + 1]
+@observe(name="batch_ocr_extraction")
+async def perform_batch_ocr(img_urls: List[str], **kwargs) -> List[dict]:
+    """Runs OCR on several images concurrently, at most `batch_concurrency` at a
+    time per request.
 
-        return_dict = json.loads(generated_text)
-        # Validate response structure
-        assert "image_type" in return_dict
-        assert "sender" in return_dict
-        assert "subject" in return_dict
-        assert "extracted_message" in return_dict
+    Returns:
+        One result per image, in input order, with `success` and, on failure, the
+        `error`. Results are stored as `<request ID>-<index>`.
+    """
+    langfuse_context.update_current_trace(
+        tags=[os.environ.get("ENVIRONMENT", "missing"), "ocr", "batch"]
+    )
+    request_id = request_id_var.get()
+    batch_slots = asyncio.Semaphore(ocr_config.batch_concurrency)
 
-        if return_dict["image_type"] not in ["email", "convo", "letter", "others"]:
-            return_dict["image_type"] = "others"
+    async def run(index: int, img_url: str) -> dict:
+        child_logger = logger.child(img_url=img_url)
+        document_id = f"{request_id}-{index}"
+        async with batch_slots:
+            try:
+                result = await extract_from_image(img_url, document_id, child_logger)
+                return {"success": True, **result}
+            except Exception as e:
+                error_message = await _record_error(
+                    img_url, document_id, e, child_logger
+                )
+                return {"success": False, **EMPTY_RESULT, "error": error_message}
 
-        # Attempt to store in Firestore, but don't block on failure
-        try:
-            doc_ref.set({"imageUrl": img_url, "success": True, "response": return_dict})
-        except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", firestore_error)
+    return list(
+        await asyncio.gather(*(run(i, img_url) for i, img_url in enumerate(img_urls)))
+    )
 
-        return return_dict
 
-    except Exception as e:
-        error_message = str(e)
-        child_logger.error("Error in OCR extraction:", error_message)
-
-        # Attempt to store error in Firestore, but don't block on failure
-        try:
-            doc_ref.set({"imageUrl": img_url, "success": False, "error": error_message})
-        except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", str(firestore_error))
-
-        return {
-            "image_type": None,
-            "sender": None,
-            "subject": None,
-            "extracted_message": None,
-        }
+def merge_messages(messages: List[str]) -> str:
+    """Merges the messages extracted from consecutive screenshots of one
+    conversation into a single text. Lines repeated at the top of a screenshot
+    because they were also at the bottom of the previous one are dropped."""
+    merged = []
+    for message in messages:
+        lines = [line for line in (message or "").splitlines() if line.strip()]
+        stripped = [line.strip() for line in lines]
+        overlap = next(
+            (
+                size
+                for size in range(min(len(merged), len(lines)), 0, -1)
+                if [line.strip() for line in merged[-size:]] == stripped[:size]
+            ),
+            0,
+        )
+        merged.extend(lines[overlap:])
+    return "\n".join(merged)
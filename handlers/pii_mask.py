@@ -1,13 +1,11 @@
 from clients.openai import openai_client
-from langfuse import Langfuse
+from clients.langfuse import langfuse
 from langfuse.decorators import observe, langfuse_context
 import os
 from context import request_id_var  # Import the context variable
-from clients.firestore_db import db
+from clients.write_queue import write_queue
 from logger import StructuredLogger
 
-langfuse = Langfuse()
-
 logger = StructuredLogger("pii_masking")
 
 
@@ -26,7 +24,6 @@ def redact(text, **kwargs):
         ]
     )
     request_id = request_id_var.get()
-    doc_ref = db.collection("pii_masks").document(request_id)
 
     try:
         prompt = langfuse.get_prompt("message_redaction", label="prod")
@@ -53,29 +50,33 @@ def redact(text, **kwargs):
 
         # Attempt to store in Firestore, but don't block on failure
         try:
-            doc_ref.set(
+            write_queue.submit(
+                "pii_masks",
+                request_id,
                 {
                     "originalText": text,
                     "success": True,
                     "response": result[0],
                     "tokensUsed": result[1],
-                }
+                },
             )
         except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", firestore_error)
+            child_logger.error("Error saving to Firestore", error=str(firestore_error))
 
         return result
 
     except Exception as e:
         error_message = str(e)
-        child_logger.error("Error in PII masking:", error_message)
+        child_logger.error("Error in PII masking", error=error_message)
 
         # Attempt to store error in Firestore, but don't block on failure
         try:
-            doc_ref.set(
-                {"originalText": text, "success": False, "error": error_message}
+            write_queue.submit(
+                "pii_masks",
+                request_id,
+                {"originalText": text, "success": False, "error": error_message},
             )
         except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", str(firestore_error))
+            child_logger.error("Error saving to Firestore", error=str(firestore_error))
 
         return "", 0
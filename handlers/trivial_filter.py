@@ -2,14 +2,14 @@ from langfuse.decorators import observe, langfuse_context
 import json
 import os
 from context import request_id_var  # Import the context variable
-from clients.firestore_db import db
-from langfuse import Langfuse
+from clients.write_queue import write_queue
+from clients.langfuse import langfuse
 from logger import StructuredLogger
-from clients.openai import create_openai_client
+from clients.openai import get_openai_client
+from models import SupportedModelProvider
 
-# Initialize ChatOpenAI and Langfuse
-client = create_openai_client("openai")
-langfuse = Langfuse()
+# Shared OpenAI client
+client = get_openai_client(SupportedModelProvider.OPENAI)
 
 logger = StructuredLogger("trivial_filter")
 
@@ -28,7 +28,6 @@ def check_should_review(message, **kwargs):
         ]
     )
     request_id = request_id_var.get()
-    doc_ref = db.collection("trivial_filters").document(request_id)
 
     try:
         prompt = langfuse.get_prompt("trivial_filter", label=os.getenv("ENVIRONMENT"))
@@ -50,32 +49,38 @@ def check_should_review(message, **kwargs):
 
         # Attempt to store in Firestore, but don't block on failure
         try:
-            doc_ref.set(
+            write_queue.submit(
+                "trivial_filters",
+                request_id,
                 {
                     "messageToCheck": message,
                     "success": True,
                     "response": json_output,
-                }
+                },
             )
         except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", firestore_error)
+            child_logger.error("Error saving to Firestore", error=str(firestore_error))
 
         return result
 
     except Exception as e:
         error_message = str(e)
-        child_logger.error("Error occurred in the processing chain:", error_message)
+        child_logger.error(
+            "Error occurred in the processing chain", error=error_message
+        )
 
         # Attempt to store error in Firestore, but don't block on failure
         try:
-            doc_ref.set(
+            write_queue.submit(
+                "trivial_filters",
+                request_id,
                 {
                     "messageToCheck": message,
                     "success": False,
                     "error": error_message,
-                }
+                },
             )
         except Exception as firestore_error:
-            child_logger.error("Error saving to Firestore:", firestore_error)
+            child_logger.error("Error saving to Firestore", error=str(firestore_error))
 
         return True
@@ -1,12 +1,57 @@
 import logging
 import json
+import sys
+import time
 import traceback
-from datetime import datetime
 from context import request_id_var
-import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Values JSON can't represent are logged as their str()
+_json_encoder = json.JSONEncoder(default=str)
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def dumps(log_record: dict) -> str:
+    """Serialises a log record, with orjson if it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                log_record, default=str, option=orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            pass
+    try:
+        return _json_encoder.encode(log_record)
+    except (TypeError, ValueError):
+        # e.g. dicts with keys that aren't strings, or circular references
+        return _json_encoder.encode(
+            {
+                key: value if isinstance(value, _JSON_SCALARS) else str(value)
+                for key, value in log_record.items()
+            }
+        )
 
 
 class JsonFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__()
+        # (second, formatted second) of the last record
+        self._time_cache = (None, "")
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, formatted = self._time_cache
+        if second != cached_second:
+            formatted = time.strftime(
+                self.default_time_format, self.converter(record.created)
+            )
+            self._time_cache = (second, formatted)
+        return f"{formatted},{int(record.msecs):03d}"
+
     def format(self, record):
         log_record = {
             "timestamp": self.formatTime(record),
@@ -17,47 +62,65 @@ class JsonFormatter(logging.Formatter):
             "request_id": request_id_var.get(),
         }
 
-        if hasattr(record, "extra_data"):
-            log_record.update(record.extra_data)
+        extra_data = getattr(record, "extra_data", None)
+        if extra_data:
+            log_record.update(extra_data)
 
-        return json.dumps(log_record)
+        return dumps(log_record)
 
 
-class StructuredLogger(logging.Logger):
-    def __init__(self, name="pino_logger", level=logging.INFO, context=None):
-        super().__init__(name, level)
+# Every StructuredLogger writes through this handler
+handler = logging.StreamHandler()
+handler.setFormatter(JsonFormatter())
 
-        self.context = context or {}
 
-        # Add handler with JSON formatter
-        handler = logging.StreamHandler()
-        handler.setFormatter(JsonFormatter())
-        self.addHandler(handler)
+class _StructuredMethods:
+    """Logging methods shared by loggers and their children. Each method calls
+    `_log_fields` directly, which reads the caller's file and line two frames up."""
+
+    __slots__ = ()
+
+    def _log_fields(self, level, message, kwargs):
+        logger = self._logger
+        if not logger.isEnabledFor(level):
+            return
+        frame = sys._getframe(2)
+        record = logger.makeRecord(
+            logger.name,
+            level,
+            frame.f_code.co_filename,
+            frame.f_lineno,
+            message,
+            (),
+            None,
+            frame.f_code.co_name,
+        )
+        record.extra_data = {**self.context, **kwargs} if self.context else kwargs
+        logger.handle(record)
 
     def log(self, level, message, **kwargs):
         """
         Log a message at a specific level with contextual data.
         """
-        # ensure kwargs are JSON serializable
-        for key, value in kwargs.items():
-            try:
-                json.dumps(value)
-            except TypeError:
-                kwargs[key] = str(value)
-        merged_context = {**self.context, **kwargs}
-        super().log(level, message, extra={"extra_data": merged_context})
+        self._log_fields(level, message, kwargs)
 
     def info(self, message, **kwargs):
-        self.log(logging.INFO, message, **kwargs)
+        self._log_fields(logging.INFO, message, kwargs)
 
     def error(self, message, exc_info=None, **kwargs):
         """
         Log an error message, automatically including traceback information.
+        `exc_info` may be an exception, an exc_info tuple, or True for the exception
+        being handled, as with `logging`.
         """
-        if exc_info is None and sys.exc_info()[0] is not None:
+        if exc_info is None or exc_info is True:
             exc_info = sys.exc_info()
+        elif isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+        elif not isinstance(exc_info, tuple):
+            exc_info = sys.exc_info() if exc_info else None
 
-        if exc_info:
+        if exc_info and exc_info[0] is not None:
             exc_type, exc_value, exc_traceback = exc_info
             formatted_tb = traceback.format_exception(
                 exc_type, exc_value, exc_traceback
@@ -69,20 +132,46 @@ class StructuredLogger(logging.Logger):
             }
 
         # Don't pass raw `exc_info` further; it's already processed into `error`
-        self.log(logging.ERROR, message, **kwargs)
+        self._log_fields(logging.ERROR, message, kwargs)
 
     def debug(self, message, **kwargs):
-        self.log(logging.DEBUG, message, **kwargs)
+        self._log_fields(logging.DEBUG, message, kwargs)
 
     def warn(self, message, **kwargs):
-        self.log(logging.WARNING, message, **kwargs)
+        self._log_fields(logging.WARNING, message, kwargs)
+
+    def warning(self, message, **kwargs):
+        self._log_fields(logging.WARNING, message, kwargs)
 
     def child(self, **new_context):
         """
-        Returns a child logger with additional context.
+        Returns a child logger with additional context. Children are views of the
+        same logger, so they are cheap to create per request or per call.
         """
-        # Create a child logger that inherits the context of the parent
-        merged_context = {**self.context, **new_context}
-        return StructuredLogger(
-            name=self.name, level=self.level, context=merged_context
-        )
+        return LoggerContext(self._logger, {**self.context, **new_context})
+
+
+class StructuredLogger(_StructuredMethods, logging.Logger):
+    def __init__(self, name="pino_logger", level=logging.INFO, context=None):
+        super().__init__(name, level)
+
+        self.context = context or {}
+        self.addHandler(handler)
+
+    @property
+    def _logger(self):
+        return self
+
+
+class LoggerContext(_StructuredMethods):
+    """A StructuredLogger with additional context, returned by `child`."""
+
+    __slots__ = ("_logger", "context")
+
+    def __init__(self, logger: StructuredLogger, context: dict):
+        self._logger = logger
+        self.context = context
+
+    @property
+    def name(self):
+        return self._logger.name
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# When running under gunicorn with several workers, PROMETHEUS_MULTIPROC_DIR must be
+# set (see gunicorn_conf.py) so that every worker writes its samples to a shared
+# directory, which /metrics then aggregates.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+ENDPOINT_LATENCY = Histogram(
+    "endpoint_latency_seconds",
+    "Latency of API endpoints",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_latency_seconds",
+    "Latency of LLM calls",
+    ["provider", "model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_CALL_LATENCY = Histogram(
+    "tool_call_latency_seconds",
+    "Latency of agent tool calls. The error rate is the share of outcome='error'",
+    ["tool", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_TURNS = Histogram(
+    "agent_turns_per_request",
+    "Number of LLM turns taken by the agent to generate a report",
+    ["model"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 30, 50),
+)
+FIRESTORE_WRITE_LATENCY = Histogram(
+    "firestore_write_latency_seconds",
+    "Latency of Firestore writes",
+    ["collection", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+WRITE_QUEUE_WRITES = Counter(
+    "write_queue_writes_total",
+    "Document writes passed through the write-behind queue, by outcome: 'queued', "
+    "'written', 'retried', 'overflow' (written by the caller because the queue was "
+    "full) or 'dropped'",
+    ["outcome"],
+)
+WRITE_QUEUE_BATCH_SIZE = Histogram(
+    "write_queue_batch_size",
+    "Number of documents committed per batch by the write-behind queue",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+HEDGED_LLM_CALLS = Counter(
+    "hedged_llm_calls_total",
+    "LLM calls for which a hedge request was sent, by the attempt that won",
+    ["call_site", "winner"],
+)
+IDENTITY_TOKEN_FETCH_LATENCY = Histogram(
+    "identity_token_fetch_latency_seconds",
+    "Latency of identity token fetches. path='critical' fetches delay a request, "
+    "path='background' ones refresh a cached token",
+    ["path", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+IDENTITY_TOKEN_REQUESTS = Counter(
+    "identity_token_requests_total",
+    "Identity token lookups, by whether they were served from the cache",
+    ["result"],
+)
+PRE_REVIEW_DECISIONS = Counter(
+    "pre_review_decisions_total",
+    "Reports checked before the LLM reviewer. decision='rejected' is a reviewer "
+    "call avoided, decision='forwarded' one that was made",
+    ["decision"],
+)
+OCR_LATENCY = Histogram(
+    "ocr_latency_seconds",
+    "Latency of the stages of /ocr-v2. stage='queue' is the wait for a free OCR "
+    "slot, stage='model' the OCR model call and stage='classification' the L1 "
+    "classification of the extracted text. The total is in endpoint_latency_seconds",
+    ["stage", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+IMAGE_FETCH_LATENCY = Histogram(
+    "image_fetch_latency_seconds",
+    "Latency of image downloads, by source ('gcs' or 'http'). Images served from "
+    "the in-memory cache are not counted",
+    ["source", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+OCR_CACHE_LOOKUPS = Counter(
+    "ocr_cache_lookups_total",
+    "OCR result cache lookups, by whether the image's contents matched a cached "
+    "image: 'hit' or 'miss'",
+    ["result"],
+)
+DOMAIN_REPUTATION_LOOKUPS = Counter(
+    "domain_reputation_lookups_total",
+    "URL checks answered by the local domain reputation index, by verdict. "
+    "verdict='unknown' is a check passed on to RMSE",
+    ["verdict"],
+)
+
+
+@contextmanager
+def track_latency(histogram: Histogram, **labels):
+    """Observes the time taken by the enclosed block in the given histogram.
+
+    The `outcome` label is set to "success", "error" or "cancelled" depending on how the
+    block exits. The yielded labels can be modified within the block, e.g. to mark a
+    call that returned an error result as an error.
+    """
+    labels["outcome"] = "success"
+    start_time = time.perf_counter()
+    try:
+        yield labels
+    except asyncio.CancelledError:
+        labels["outcome"] = "cancelled"
+        raise
+    except Exception:
+        labels["outcome"] = "error"
+        raise
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start_time)
+
+
+def render_metrics() -> tuple:
+    """Returns the metrics in the Prometheus text format, and its content type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,7 +1,10 @@
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+import os
+import time
 import uuid
-from context import request_id_var
+from context import request_id_var, deadline_var
+from metrics import ENDPOINT_LATENCY
 
 
 class RequestIDMiddleware(BaseHTTPMiddleware):
@@ -11,3 +14,31 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         response.headers["x-request-id"] = request_id
         return response
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """Sets the deadline of each request, so that slow work such as polling can stop in
+    time. Defaults to REQUEST_TIMEOUT_SECONDS, which should match the server timeout."""
+
+    async def dispatch(self, request: Request, call_next):
+        timeout = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 300))
+        deadline_var.set(time.monotonic() + timeout)
+        return await call_next(request)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # use the route template rather than the raw path to bound label cardinality
+            route = request.scope.get("route")
+            ENDPOINT_LATENCY.labels(
+                method=request.method,
+                path=route.path if route is not None else "unmatched",
+                status=status,
+            ).observe(time.perf_counter() - start_time)
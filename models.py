@@ -12,6 +12,11 @@ class SupportedModelProvider(str, Enum):
     GROQ = "groq"
 
 
+class PlanningMode(str, Enum):
+    SEPARATE = "separate"
+    FUSED = "fused"
+
+
 class AgentResponse(BaseModel):
     requestId: str
     success: bool = False
@@ -41,6 +46,14 @@ class CommunityNoteRequest(BaseModel):
         default=False,
         description="Whether or not to include zero-shot planning step between each agent step",
     )
+    planningMode: Optional[PlanningMode] = Field(
+        default=PlanningMode.SEPARATE,
+        description="How planning is done when addPlanning is true. 'separate' plans in its own LLM call before each action, 'fused' plans within the arguments of each action",
+    )
+    bilingualSummary: Optional[bool] = Field(
+        default=False,
+        description="Whether to generate the English and Simplified Chinese notes in a single summarisation call, falling back to a separate translation if that fails",
+    )
 
 
 class SavedAgentCall(AgentResponse):
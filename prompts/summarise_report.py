@@ -24,9 +24,16 @@ The note should also be written with the assumption that users have short attent
 
 A good note would start with a clear statement like the above, and then justify it while summarising the key points of the report. There's no need to describe/summarise what's in the message itself."""
 
+bilingual_instructions = """
 
-def compile_messages_array():
-    prompt_messages = [{"role": "system", "content": summarise_report_system_prompt}]
+You must also provide a translation of the note into Simplified Chinese. The translation should capture the meaning, tone and style of the English note, and should be fluent and grammatically correct rather than a direct transliteration."""
+
+
+def compile_messages_array(bilingual=False):
+    system_prompt = summarise_report_system_prompt
+    if bilingual:
+        system_prompt += bilingual_instructions
+    prompt_messages = [{"role": "system", "content": system_prompt}]
     return prompt_messages
 
 
@@ -53,14 +60,48 @@ config = {
     },
 }
 
+bilingual_config = {
+    "model": "gpt-4o",
+    "temperature": 0.0,
+    "seed": 11,
+    "response_format": {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "summarise_report_bilingual",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "community_note": config["response_format"]["json_schema"][
+                        "schema"
+                    ]["properties"]["community_note"],
+                    "community_note_cn": {
+                        "type": "string",
+                        "description": "The community note translated into Simplified Chinese.",
+                    },
+                },
+                "required": ["community_note", "community_note_cn"],
+                "additionalProperties": False,
+            },
+        },
+    },
+}
+
 if __name__ == "__main__":
     langfuse = Langfuse()
-    prompt_messages = compile_messages_array()
-    langfuse.create_prompt(
-        name="summarise_report",
-        type="chat",
-        prompt=prompt_messages,
-        labels=["production", "development", "uat"],  # directly promote to production
-        config=config,  # optionally, add configs (e.g. model parameters or model tools) or tags
-    )
+    for name, bilingual, prompt_config in (
+        ("summarise_report", False, config),
+        ("summarise_report_bilingual", True, bilingual_config),
+    ):
+        prompt_messages = compile_messages_array(bilingual=bilingual)
+        langfuse.create_prompt(
+            name=name,
+            type="chat",
+            prompt=prompt_messages,
+            labels=[
+                "production",
+                "development",
+                "uat",
+            ],  # directly promote to production
+            config=prompt_config,  # optionally, add configs (e.g. model parameters or model tools) or tags
+        )
     print("Prompt created successfully.")
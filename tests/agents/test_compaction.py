@@ -0,0 +1,111 @@
+# tests/agents/test_compaction.py
+
+import json
+from google.genai import types
+from agents.compaction import (
+    CompactionPolicy,
+    compact_gemini_contents,
+    compact_openai_messages,
+)
+
+SEARCH_RESULTS = [
+    {
+        "title": "CheckMate",
+        "link": "https://checkmate.sg",
+        "snippet": "s",
+        "position": 1,
+    }
+]
+
+
+def tool_call(call_id, name, arguments="{}"):
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": arguments},
+    }
+
+
+def build_openai_messages():
+    return [
+        {"role": "system", "content": "system prompt"},
+        {"role": "user", "content": [{"type": "text", "text": "User sent in: hi"}]},
+        {"role": "assistant", "tool_calls": [tool_call("1", "plan_next_step")]},
+        {"role": "tool", "tool_call_id": "1", "content": '{"reasoning": "r"}'},
+        {"role": "assistant", "tool_calls": [tool_call("2", "search_google")]},
+        {"role": "tool", "tool_call_id": "2", "content": json.dumps(SEARCH_RESULTS)},
+        {
+            "role": "assistant",
+            "tool_calls": [tool_call("3", "get_website_screenshot")],
+        },
+        {"role": "tool", "tool_call_id": "3", "content": "Screenshot taken"},
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "Here is the screenshot for https://checkmate.sg returned by get_website_screenshot",
+                },
+                {"type": "image_url", "image_url": {"url": "gs://bucket/a.png"}},
+            ],
+        },
+        {"role": "assistant", "tool_calls": [tool_call("4", "check_malicious_url")]},
+        {"role": "tool", "tool_call_id": "4", "content": "{}"},
+    ]
+
+
+def test_compact_openai_messages():
+    messages = build_openai_messages()
+    original = json.dumps(messages)
+    compacted = compact_openai_messages(
+        messages, CompactionPolicy(keep_screenshot_turns=1, keep_search_turns=1)
+    )
+    assert json.dumps(messages) == original  # input is left untouched
+    assert len(compacted) == len(messages)
+    assert json.loads(compacted[3]["content"]) == {"status": "noted"}
+    assert json.loads(compacted[5]["content"]) == [
+        {"title": "CheckMate", "link": "https://checkmate.sg", "snippet": "s"}
+    ]
+    screenshot_parts = compacted[8]["content"]
+    assert all(part["type"] == "text" for part in screenshot_parts)
+    assert "https://checkmate.sg" in screenshot_parts[1]["text"]
+    assert compacted[1] is messages[1]  # the submitted content is never compacted
+
+
+def test_compact_openai_messages_disabled():
+    messages = build_openai_messages()
+    assert (
+        compact_openai_messages(messages, CompactionPolicy(enabled=False)) is messages
+    )
+
+
+def test_compact_gemini_contents_keeps_recent_screenshots():
+    image = types.Part.from_bytes(data=b"image", mime_type="image/png")
+    contents = [
+        types.Content(role="user", parts=[types.Part.from_text("User sent in")]),
+        types.Content(
+            role="model",
+            parts=[
+                types.Part.from_function_call(
+                    name="get_website_screenshot", args={"url": "https://a.sg"}
+                )
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_function_response(
+                    name="get_website_screenshot", response={"result": "ok"}
+                ),
+                image,
+            ],
+        ),
+    ]
+    policy = CompactionPolicy(keep_screenshot_turns=1)
+    assert compact_gemini_contents(contents, policy)[2].parts[1] is image
+
+    contents.append(types.Content(role="model", parts=[types.Part.from_text("x")]))
+    compacted = compact_gemini_contents(contents, policy)
+    assert compacted[2].parts[1].inline_data is None
+    assert "removed" in compacted[2].parts[1].text
+    assert contents[2].parts[1] is image
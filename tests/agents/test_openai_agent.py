@@ -0,0 +1,45 @@
+# tests/agents/test_openai_agent.py
+
+import json
+import pytest
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from agents.openai_agent import OpenAIAgent
+from agents.run_context import AgentRunContext
+from tests.tools.test_search_queries import FakeSerper, search_google_module
+from tools import get_tool_registry
+
+
+def search_call(*queries):
+    return ChatCompletionMessageToolCall(
+        id="call_1",
+        type="function",
+        function=Function(
+            name="search_google", arguments=json.dumps({"queries": list(queries)})
+        ),
+    )
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(search_google_module, "http_client", FakeSerper())
+    return OpenAIAgent(None, get_tool_registry(False, False))
+
+
+@pytest.mark.asyncio
+async def test_skipped_searches_are_reported_to_the_model(agent):
+    run_context = AgentRunContext(max_searches=1)
+    message = await agent.call_function(search_call("scam", "payout"), run_context)
+    content = json.loads(message["content"])
+    assert content["result"] and content["skippedQueries"] == ["payout"]
+
+    message = await agent.call_function(search_call("refund"), run_context)
+    content = json.loads(message["content"])
+    assert "search budget is used up" in content["result"]
+    assert content["skippedQueries"] == ["refund"]
+
+
+@pytest.mark.asyncio
+async def test_failed_searches_are_reported_to_the_model(agent):
+    message = await agent.call_function(search_call("failing"), AgentRunContext())
+    assert "500" in json.loads(message["content"])
@@ -0,0 +1,11 @@
+# tests/agents/test_run_context.py
+
+from agents.run_context import AgentRunContext
+
+
+def test_take_searches_stays_within_budget():
+    run_context = AgentRunContext(max_searches=3)
+    assert run_context.take_searches(["a", "b", "a", None]) == ["a", "b"]
+    assert run_context.take_searches(["c", "d"]) == ["c"]
+    assert run_context.take_searches(["e"]) == []
+    assert run_context.remaining_searches == 0
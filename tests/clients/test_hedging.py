@@ -0,0 +1,84 @@
+# tests/clients/test_hedging.py
+import asyncio
+import pytest
+from clients.hedging import Hedger, HedgingPolicy
+
+
+def make_hedger(**kwargs):
+    policy = HedgingPolicy(enabled=True, min_samples=5, **kwargs)
+    hedger = Hedger(policy)
+    for _ in range(policy.min_samples):
+        hedger.stats["test"].record_latency(0.01)
+        hedger.stats["test"].record_call(False)
+    return hedger
+
+
+def respond_after(delay, value, calls):
+    async def call():
+        calls.append(value)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls.append(f"{value} cancelled")
+            raise
+        return value
+
+    return call
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    hedger = make_hedger(max_hedge_rate=1.0)
+    calls = []
+    result = await hedger.run(
+        "test", respond_after(1, "primary", calls), respond_after(0, "hedge", calls)
+    )
+    await asyncio.sleep(0)
+    assert result == "hedge"
+    assert calls == ["primary", "hedge", "primary cancelled"]
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_before_enough_samples():
+    hedger = Hedger(HedgingPolicy(enabled=True, min_samples=5, max_hedge_rate=1.0))
+    calls = []
+    result = await hedger.run(
+        "test", respond_after(0.05, "primary", calls), respond_after(0, "hedge", calls)
+    )
+    assert result == "primary"
+    assert calls == ["primary"]
+
+
+@pytest.mark.asyncio
+async def test_hedge_rate_is_capped():
+    hedger = make_hedger(max_hedge_rate=0.1)
+    calls = []
+    for _ in range(3):
+        await hedger.run(
+            "test",
+            respond_after(0.05, "primary", calls),
+            respond_after(0, "hedge", calls),
+        )
+    assert calls.count("hedge") == 1  # a second hedge would exceed 10% of 7 calls
+
+
+@pytest.mark.asyncio
+async def test_failed_hedge_falls_back_to_primary():
+    hedger = make_hedger(max_hedge_rate=1.0)
+
+    async def failing():
+        raise RuntimeError("upstream error")
+
+    result = await hedger.run("test", respond_after(0.05, "primary", []), failing)
+    assert result == "primary"
+
+
+@pytest.mark.asyncio
+async def test_hedged_calls_record_the_latency_from_the_primary_start():
+    hedger = make_hedger(max_hedge_rate=1.0)
+    calls = []
+    await hedger.run(
+        "test", respond_after(1, "primary", calls), respond_after(0.05, "hedge", calls)
+    )
+    # The hedge is sent after the 0.01s delay and answers 0.05s later
+    assert hedger.stats["test"].latencies[-1] >= 0.06
@@ -0,0 +1,21 @@
+# tests/clients/test_http.py
+import asyncio
+from clients.http import HttpClientConfig, SharedHttpClient
+
+
+def test_host_timeouts_override_default():
+    config = HttpClientConfig(timeout=60, host_timeouts={"google.serper.dev": 10})
+    assert config.timeout_for("https://google.serper.dev/search").read == 10
+    assert config.timeout_for("https://example.com/evaluate").read == 60
+
+
+def test_client_is_shared_within_a_loop_and_recreated_across_loops():
+    shared = SharedHttpClient(HttpClientConfig())
+
+    async def get_clients():
+        return shared.client, shared.client
+
+    first, second = asyncio.run(get_clients())
+    assert first is second
+    third, _ = asyncio.run(get_clients())
+    assert third is not first
@@ -0,0 +1,70 @@
+# tests/clients/test_identity_tokens.py
+
+import asyncio
+import base64
+import json
+import threading
+import time
+import pytest
+from clients.identity_tokens import IdentityTokenPolicy, IdentityTokenProvider
+
+
+def make_token(lifetime: float) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    payload = {"exp": int(time.time() + lifetime)}
+    return f"{encode({'alg': 'RS256', 'typ': 'JWT'})}.{encode(payload)}.c2ln"
+
+
+class FakeFetcher:
+    def __init__(self, lifetime: float, delay: float = 0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, audience: str) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return make_token(self.lifetime)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_fetch():
+    fetcher = FakeFetcher(lifetime=3600, delay=0.1)
+    provider = IdentityTokenProvider(IdentityTokenPolicy(), fetch=fetcher)
+    tokens = await asyncio.gather(
+        *(provider.get_token("https://screenshot") for _ in range(10))
+    )
+    assert len(set(tokens)) == 1
+    assert await provider.get_token("https://screenshot") == tokens[0]
+    assert fetcher.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_token_close_to_expiry_is_served_while_refreshing():
+    fetcher = FakeFetcher(lifetime=120, delay=0.05)
+    provider = IdentityTokenProvider(
+        IdentityTokenPolicy(refresh_ahead=300, expiry_margin=30), fetch=fetcher
+    )
+    first = await provider.get_token("https://screenshot")
+    fetcher.lifetime = 3600
+    start_time = time.perf_counter()
+    assert await provider.get_token("https://screenshot") == first
+    assert time.perf_counter() - start_time < 0.05
+    await asyncio.sleep(0.2)
+    assert await provider.get_token("https://screenshot") != first
+    assert fetcher.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_fetched_again():
+    fetcher = FakeFetcher(lifetime=10)
+    provider = IdentityTokenProvider(
+        IdentityTokenPolicy(refresh_ahead=300, expiry_margin=30), fetch=fetcher
+    )
+    await provider.get_token("https://screenshot")
+    await provider.get_token("https://screenshot")
+    assert fetcher.calls == 2
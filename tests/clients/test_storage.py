@@ -0,0 +1,51 @@
+# tests/clients/test_storage.py
+import datetime
+import sqlite3
+import pytest
+from clients.storage import (
+    FileBackend,
+    PendingWrite,
+    SqliteBackend,
+    StorageConfig,
+)
+
+
+def test_sqlite_backend_stores_batches_in_wal_mode(tmp_path):
+    path = str(tmp_path / "checkmate.db")
+    backend = SqliteBackend(path)
+    timestamp = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    backend.write_batch(
+        [
+            PendingWrite("agent_calls", "a", {"success": True, "timestamp": timestamp}),
+            PendingWrite("agent_calls", "b", {"success": False}),
+            PendingWrite("pii_masks", "a", {"masked": "[NAME]"}),
+        ]
+    )
+    backend.write_batch([PendingWrite("agent_calls", "b", {"success": True})])
+    assert backend.get("agent_calls", "a") == {
+        "success": True,
+        "timestamp": "2025-01-01 00:00:00+00:00",
+    }
+    assert backend.get("agent_calls", "b") == {"success": True}
+    assert backend.get("pii_masks", "a") == {"masked": "[NAME]"}
+    assert backend.get("pii_masks", "b") is None
+    backend.close()
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert connection.execute("SELECT COUNT(*) FROM documents").fetchone() == (3,)
+
+
+def test_file_backend_returns_the_last_write(tmp_path):
+    backend = FileBackend(str(tmp_path / "writes.jsonl"))
+    assert backend.get("c", "a") is None
+    backend.write_batch([PendingWrite("c", "a", {"v": 1}), PendingWrite("c", "b", {})])
+    backend.write_batch([PendingWrite("c", "a", {"v": 2})])
+    assert backend.get("c", "a") == {"v": 2}
+
+
+def test_backends_are_selected_by_config(tmp_path):
+    backend = StorageConfig(backend="sqlite", sqlite_path=str(tmp_path / "a.db"))
+    assert isinstance(backend.create_backend(), SqliteBackend)
+    with pytest.raises(ValueError):
+        StorageConfig(backend="mongodb").create_backend()
@@ -0,0 +1,79 @@
+# tests/clients/test_trace_store.py
+import pytest
+from clients.trace_store import (
+    LocalTraceStore,
+    TraceStorage,
+    TraceStorageConfig,
+    TraceStore,
+    count_tool_calls,
+)
+
+TRACE = [
+    {"role": "user", "content": "Is this a scam? " * 200},
+    {
+        "role": "assistant",
+        "tool_calls": [{"function": {"name": "search_google"}}] * 2,
+    },
+    {"role": "model", "parts": [{"function_call": {"name": "check_url"}}]},
+]
+DOCUMENT = {"requestId": "r1", "success": True, "agentTrace": TRACE}
+
+
+class FailingStore(TraceStore):
+    def put(self, key, data):
+        raise OSError("unavailable")
+
+    def get(self, uri):
+        raise OSError("unavailable")
+
+
+def test_count_tool_calls_of_openai_and_gemini_traces():
+    assert count_tool_calls(TRACE) == 3
+
+
+@pytest.mark.asyncio
+async def test_traces_are_stored_compressed_and_rehydrated(tmp_path):
+    config = TraceStorageConfig(backend="local", directory=str(tmp_path))
+    storage = TraceStorage(config)
+    document = await storage.offload("r1", DOCUMENT)
+    reference = document["agentTraceRef"]
+    assert document["agentTrace"] is None
+    assert reference["uri"].endswith("agent_traces/r1.json.gz")
+    assert (reference["messages"], reference["toolCalls"]) == (3, 3)
+    assert reference["storedBytes"] < reference["rawBytes"] / 10
+
+    restarted = TraceStorage(TraceStorageConfig(directory=str(tmp_path)))
+    rehydrated = await restarted.rehydrate(document)
+    assert rehydrated["agentTrace"] == TRACE
+
+
+@pytest.mark.asyncio
+async def test_traces_stay_inline_without_a_store_or_when_storing_fails(tmp_path):
+    assert await TraceStorage(TraceStorageConfig()).offload("r1", DOCUMENT) is DOCUMENT
+    storage = TraceStorage(TraceStorageConfig(backend="local"), FailingStore())
+    assert await storage.offload("r1", DOCUMENT) is DOCUMENT
+    assert await storage.rehydrate(DOCUMENT) is DOCUMENT
+
+
+def test_local_store_round_trip(tmp_path):
+    store = LocalTraceStore(str(tmp_path))
+    uri = store.put("a/b.json.gz", b"data")
+    assert store.get(uri) == b"data"
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_request_ids_cannot_escape_the_trace_directory(tmp_path):
+    root = tmp_path / "traces"
+    config = TraceStorageConfig(backend="local", directory=str(root))
+    document = await TraceStorage(config).offload("../../etc/x", DOCUMENT)
+    assert document["agentTraceRef"]["uri"].endswith(
+        "agent_traces/..%2F..%2Fetc%2Fx.json.gz"
+    )
+    assert [path.parent for path in root.rglob("*.gz")] == [root / "agent_traces"]
+
+    store = LocalTraceStore(str(root))
+    with pytest.raises(ValueError):
+        store.put("../outside.json.gz", b"data")
+    with pytest.raises(ValueError):
+        store.get(f"file://{tmp_path}/outside.json.gz")
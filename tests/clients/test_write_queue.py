@@ -0,0 +1,169 @@
+# tests/clients/test_write_queue.py
+import asyncio
+import json
+import threading
+import time
+import pytest
+from clients.storage import FileBackend, PendingWrite, StorageBackend
+from clients.write_queue import WriteQueue, WriteQueueConfig
+
+FAST = dict(linger=0.01, initial_backoff=0.01, max_backoff=0.02, put_timeout=0.1)
+
+
+class FakeBackend(StorageBackend):
+    """Records committed batches. Fails the first `failures` commits, and blocks
+    commits while `release` is not set."""
+
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+
+    def write_batch(self, writes):
+        self.release.wait(timeout=5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("unavailable")
+        self.batches.append(list(writes))
+
+    def get(self, collection, document_id):
+        return self.documents.get((collection, document_id))
+
+    @property
+    def documents(self):
+        return {
+            (write.collection, write.document_id): write.data
+            for batch in self.batches
+            for write in batch
+        }
+
+
+def make_queue(backend, **overrides) -> WriteQueue:
+    return WriteQueue(WriteQueueConfig(**{**FAST, **overrides}), backend)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_committed_in_batches_off_the_request_path():
+    backend = FakeBackend()
+    backend.release.clear()
+    queue = make_queue(backend, batch_size=10)
+    queue.start()
+    start_time = time.perf_counter()
+    for i in range(25):
+        await queue.put("agent_calls", str(i), {"i": i})
+    await queue.put("agent_calls", "0", {"i": "latest"})
+    assert time.perf_counter() - start_time < 0.1  # callers don't wait for writes
+
+    backend.release.set()
+    await queue.stop()
+    assert len(backend.documents) == 25
+    assert backend.documents[("agent_calls", "0")] == {"i": "latest"}
+    assert all(len(batch) <= 10 for batch in backend.batches)
+    assert len(backend.batches) <= 4
+
+
+@pytest.mark.asyncio
+async def test_failed_commits_are_retried_then_dropped():
+    backend = FakeBackend(failures=2)
+    queue = make_queue(backend, max_retries=2)
+    queue.start()
+    await queue.put("trivial_filters", "a", {})
+    await queue.flush()
+    assert ("trivial_filters", "a") in backend.documents
+
+    backend.failures = 10
+    await queue.put("trivial_filters", "b", {})
+    await queue.stop()
+    assert ("trivial_filters", "b") not in backend.documents
+
+
+class RejectingBackend(FakeBackend):
+    """Rejects batches containing the document "bad", as Firestore rejects a
+    document over 1 MiB, and counts the batches written."""
+
+    def __init__(self, failures: int = 0):
+        super().__init__(failures)
+        self.attempts = 0
+
+    def write_batch(self, writes):
+        self.attempts += 1
+        if any(write.document_id == "bad" for write in writes):
+            raise ValueError("document too large")
+        super().write_batch(writes)
+
+
+@pytest.mark.asyncio
+async def test_rejected_documents_are_dropped_alone_without_retries():
+    backend = RejectingBackend()
+    queue = make_queue(backend, max_retries=3, initial_backoff=5, max_backoff=5)
+    writes = [PendingWrite("agent_calls", str(i), {}) for i in range(7)]
+    start_time = time.perf_counter()
+    await queue._commit([*writes, PendingWrite("agent_calls", "bad", {})])
+    assert time.perf_counter() - start_time < 1  # no backoff
+    assert set(backend.documents) == {("agent_calls", str(i)) for i in range(7)}
+    assert backend.attempts == 7  # the batch, then halves down to "bad"
+
+
+@pytest.mark.asyncio
+async def test_batches_failing_transiently_are_split_once():
+    backend = RejectingBackend(failures=100)
+    queue = make_queue(backend, max_retries=1)
+    await queue._commit([PendingWrite("agent_calls", str(i), {}) for i in range(8)])
+    assert backend.documents == {}
+    assert backend.attempts == 4  # two tries, then each half once
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_then_writes_directly():
+    backend = FakeBackend()
+    backend.release.clear()
+    queue = make_queue(backend, max_size=1, batch_size=1)
+    queue.start()
+    await queue.put("pii_masks", "a", {})  # taken by the blocked worker
+    await queue.put("pii_masks", "b", {})  # fills the queue
+    put = asyncio.create_task(queue.put("pii_masks", "c", {}))
+    await asyncio.sleep(0.05)
+    assert not put.done()  # waiting for space
+
+    await asyncio.sleep(0.1)  # past put_timeout: written by the caller
+    backend.release.set()
+    await put
+    await queue.stop()
+    assert set(backend.documents) == {("pii_masks", key) for key in "abc"}
+
+
+@pytest.mark.asyncio
+async def test_submit_queues_writes_from_threads_and_the_event_loop():
+    backend = FakeBackend()
+    queue = make_queue(backend)
+    queue.start()
+    await asyncio.to_thread(queue.submit, "sensitivity_filter", "thread", {})
+    queue.submit("sensitivity_filter", "loop", {})
+    await queue.stop()
+    assert set(backend.documents) == {
+        ("sensitivity_filter", "thread"),
+        ("sensitivity_filter", "loop"),
+    }
+
+
+def test_writes_are_direct_without_a_running_queue(tmp_path):
+    path = tmp_path / "writes.jsonl"
+    queue = make_queue(FileBackend(str(path)))
+    queue.submit("ocr_extractions", "a", {"success": True})
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {
+            "collection": "ocr_extractions",
+            "document_id": "a",
+            "data": {"success": True},
+        }
+    ]
+
+
+def test_deduplicate_keeps_the_last_write_of_each_document():
+    writes = [
+        PendingWrite("c", "a", {"v": 1}),
+        PendingWrite("c", "b", {}),
+        PendingWrite("c", "a", {"v": 2}),
+    ]
+    assert WriteQueue._deduplicate(writes) == [writes[1], writes[2]]
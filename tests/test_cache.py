@@ -0,0 +1,19 @@
+# tests/test_cache.py
+from utils.cache import TTLCache
+
+
+def test_entries_expire_and_least_recently_used_are_evicted():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    now[0] = 11
+    assert cache.get("a") is None
+    cache.set("d", 4, ttl=100)
+    now[0] = 50
+    assert cache.get("d") == 4
+    assert (cache.hits, cache.misses) == (3, 2)
@@ -0,0 +1,108 @@
+# tests/test_domain_reputation.py
+
+import json
+import os
+import time
+import pytest
+import tools.rmse_scanner as rmse_scanner
+from utils.domain_reputation import (
+    DEFAULT_PATH,
+    DomainIndex,
+    DomainReputation,
+)
+
+
+def write_index(path, version, allow=(), block=()):
+    path.write_text(
+        json.dumps({"version": version, "allow": list(allow), "block": list(block)})
+    )
+
+
+def test_entries_match_domains_and_their_subdomains():
+    index = DomainIndex.from_dict(
+        {"allow": ["gov.sg", "example.com"], "block": ["bad.example.com"]}
+    )
+    assert index.lookup("gov.sg").classification == "BENIGN"
+    assert index.lookup("www.mom.gov.sg").matched == "gov.sg"
+    assert index.lookup("bad.example.com").classification == "MALICIOUS"
+    assert index.lookup("x.bad.example.com").classification == "MALICIOUS"
+    assert index.lookup("good.example.com").classification == "BENIGN"
+    assert index.lookup("notgov.sg") is None
+    assert index.lookup("gov.sg.attacker.com") is None
+    assert index.lookup("sg") is None
+
+
+def test_lookup_normalises_links(tmp_path):
+    path = tmp_path / "index.json"
+    write_index(path, "1", allow=["dbs.com.sg"])
+    reputation = DomainReputation(str(path))
+    assert reputation.lookup("https://WWW.DBS.com.sg./personal?x=1").matched == (
+        "dbs.com.sg"
+    )
+    assert reputation.lookup("dbs.com.sg/login").classification == "BENIGN"
+    assert reputation.lookup("https://dbs.com.sg.example.net") is None
+
+
+def test_changed_file_is_reloaded_after_interval(tmp_path):
+    now = [0.0]
+    path = tmp_path / "index.json"
+    write_index(path, "1", allow=["example.com"])
+    reputation = DomainReputation(str(path), reload_interval=10, clock=lambda: now[0])
+    assert reputation.lookup("example.com").version == "1"
+
+    write_index(path, "2", block=["example.com"])
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert reputation.lookup("example.com").version == "1"
+    now[0] = 10
+    verdict = reputation.lookup("example.com")
+    assert (verdict.version, verdict.classification) == ("2", "MALICIOUS")
+
+
+def test_unreadable_file_keeps_current_index(tmp_path):
+    path = tmp_path / "index.json"
+    write_index(path, "1", allow=["example.com"])
+    reputation = DomainReputation(str(path))
+    path.write_text("{not json")
+    assert reputation.reload(force=True) is False
+    assert reputation.lookup("example.com").version == "1"
+
+
+def test_shipped_index_loads():
+    index = DomainIndex.from_file(DEFAULT_PATH)
+    assert index.version
+    assert index.lookup("www.gov.sg").classification == "BENIGN"
+
+
+def test_lookups_take_microseconds():
+    index = DomainIndex.from_dict(
+        {"allow": [f"site{i}.example{i % 100}.com" for i in range(100_000)]}
+    )
+    hosts = [f"www.site{i}.example{i % 100}.com" for i in range(1000)] + [
+        f"unknown{i}.net" for i in range(1000)
+    ]
+    start_time = time.perf_counter()
+    for host in hosts:
+        index.lookup(host)
+    assert (time.perf_counter() - start_time) / len(hosts) < 50e-6
+
+
+@pytest.mark.asyncio
+async def test_known_domains_skip_rmse(monkeypatch, tmp_path):
+    class NoRmse:
+        async def post(self, *args, **kwargs):
+            raise AssertionError("RMSE should not be called")
+
+    path = tmp_path / "index.json"
+    write_index(path, "1", allow=["gov.sg"], block=["scam.example"])
+    monkeypatch.setattr(rmse_scanner, "domain_reputation", DomainReputation(str(path)))
+    monkeypatch.setattr(rmse_scanner, "http_client", NoRmse())
+    result = await rmse_scanner.check_malicious_urls(
+        ["https://www.gov.sg/article", "http://login.scam.example"]
+    )
+    verdicts = {
+        url: r["result"]["classification"] for url, r in result["result"].items()
+    }
+    assert verdicts == {
+        "https://www.gov.sg/article": "BENIGN",
+        "http://login.scam.example": "MALICIOUS",
+    }
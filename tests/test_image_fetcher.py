@@ -0,0 +1,116 @@
+# tests/test_image_fetcher.py
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+import pytest
+from utils.image_fetcher import (
+    ImageFetchConfig,
+    ImageFetcher,
+    ImageFetchError,
+    parse_gcs_url,
+    sniff_mime_type,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 5000
+# (bucket, object) -> contents
+OBJECTS = {
+    ("checkmate", "images/a b.png"): PNG,
+    ("checkmate", "large.jpg"): JPEG,
+    ("checkmate", "page.html"): b"<html>Not found</html>",
+}
+
+
+class FakeGcsHandler(BaseHTTPRequestHandler):
+    """Serves OBJECTS like the GCS JSON API, and /slow after a delay."""
+
+    requests_served = 0
+
+    def do_GET(self):
+        FakeGcsHandler.requests_served += 1
+        parts = urlsplit(self.path)
+        if parts.path == "/slow":
+            time.sleep(1)
+        segments = parts.path.split("/")
+        # /storage/v1/b/<bucket>/o/<object>?alt=media
+        key = (unquote(segments[-3]), unquote(segments[-1]))
+        body = OBJECTS.get(key) if parts.query == "alt=media" else None
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gcs_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGcsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(gcs_url: str, **overrides) -> ImageFetcher:
+    return ImageFetcher(ImageFetchConfig(gcs_endpoint=gcs_url, **overrides))
+
+
+def test_parse_gcs_url():
+    assert parse_gcs_url("gs://bucket/a/b.png") == ("bucket", "a/b.png")
+    assert parse_gcs_url("https://storage.googleapis.com/bucket/a%20b.png") == (
+        "bucket",
+        "a b.png",
+    )
+    assert parse_gcs_url("https://example.com/bucket/a.png") is None
+
+
+def test_sniff_mime_type():
+    assert sniff_mime_type(PNG) == "image/png"
+    assert sniff_mime_type(JPEG) == "image/jpeg"
+    assert sniff_mime_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_mime_type(b"\x00\x00\x00\x18ftypheic") == "image/heic"
+    assert sniff_mime_type(b"<html>") is None
+
+
+@pytest.mark.asyncio
+async def test_gcs_images_are_fetched_once_and_cached(gcs_url):
+    fetcher = make_fetcher(gcs_url)
+    FakeGcsHandler.requests_served = 0
+    image = await fetcher.fetch("gs://checkmate/images/a b.png")
+    assert (image.data, image.mime_type) == (PNG, "image/png")
+    await fetcher.fetch("gs://checkmate/images/a b.png")
+    assert FakeGcsHandler.requests_served == 1
+
+    image = await fetcher.fetch("https://storage.googleapis.com/checkmate/large.jpg")
+    assert image.mime_type == "image/jpeg"
+
+
+@pytest.mark.asyncio
+async def test_oversized_and_non_image_downloads_are_rejected(gcs_url):
+    fetcher = make_fetcher(gcs_url, max_bytes=1000)
+    with pytest.raises(ImageFetchError, match="exceeds"):
+        await fetcher.fetch("gs://checkmate/large.jpg")
+    with pytest.raises(ImageFetchError, match="supported image"):
+        await fetcher.fetch("gs://checkmate/page.html")
+    with pytest.raises(ImageFetchError, match="404"):
+        await fetcher.fetch("gs://checkmate/missing.png")
+    with pytest.raises(ImageFetchError, match="Unsupported"):
+        await fetcher.fetch("file:///etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_slow_downloads_time_out(gcs_url):
+    fetcher = make_fetcher(gcs_url, timeout=0.2)
+    start_time = time.perf_counter()
+    with pytest.raises(ImageFetchError, match="Timed out"):
+        await fetcher.fetch(f"{gcs_url}/slow")
+    assert time.perf_counter() - start_time < 0.8
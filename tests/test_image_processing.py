@@ -0,0 +1,51 @@
+# tests/test_image_processing.py
+
+import io
+from PIL import Image
+from utils.image_processing import ImageProcessingConfig, preprocess_image
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def noise(width: int, height: int, mode: str = "RGB") -> Image.Image:
+    return Image.merge(
+        mode, [Image.effect_noise((width, height), 60) for _ in range(len(mode))]
+    )
+
+
+def test_small_image_is_passed_through_with_its_real_type():
+    data = encode(noise(200, 100), "PNG")
+    [image] = preprocess_image(data, ImageProcessingConfig())
+    assert image.data == data
+    assert image.mime_type == "image/png"
+
+
+def test_large_image_is_downscaled_and_fits_in_max_bytes():
+    data = encode(noise(3000, 2000, "RGBA"), "PNG")
+    config = ImageProcessingConfig(max_dimension=1000, max_bytes=100_000)
+    [image] = preprocess_image(data, config)
+    assert max(image.width, image.height) <= 1000
+    assert len(image.data) <= 100_000
+    image_format = Image.open(io.BytesIO(image.data)).format
+    assert image.mime_type == f"image/{image_format.lower()}"
+
+
+def test_tall_image_is_split_into_capped_tiles():
+    data = encode(noise(500, 5000), "JPEG")
+    config = ImageProcessingConfig(tile_tall_images=True, max_tiles=3)
+    images = preprocess_image(data, config)
+    assert len(images) == 3
+    assert all(
+        (image.width, image.height) == (500, 500) for image in images
+    ), "tiles are square crops of the full width"
+
+
+def test_images_that_cannot_be_decoded_keep_their_type():
+    data = b"\x00\x00\x00\x18ftypheic"
+    [image] = preprocess_image(data, ImageProcessingConfig(), "image/heic")
+    assert image.data == data
+    assert image.mime_type == "image/heic"
@@ -0,0 +1,54 @@
+# tests/test_logger.py
+import datetime
+import io
+import json
+import pytest
+import logger
+from logger import LoggerContext, StructuredLogger
+
+
+@pytest.fixture
+def output():
+    stream = io.StringIO()
+    previous = logger.handler.setStream(stream)
+    yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    logger.handler.setStream(previous)
+
+
+def test_children_are_context_views_of_one_logger(output):
+    log = StructuredLogger("test")
+    child = log.child(request="a").child(tool="search")
+    assert isinstance(child, LoggerContext) and child.name == "test"
+    assert log.handlers == [logger.handler]
+
+    child.info("searching", query="scam")
+    child.debug("not logged")
+    [line] = output()
+    assert line["message"] == "searching"
+    assert (line["request"], line["tool"], line["query"]) == ("a", "search", "scam")
+    assert line["file"] == __file__
+    assert line["level"] == "INFO"
+
+
+def test_values_are_serialised_once_as_json_or_strings(output):
+    log = StructuredLogger("test")
+    log.warn("values", date=datetime.date(2025, 1, 2), kind=object, counts={1: 2})
+    [line] = output()
+    assert line["date"] == "2025-01-02"
+    assert line["kind"] == "<class 'object'>"
+    assert line["counts"] == {"1": 2}
+
+
+def test_errors_include_the_exception(output):
+    log = StructuredLogger("test").child(request="a")
+    try:
+        raise ValueError("bad input")
+    except ValueError as e:
+        log.error("Error in handler", error=str(e))
+    log.error("Error in handler", ValueError("passed positionally"))
+    log.error("Error without exception", error="timeout")
+    handled, positional, plain = output()
+    assert handled["error"]["type"] == "ValueError"
+    assert "raise ValueError" in handled["error"]["traceback"]
+    assert positional["error"]["message"] == "passed positionally"
+    assert plain["error"] == "timeout"
@@ -0,0 +1,109 @@
+# tests/test_ocr_cache.py
+import io
+import random
+from PIL import Image, ImageDraw
+from utils.ocr_cache import OcrCache, OcrCacheConfig
+
+RESULT = {
+    "image_type": "convo",
+    "sender": "DBS",
+    "subject": None,
+    "extracted_message": "Your account is locked, click the link",
+}
+
+
+def screenshot(seed: int, width: int = 720, height: int = 1280) -> Image.Image:
+    """Draws a chat screenshot with randomly placed message bubbles."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (236, 229, 221))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 90), fill=(7, 94, 84))
+    top = 120
+    while top < height - 100:
+        incoming = rng.random() < 0.5
+        bubble_width, bubble_height = rng.randint(200, 560), rng.randint(60, 220)
+        left = 20 if incoming else width - 20 - bubble_width
+        draw.rectangle(
+            (left, top, left + bubble_width, top + bubble_height),
+            fill=(255, 255, 255) if incoming else (220, 248, 198),
+        )
+        for line in range(top + 15, top + bubble_height - 15, 28):
+            words = " ".join(rng.choice(["bank", "click", "urgent"]) for _ in range(6))
+            draw.text((left + 15, line), words, fill=(0, 0, 0))
+        top += bubble_height + 20
+    return image
+
+
+def encode(image: Image.Image, image_format: str = "PNG", **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def make_cache(tmp_path, clock=None, **kwargs) -> OcrCache:
+    config = OcrCacheConfig(path=str(tmp_path / "ocr.sqlite3"), **kwargs)
+    return OcrCache(config, clock=clock) if clock else OcrCache(config)
+
+
+def scam_screenshot(link: str) -> Image.Image:
+    """Draws a phishing SMS from a template, with the given link."""
+    image = Image.new("RGB", (720, 1280), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 720, 90), fill=(240, 240, 240))
+    draw.text((20, 35), "DBS Bank", fill=(0, 0, 0))
+    draw.rectangle((20, 120, 600, 320), fill=(229, 229, 234))
+    draw.text((35, 140), "Your account has been suspended.", fill=(0, 0, 0))
+    draw.text((35, 170), "Verify your identity at", fill=(0, 0, 0))
+    draw.text((35, 200), link, fill=(0, 0, 255))
+    return image
+
+
+def test_only_identical_images_share_results(tmp_path):
+    cache = make_cache(tmp_path)
+    image = screenshot(1)
+    cache.set(cache.key(encode(image)), RESULT)
+
+    assert cache.lookup(encode(image))[1] == RESULT
+    assert cache.lookup(encode(image, "JPEG", quality=60))[1] is None
+    assert cache.lookup(encode(screenshot(2)))[1] is None
+
+
+def test_screenshots_from_one_template_with_different_links_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    data = encode(scam_screenshot("https://dbs-secure-login.com/verify"))
+    cache.set(cache.key(data), RESULT)
+    assert cache.lookup(data)[1] == RESULT
+    assert cache.lookup(encode(scam_screenshot("https://ocbc-alerts.net/x")))[1] is None
+
+
+def test_results_expire_and_persist_across_restarts(tmp_path):
+    now = [1000.0]
+    clock = lambda: now[0]
+    data = encode(screenshot(1))
+    cache = make_cache(tmp_path, clock=clock, ttl=60)
+    cache.set(cache.key(data), RESULT)
+
+    restarted = make_cache(tmp_path, clock=clock, ttl=60)
+    assert restarted.lookup(data)[1] == RESULT
+    now[0] += 61
+    assert restarted.lookup(data)[1] is None
+    assert len(make_cache(tmp_path, clock=clock, ttl=60).entries) == 0
+
+
+def test_disk_store_is_bounded(tmp_path):
+    now = [1000.0]
+    cache = make_cache(tmp_path, clock=lambda: now[0], maxsize=2)
+    images = [encode(screenshot(seed)) for seed in range(3)]
+    for data in images:
+        now[0] += 1
+        cache.set(cache.key(data), RESULT)
+    restarted = make_cache(tmp_path, clock=lambda: now[0], maxsize=2)
+    assert len(restarted.entries) == 2
+    assert restarted.get(restarted.key(images[0])) is None
+
+
+def test_disabled_cache_never_matches(tmp_path):
+    cache = make_cache(tmp_path, enabled=False)
+    data = encode(screenshot(1))
+    cache.set(cache.key(data), RESULT)
+    assert cache.lookup(data)[1] is None
@@ -0,0 +1,53 @@
+# tests/test_ocr_v2.py
+import importlib
+import json
+import pytest
+from benchmarks.load_test import write_service_account
+from logger import StructuredLogger
+from tests.clients.test_write_queue import FakeBackend, make_queue
+from tests.test_ocr_cache import RESULT
+from utils.image_fetcher import FetchedImage
+from utils.ocr_cache import OcrCache, OcrCacheConfig
+
+
+@pytest.fixture
+def ocr_v2(tmp_path, monkeypatch):
+    """Imports the OCR handler with a prompt file and offline credentials."""
+    (tmp_path / "files").mkdir()
+    (tmp_path / "files" / "prompts.json").write_text(
+        json.dumps({"ocr-v2": {"system": "Extract the message."}})
+    )
+    credentials = write_service_account(str(tmp_path), "http://127.0.0.1:9/token")
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", credentials)
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("handlers.ocr_v2")
+
+
+@pytest.mark.asyncio
+async def test_stored_results_do_not_change_after_returning(ocr_v2, monkeypatch):
+    async def fetch(url):
+        return FetchedImage(url, b"\x89PNG image", "image/png")
+
+    async def generate_ocr(image):
+        return "```json\n" + json.dumps(RESULT) + "\n```"
+
+    backend = FakeBackend()
+    backend.release.clear()
+    queue = make_queue(backend)
+    monkeypatch.setattr(ocr_v2.image_fetcher, "fetch", fetch)
+    monkeypatch.setattr(ocr_v2, "generate_ocr", generate_ocr)
+    monkeypatch.setattr(ocr_v2, "ocr_cache", OcrCache(OcrCacheConfig(path="")))
+    monkeypatch.setattr(ocr_v2, "write_queue", queue)
+    queue.start()
+
+    child_logger = StructuredLogger("test")
+    for document_id in ("model", "cached"):
+        result = await ocr_v2.extract_from_image(
+            "https://a/b.png", document_id, child_logger
+        )
+        result["prediction"] = "scam"  # as get_ocr does
+
+    backend.release.set()
+    await queue.stop()
+    for document_id in ("model", "cached"):
+        assert backend.documents[("ocr_extractions", document_id)]["response"] == RESULT
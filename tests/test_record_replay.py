@@ -0,0 +1,75 @@
+# tests/test_record_replay.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import httpx
+import pytest
+import requests
+from clients.firestore_db import save_document
+from utils.record_replay import CassetteMiss, RECORD, REPLAY, use_cassette
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    requests_served = 0
+
+    def do_POST(self):
+        EchoHandler.requests_served += 1
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        payload = json.dumps({"path": self.path, "echo": json.loads(body)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = HTTPServer(("127.0.0.1", 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+async def call_upstreams(url):
+    sync_response = requests.post(f"{url}/search?key=secret", json={"q": "scam"})
+    async with httpx.AsyncClient() as client:
+        async_response = await client.post(f"{url}/chat", json={"messages": []})
+    return sync_response.json(), async_response.json()
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(server_url, tmp_path):
+    cassette_path = str(tmp_path / "cassette.json")
+    with use_cassette(cassette_path, RECORD):
+        recorded = await call_upstreams(server_url)
+
+    with open(cassette_path) as f:
+        interactions = json.load(f)["interactions"]
+    assert [interaction["url"] for interaction in interactions] == [
+        f"{server_url}/search",
+        f"{server_url}/chat",
+    ]  # credentials in the query string are not stored
+
+    with use_cassette(cassette_path, REPLAY, latency_scale=0) as cassette:
+        served = EchoHandler.requests_served
+        replayed = await call_upstreams(server_url)
+        assert EchoHandler.requests_served == served  # served from the cassette
+        save_document("agent_calls", "request-id", {"success": True})
+        with pytest.raises(CassetteMiss):
+            requests.post(f"{server_url}/search", json={"q": "scam"})
+
+    assert replayed == recorded
+    assert replayed[0]["path"] == "/search?key=secret"
+    assert cassette.documents == [
+        {
+            "collection": "agent_calls",
+            "document_id": "request-id",
+            "data": {"success": True},
+        }
+    ]
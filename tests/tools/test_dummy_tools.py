@@ -0,0 +1,12 @@
+# tests/tools/test_dummy_tools.py
+
+from tools import add_plan_argument, search_google_tool
+
+
+def test_add_plan_argument():
+    definition = search_google_tool["definition"]
+    fused_definition = add_plan_argument(definition)
+    properties = list(fused_definition["parameters"]["properties"])
+    assert properties[0] == "plan"
+    assert fused_definition["parameters"]["required"][0] == "plan"
+    assert "plan" not in definition["parameters"]["properties"]  # original untouched
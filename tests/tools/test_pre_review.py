@@ -0,0 +1,56 @@
+# tests/tools/test_pre_review.py
+
+import pytest
+from tools import submit_report_for_review
+from tools.pre_review import PreReviewPolicy, find_report_problems
+
+GOOD_REPORT = (
+    "The message claims that all residents will receive a $600 payout by clicking "
+    "a link. No such scheme has been announced by the government, and the link "
+    "leads to a recently registered domain. This is very likely a phishing scam."
+)
+SOURCES = ["https://www.gov.sg/factually"]
+
+
+def test_plausible_report_passes():
+    assert find_report_problems(GOOD_REPORT, SOURCES) == []
+
+
+@pytest.mark.parametrize(
+    "report, sources",
+    [
+        ("I found that " + GOOD_REPORT, SOURCES),
+        (GOOD_REPORT + " The user should not click the link.", SOURCES),
+        (GOOD_REPORT, []),
+        (GOOD_REPORT, ["gov.sg"]),
+        ("The message talks about a payout for residents. " * 3, SOURCES),
+        ("Likely a scam.", SOURCES),
+        (
+            # Assessment words only as parts of longer words
+            "Officials advise users to validate callers with Truecaller before "
+            "believing untrue stories. The payout is advertised as authenticated. " * 2,
+            SOURCES,
+        ),
+    ],
+)
+def test_obvious_problems_are_flagged(report, sources):
+    assert len(find_report_problems(report, sources)) == 1
+
+
+def test_quoted_text_and_blocked_content_are_allowed():
+    report = 'The message says "we found a problem with your parcel". ' + GOOD_REPORT
+    assert find_report_problems(report, [], isAccessBlocked=True) == []
+    assert (
+        find_report_problems(
+            GOOD_REPORT, [], policy=PreReviewPolicy(require_sources=False)
+        )
+        == []
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejected_report_skips_reviewer():
+    result = await submit_report_for_review("I found nothing.", [], False, False, False)
+    assert result["reviewer"] == "rules"
+    assert result["result"]["passedReview"] is False
+    assert result["result"]["feedback"]
@@ -0,0 +1,24 @@
+# tests/tools/test_registry.py
+
+from tools import get_tool_registry
+
+
+def test_tool_registry_is_shared():
+    assert get_tool_registry(True, False) is get_tool_registry(True, False)
+
+
+def test_tool_registry_planning_configurations():
+    separate = get_tool_registry(True, False)
+    fused = get_tool_registry(True, True)
+    no_planning = get_tool_registry(False, False)
+    assert "plan_next_step" in separate.functions
+    assert "plan_next_step" not in fused.functions
+    assert "plan_next_step" not in no_planning.functions
+    search_tool = next(
+        tool["function"]
+        for tool in fused.openai_tools
+        if tool["function"]["name"] == "search_google"
+    )
+    assert search_tool["strict"] is True
+    assert "plan" in search_tool["parameters"]["properties"]
+    assert search_tool["parameters"]["properties"]["plan"]["type"] == "string"
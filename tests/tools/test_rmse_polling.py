@@ -0,0 +1,77 @@
+# tests/tools/test_rmse_polling.py
+
+import asyncio
+import time
+import httpx
+import pytest
+import tools.rmse_scanner as rmse_scanner
+from context import deadline_var
+from tools.rmse_scanner import PollingPolicy, check_malicious_urls, poll_evaluation
+
+VERDICT = {"classification": "MALICIOUS", "score": 0.9}
+FAST_POLICY = PollingPolicy(initial_delay=0.01, max_delay=0.02, jitter=0)
+
+
+class FakeRmse:
+    """Answers /evaluate with a pending request, and its evaluation after some polls."""
+
+    def __init__(self, pending_polls: int, delay: float = 0.0):
+        self.pending_polls = pending_polls
+        self.delay = delay
+        self.polls = 0
+        self.evaluated = []
+
+    async def post(self, url, json=None, **kwargs):
+        self.evaluated.append(json["url"])
+        await asyncio.sleep(self.delay)
+        return httpx.Response(
+            200, json={"success": True, "request_id": str(len(self.evaluated))}
+        )
+
+    async def get(self, url, **kwargs):
+        self.polls += 1
+        if self.polls <= self.pending_polls:
+            return httpx.Response(200, json={"overall_result": None})
+        return httpx.Response(200, json={"overall_result": VERDICT})
+
+
+def test_polling_delays_grow_and_are_capped():
+    delays = FAST_POLICY.delays()
+    assert [next(delays) for _ in range(4)] == [0.01, 0.02, 0.02, 0.02]
+
+
+@pytest.mark.asyncio
+async def test_polling_continues_past_pending_evaluations(monkeypatch):
+    rmse = FakeRmse(pending_polls=3)
+    monkeypatch.setattr(rmse_scanner, "http_client", rmse)
+    result = await poll_evaluation("http://rmse", "1", FAST_POLICY)
+    assert result == {"success": True, "result": VERDICT}
+    assert rmse.polls == 4
+
+
+@pytest.mark.asyncio
+async def test_polling_stops_before_request_deadline(monkeypatch):
+    monkeypatch.setattr(rmse_scanner, "http_client", FakeRmse(pending_polls=10**6))
+    policy = PollingPolicy(initial_delay=0.01, max_delay=0.01, deadline_margin=1.0)
+    token = deadline_var.set(time.monotonic() + 1.2)
+    try:
+        start_time = time.perf_counter()
+        result = await poll_evaluation("http://rmse", "1", policy)
+    finally:
+        deadline_var.reset(token)
+    assert result["success"] is False
+    assert time.perf_counter() - start_time < 0.5
+
+
+@pytest.mark.asyncio
+async def test_check_malicious_urls_deduplicates_and_runs_concurrently(monkeypatch):
+    rmse = FakeRmse(pending_polls=0, delay=0.2)
+    monkeypatch.setattr(rmse_scanner, "http_client", rmse)
+    monkeypatch.setattr(rmse_scanner, "polling_policy", FAST_POLICY)
+    urls = ["https://a.example", "https://b.example", "https://a.example"]
+    start_time = time.perf_counter()
+    result = await check_malicious_urls(urls)
+    assert time.perf_counter() - start_time < 0.4
+    assert sorted(rmse.evaluated) == ["https://a.example/", "https://b.example/"]
+    assert result["success"] is True
+    assert list(result["result"]) == ["https://a.example", "https://b.example"]
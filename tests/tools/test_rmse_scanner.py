@@ -1,7 +1,8 @@
 # tests/tools/test_rmse_scanner.py
 
 import pytest
-from tools import check_malicious_url
+from tools import check_malicious_url, rmse_scanner
+from utils.url_resolver import ResolvedUrl
 from tests.utils import print_dict
 
 
@@ -12,3 +13,30 @@ async def test_check_url_scam_tool():
     print_dict(result)
     assert "success" in result
     assert "result" in result or "error" in result
+
+
+@pytest.mark.asyncio
+async def test_unresolved_short_links_are_not_answered_by_reputation(monkeypatch):
+    async def resolve_details(url):
+        return ResolvedUrl(url, error="ConnectTimeout: timed out")
+
+    async def post(*args, **kwargs):
+        raise RuntimeError("RMSE called")
+
+    monkeypatch.setattr(rmse_scanner.url_resolver, "resolve_details", resolve_details)
+    monkeypatch.setattr(rmse_scanner.http_client, "post", post)
+    # go.gov.sg is a shortener under the allowlisted gov.sg
+    with pytest.raises(RuntimeError, match="RMSE called"):
+        await check_malicious_url("https://go.gov.sg/abc")
+    result = await rmse_scanner.check_malicious_urls(["https://go.gov.sg/abc"])
+    assert "RMSE called" in result["result"]["https://go.gov.sg/abc"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_resolved_destinations_are_answered_by_reputation(monkeypatch):
+    async def resolve_details(url):
+        return ResolvedUrl("https://www.gov.sg/news", hops=["https://www.gov.sg/news"])
+
+    monkeypatch.setattr(rmse_scanner.url_resolver, "resolve_details", resolve_details)
+    result = await check_malicious_url("https://go.gov.sg/abc")
+    assert result["result"]["source"] == "local_index"
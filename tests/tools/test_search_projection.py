@@ -0,0 +1,41 @@
+# tests/tools/test_search_projection.py
+
+from tools.search_projection import SearchProjection, project_results
+
+ORGANIC = [
+    {
+        "title": "Payout scheme",
+        "link": "https://www.gov.sg/payout/",
+        "snippet": "Eligible Singaporeans will receive the payout " * 20,
+        "date": "Jan 3, 2025",
+        "position": 1,
+        "sitelinks": [{"title": "Eligibility", "link": "https://www.gov.sg/elig"}],
+    },
+    {"title": "Same page", "link": "https://gov.sg/payout?utm_source=x"},
+    {"title": "Scam alert", "link": "https://scamalert.sg/news", "snippet": "Beware"},
+]
+
+
+def test_results_keep_only_capped_fields_and_unique_pages():
+    projected = project_results(ORGANIC, projection=SearchProjection(snippet_chars=50))
+    assert [result["title"] for result in projected] == ["Payout scheme", "Scam alert"]
+    assert set(projected[0]) == {"title", "link", "snippet", "date"}
+    assert len(projected[0]["snippet"]) <= 51
+    assert projected[0]["snippet"].endswith("…")
+
+
+def test_answer_box_is_added_as_one_line():
+    responses = [
+        {"organic": ORGANIC},
+        {"answerBox": {"answer": "No such payout", "link": "https://gov.sg"}},
+    ]
+    projected = project_results(ORGANIC, responses, SearchProjection())
+    assert projected[0] == "Answer box: No such payout (https://gov.sg)"
+    without_answer = SearchProjection(include_answer=False)
+    assert isinstance(project_results(ORGANIC, responses, without_answer)[0], dict)
+
+
+def test_disabled_projection_passes_results_through():
+    assert project_results(ORGANIC, projection=SearchProjection(enabled=False)) == (
+        ORGANIC
+    )
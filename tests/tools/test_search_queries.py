@@ -0,0 +1,75 @@
+# tests/tools/test_search_queries.py
+
+import asyncio
+import importlib
+import json
+import time
+import httpx
+import pytest
+from tools.search_google import merge_results, search_google
+
+# tools re-exports the search_google function under the name of its module
+search_google_module = importlib.import_module("tools.search_google")
+
+
+class FakeSerper:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.queries = []
+
+    async def post(self, url, content=None, **kwargs):
+        query = json.loads(content)["q"]
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if query == "failing":
+            return httpx.Response(500, request=httpx.Request("POST", url))
+        organic = [
+            {"title": f"{query} {rank}", "link": f"https://{rank}.example/{query}"}
+            for rank in range(2)
+        ] + [{"title": "shared", "link": "https://shared.example"}]
+        return httpx.Response(
+            200, json={"organic": organic}, request=httpx.Request("POST", url)
+        )
+
+
+def test_merge_results_interleaves_by_rank_and_drops_repeated_links():
+    merged = merge_results(
+        [
+            [{"link": "a1"}, {"link": "shared"}],
+            [{"link": "b1"}, {"link": "shared"}, {"link": "b3"}],
+        ]
+    )
+    assert [result["link"] for result in merged] == ["a1", "b1", "shared", "b3"]
+
+
+@pytest.mark.asyncio
+async def test_queries_are_searched_concurrently(monkeypatch):
+    serper = FakeSerper(delay=0.2)
+    monkeypatch.setattr(search_google_module, "http_client", serper)
+    start_time = time.perf_counter()
+    result = await search_google(queries=["scam", "payout", "scam"])
+    assert time.perf_counter() - start_time < 0.35
+    assert serper.queries == ["scam", "payout"]
+    assert result["cost"] == 2 / 1000
+    links = [item["link"] for item in result["result"]]
+    assert len(links) == len(set(links)) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_queries_are_skipped(monkeypatch):
+    monkeypatch.setattr(search_google_module, "http_client", FakeSerper())
+    result = await search_google(queries=["failing", "scam"])
+    assert [item["title"] for item in result["result"]][0] == "scam 0"
+    failed = await search_google(queries=["failing"])
+    assert failed["success"] is False
+
+
+@pytest.mark.asyncio
+async def test_queries_beyond_the_budget_are_reported(monkeypatch):
+    monkeypatch.setattr(search_google_module, "http_client", FakeSerper())
+    result = await search_google(queries=["scam"], skipped_queries=["payout"])
+    assert result["result"] and result["skippedQueries"] == ["payout"]
+    exhausted = await search_google(queries=[], skipped_queries=["payout"])
+    assert exhausted["success"] is False
+    assert "search budget is used up" in exhausted["error"]
+    assert exhausted["skippedQueries"] == ["payout"]
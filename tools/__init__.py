@@ -1,5 +1,10 @@
 from .website_screenshot import get_screenshot_tool, get_website_screenshot
-from .rmse_scanner import check_malicious_url_tool, check_malicious_url
+from .rmse_scanner import (
+    check_malicious_url_tool,
+    check_malicious_url,
+    check_malicious_urls_tool,
+    check_malicious_urls,
+)
 from .review_report import review_report_tool, submit_report_for_review
 from .summarise_report import (
     summarise_report_factory,
@@ -12,13 +17,17 @@ from .dummy_tools import (
     infer_intent_tool,
     plan_next_step,
     infer_intent,
+    add_plan_argument,
 )
+from .registry import ToolRegistry, build_tool_registry, get_tool_registry
 
 __all__ = [
     "get_screenshot_tool",
     "get_website_screenshot",
     "check_malicious_url_tool",
     "check_malicious_url",
+    "check_malicious_urls_tool",
+    "check_malicious_urls",
     "review_report_tool",
     "submit_report_for_review",
     "summarise_report_factory",
@@ -29,6 +38,10 @@ __all__ = [
     "plan_next_step",
     "infer_intent_tool",
     "infer_intent",
+    "add_plan_argument",
+    "ToolRegistry",
+    "build_tool_registry",
+    "get_tool_registry",
     "translation_tool",
     "translate_text",
 ]
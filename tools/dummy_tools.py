@@ -75,6 +75,31 @@ infer_intent_definition = dict(
     },
 )
 
+plan_argument_definition = {
+    "type": "STRING",
+    "description": "Before acting, articulate your reasoning given past steps, and why this is the right next step.",
+}
+
+
+def add_plan_argument(definition: dict) -> dict:
+    """Returns a copy of a tool definition with a required `plan` argument added first.
+
+    Used when planning is fused into each action, instead of being done in a separate
+    plan_next_step call.
+    """
+    parameters = definition["parameters"]
+    return {
+        **definition,
+        "parameters": {
+            **parameters,
+            "properties": OrderedDict(
+                [("plan", plan_argument_definition), *parameters["properties"].items()]
+            ),
+            "required": ["plan", *parameters.get("required", [])],
+        },
+    }
+
+
 plan_next_step_tool = {
     "function": plan_next_step,
     "definition": plan_next_step_definition,
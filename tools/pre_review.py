@@ -0,0 +1,122 @@
+# tools/pre_review.py
+# Deterministic checks run on a report before it is sent to the LLM reviewer. The
+# reviewer is one of the slowest calls in the pipeline, and some problems, like a
+# report written about "the user", are cheap to detect without it.
+import os
+import re
+from dataclasses import dataclass
+from typing import List
+from urllib.parse import urlsplit
+
+# Quoted text is ignored, so that quoting the message being checked isn't flagged
+QUOTED_TEXT = re.compile(r"\"[^\"]*\"|“[^”]*”")
+SELF_REFERENCE = re.compile(
+    r"\b(I|we)\s+(have\s+|had\s+)?(found|searched|checked|visited|looked|"
+    r"could not|couldn't|was unable|were unable|did not|didn't|verified|reviewed)\b"
+    r"|\b(my|our)\s+(search|searches|research|investigation|findings|check)\b",
+    re.IGNORECASE,
+)
+USER_REFERENCE = re.compile(
+    r"\bthe user('s)?\b|\buser (sent|submitted)\b", re.IGNORECASE
+)
+PLACEHOLDER = re.compile(r"\[insert|\bTODO\b|lorem ipsum|<[a-z_ ]+>", re.IGNORECASE)
+# Words that state an assessment. A report without any of them doesn't tell readers
+# what to make of the message.
+CONCLUSION = re.compile(
+    r"\b(scams?|phishing|fakes?|false(ly)?|true|(in)?accurate(ly)?|misleading|"
+    r"legitimate(ly)?|genuine(ly)?|unverified|unsubstantiated|satire|satirical|"
+    r"credible|authentic|hoax(es)?|frauds?|fraudulent|malicious|safe(ly)?|"
+    r"suspicious|caution|avoid|recommended|advised|(un)?official(ly)?|rumou?rs?|"
+    r"(in)?correct(ly)?|(in)?valid|spam|opinions?)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class PreReviewPolicy:
+    """Configures the checks run before the LLM reviewer.
+
+    Attributes:
+        enabled: Whether to run the checks at all.
+        min_report_chars: Reports shorter than this are rejected.
+        require_sources: Whether a report needs at least one source, unless the
+            content checked was inaccessible.
+        require_conclusion: Whether a report needs to state an assessment.
+    """
+
+    enabled: bool = True
+    min_report_chars: int = 80
+    require_sources: bool = True
+    require_conclusion: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PreReviewPolicy":
+        return cls(
+            enabled=os.getenv("PRE_REVIEW_ENABLED", "true").lower() == "true",
+            min_report_chars=int(os.getenv("PRE_REVIEW_MIN_REPORT_CHARS", 80)),
+            require_sources=os.getenv("PRE_REVIEW_REQUIRE_SOURCES", "true").lower()
+            == "true",
+            require_conclusion=os.getenv(
+                "PRE_REVIEW_REQUIRE_CONCLUSION", "true"
+            ).lower()
+            == "true",
+        )
+
+
+pre_review_policy = PreReviewPolicy.from_env()
+
+
+def _is_link(source: str) -> bool:
+    parts = urlsplit(str(source).strip())
+    return parts.scheme in ("http", "https") and bool(parts.netloc)
+
+
+def find_report_problems(
+    report: str,
+    sources: List[str],
+    isAccessBlocked: bool = False,
+    policy: PreReviewPolicy = None,
+) -> List[str]:
+    """Returns feedback for each problem found in the report, or an empty list.
+
+    Args:
+        report: The report submitted by the agent.
+        sources: The sources submitted with the report.
+        isAccessBlocked: Whether the content checked was inaccessible, in which
+            case there may be nothing to cite.
+        policy: Defaults to the policy configured in the environment.
+    """
+    policy = policy or pre_review_policy
+    report = (report or "").strip()
+    sources = [source for source in sources or [] if str(source).strip()]
+    unquoted = QUOTED_TEXT.sub("", report)
+    problems = []
+    if len(report) < policy.min_report_chars:
+        problems.append(
+            "The report is too short to keep readers informed. Explain what the "
+            "message is and what readers should make of it."
+        )
+    if SELF_REFERENCE.search(unquoted):
+        problems.append(
+            "The report describes your own research, e.g. 'I found'. State the "
+            "findings directly, without referring to yourself."
+        )
+    if USER_REFERENCE.search(unquoted):
+        problems.append(
+            "The report refers to 'the user'. It is read by the person who sent the "
+            "message, so address the content directly instead."
+        )
+    if PLACEHOLDER.search(unquoted):
+        problems.append("The report contains placeholder text. Remove or complete it.")
+    if policy.require_conclusion and not CONCLUSION.search(report):
+        problems.append(
+            "The report has no clear conclusion. State whether the message is "
+            "accurate, misleading, a scam, etc., and what readers should do."
+        )
+    if policy.require_sources and not sources and not isAccessBlocked:
+        problems.append(
+            "The report cites no sources. Include the links the report is based on."
+        )
+    if any(not _is_link(source) for source in sources):
+        problems.append("Every source must be a full http(s) link.")
+    return problems
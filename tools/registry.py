@@ -0,0 +1,130 @@
+# tools/registry.py
+# Precompiled tool schemas for the agents. Registries are built once per planning
+# configuration and shared by every agent and request.
+import copy
+import functools
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Mapping, Tuple
+from google.genai import types
+from .website_screenshot import get_screenshot_tool
+from .rmse_scanner import check_malicious_url_tool, check_malicious_urls_tool
+from .review_report import review_report_tool
+from .search_google import search_google_tool
+from .dummy_tools import plan_next_step_tool, infer_intent_tool, add_plan_argument
+
+AGENT_TOOLS = (
+    search_google_tool,
+    get_screenshot_tool,
+    check_malicious_url_tool,
+    check_malicious_urls_tool,
+    review_report_tool,
+    plan_next_step_tool,
+    infer_intent_tool,
+)
+
+
+@dataclass(frozen=True)
+class ToolRegistry:
+    """The tools available to an agent, with their schemas compiled for each provider.
+
+    Attributes:
+        include_planning_step: Whether the agent plans before each action.
+        fuse_planning: Whether planning is fused into each action's arguments.
+        definitions: The openAPI specification of each tool.
+        functions: Maps each tool name to its function.
+        gemini_tool: The tool declarations, compiled for the Gemini API.
+        openai_tools: The tool definitions, compiled for OpenAI-compatible APIs.
+    """
+
+    include_planning_step: bool
+    fuse_planning: bool
+    definitions: Tuple[dict, ...]
+    functions: Mapping[str, Callable]
+    gemini_tool: types.Tool
+    openai_tools: Tuple[dict, ...]
+
+
+def to_openai_tool(function_definition_dict: dict) -> dict:
+    """Converts a tool definition into a strict OpenAI function tool."""
+
+    def convert_types_to_lowercase(obj):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if key == "type" and isinstance(value, str):
+                    obj[key] = value.lower()
+                elif isinstance(value, (dict, list)):
+                    convert_types_to_lowercase(value)
+        elif isinstance(obj, list):
+            for item in obj:
+                convert_types_to_lowercase(item)
+
+    copied_definition = copy.deepcopy(
+        function_definition_dict
+    )  # otherwise it will alter the original definition and affect other agents
+
+    copied_definition["parameters"]["additionalProperties"] = False
+    convert_types_to_lowercase(copied_definition["parameters"])
+    copied_definition["strict"] = True
+    return {
+        "type": "function",
+        "function": copied_definition,
+    }
+
+
+def prepare_tool_list(
+    tool_list: list, include_planning_step: bool, fuse_planning: bool
+) -> list:
+    """Adapts the tool list to the planning configuration.
+
+    plan_next_step is only kept when planning happens in a separate step. When
+    planning is fused, every tool used after the first step also takes a
+    required `plan` argument instead.
+    """
+    if include_planning_step and not fuse_planning:
+        return list(tool_list)
+    tool_list = [
+        tool for tool in tool_list if tool["definition"]["name"] != "plan_next_step"
+    ]
+    if not fuse_planning:
+        return tool_list
+    return [
+        (
+            tool
+            if tool["definition"]["name"] == "infer_intent"
+            else {**tool, "definition": add_plan_argument(tool["definition"])}
+        )
+        for tool in tool_list
+    ]
+
+
+def build_tool_registry(
+    tool_list, include_planning_step: bool, fuse_planning: bool = False
+) -> ToolRegistry:
+    """Builds a registry from a list of tools.
+
+    Each tool should be a dictionary with two keys "function" and "definition".
+
+    The former will hold the function itself, and the latter an openAPI specification dictionary
+    """
+    fuse_planning = include_planning_step and fuse_planning
+    tool_list = prepare_tool_list(tool_list, include_planning_step, fuse_planning)
+    definitions = tuple(copy.deepcopy(tool["definition"]) for tool in tool_list)
+    return ToolRegistry(
+        include_planning_step=include_planning_step,
+        fuse_planning=fuse_planning,
+        definitions=definitions,
+        functions=MappingProxyType(
+            {tool["definition"]["name"]: tool["function"] for tool in tool_list}
+        ),
+        gemini_tool=types.Tool(function_declarations=list(definitions)),
+        openai_tools=tuple(to_openai_tool(definition) for definition in definitions),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_tool_registry(
+    include_planning_step: bool, fuse_planning: bool = False
+) -> ToolRegistry:
+    """Returns the shared registry of agent tools for the given planning configuration."""
+    return build_tool_registry(AGENT_TOOLS, include_planning_step, fuse_planning)
@@ -2,22 +2,44 @@
 
 from google.genai import types
 from collections import OrderedDict
-from clients.openai import create_openai_client
+from clients.openai import get_openai_client
+from models import SupportedModelProvider
 from langfuse.decorators import observe
 import json
-from langfuse import Langfuse
+from clients.langfuse import langfuse
 import os
+from logger import StructuredLogger
+from metrics import PRE_REVIEW_DECISIONS
+from .pre_review import find_report_problems, pre_review_policy
 
-langfuse = Langfuse()
-
-# get system_prompt_review from langfuse
-client = create_openai_client("openai")
+client = get_openai_client(SupportedModelProvider.OPENAI)
+logger = StructuredLogger("review_report")
 
 
 @observe()
 async def submit_report_for_review(
-    report, sources, isControversial, isVideo, isAccessBlocked
+    report, sources, isControversial, isVideo, isAccessBlocked, pre_review=True
 ):
+    """Reviews the report, returning feedback and whether it passed.
+
+    Unless `pre_review` is False, reports with problems found by the deterministic
+    checks in pre_review.py are rejected without calling the LLM reviewer. The
+    result then has `reviewer` set to "rules".
+    """
+    if pre_review and pre_review_policy.enabled:
+        problems = find_report_problems(report, sources, isAccessBlocked)
+        if problems:
+            PRE_REVIEW_DECISIONS.labels(decision="rejected").inc()
+            logger.info(
+                "Report rejected before review, reviewer call avoided",
+                problems=problems,
+            )
+            return {
+                "result": {"feedback": " ".join(problems), "passedReview": False},
+                "reviewer": "rules",
+            }
+        PRE_REVIEW_DECISIONS.labels(decision="forwarded").inc()
+
     prompt = langfuse.get_prompt("review_report", label=os.getenv("ENVIRONMENT"))
     config = prompt.config
 
@@ -35,7 +57,7 @@ async def submit_report_for_review(
         langfuse_prompt=prompt,
     )
     result = json.loads(response.choices[0].message.content)
-    return {"result": result}
+    return {"result": result, "reviewer": "llm"}
 
 
 review_report_definition = dict(
@@ -1,25 +1,151 @@
 # tools/rmse_scanner.py
 
+import asyncio
 import os
-import requests
-import time
+import random
+from dataclasses import dataclass
+from typing import List
 from langfuse.decorators import observe
+from clients.http import http_client
+from context import remaining_time
+from metrics import DOMAIN_REPUTATION_LOOKUPS
+from utils.domain_reputation import domain_reputation
+from utils.url_resolver import ResolvedUrl, canonicalise_url, url_resolver
 
 
-@observe()
-async def check_malicious_url(url):
-    hostname = os.environ.get("RMSE_HOSTNAME")
+@dataclass(frozen=True)
+class PollingPolicy:
+    """Configures how pending RMSE evaluations are polled.
 
-    # Authenticate with the hostname as the audience
-    headers = {
+    Attributes:
+        initial_delay: Seconds before the first poll.
+        max_delay: Maximum seconds between polls.
+        multiplier: Factor by which the delay grows after each poll.
+        jitter: Share of each delay that is randomised, to spread out concurrent polls.
+        max_wait: Maximum seconds to wait for a verdict. Polling also stops
+            `deadline_margin` seconds before the deadline of the current request.
+        deadline_margin: Seconds left for the agent to use the result.
+    """
+
+    initial_delay: float = 0.5
+    max_delay: float = 8.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    max_wait: float = 60.0
+    deadline_margin: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "PollingPolicy":
+        return cls(
+            initial_delay=float(os.getenv("RMSE_POLL_INITIAL_DELAY", 0.5)),
+            max_delay=float(os.getenv("RMSE_POLL_MAX_DELAY", 8.0)),
+            max_wait=float(os.getenv("RMSE_POLL_MAX_WAIT", 60.0)),
+        )
+
+    def delays(self):
+        """Yields the delay before each poll, growing exponentially with jitter."""
+        delay = self.initial_delay
+        while True:
+            yield delay * (1 - self.jitter * random.random())
+            delay = min(delay * self.multiplier, self.max_delay)
+
+    def wait_budget(self) -> float:
+        return max(
+            0.0,
+            min(
+                self.max_wait,
+                remaining_time(default=self.max_wait) - self.deadline_margin,
+            ),
+        )
+
+
+polling_policy = PollingPolicy.from_env()
+
+
+def get_headers():
+    return {
         "x-api-key": os.environ.get("RMSE_API_KEY"),
         "Content-Type": "application/json",
         "accept": "application/json",
     }
-    response = requests.post(
+
+
+def format_result(overall_result: dict) -> dict:
+    return {
+        "success": True,
+        "result": {
+            "classification": overall_result["classification"],
+            "score": overall_result["score"],
+        },
+    }
+
+
+async def poll_evaluation(hostname: str, request_id: str, policy: PollingPolicy = None):
+    """Polls a pending evaluation until it has a verdict, with exponential backoff.
+
+    Gives up once the wait budget of the policy is spent. Cancelling the calling task
+    stops polling immediately.
+    """
+    policy = policy or polling_policy
+
+    async def poll():
+        for delay in policy.delays():
+            await asyncio.sleep(delay)
+            evaluation_response = await http_client.get(
+                f"{hostname}/url/{request_id}/evaluation", headers=get_headers()
+            )
+            if evaluation_response.status_code != 200:
+                return {"success": False, "error": evaluation_response.content}
+            overall_result = (evaluation_response.json() or {}).get("overall_result")
+            if overall_result:
+                return format_result(overall_result)
+
+    budget = policy.wait_budget()
+    try:
+        return await asyncio.wait_for(poll(), timeout=budget)
+    except asyncio.TimeoutError:
+        return {
+            "success": False,
+            "error": f"No verdict after waiting {budget:.0f} seconds",
+        }
+
+
+@observe()
+async def check_malicious_url(url):
+    resolved = await url_resolver.resolve_details(url)
+    canonical_url = resolved.url
+    result = await check_canonical_url(
+        canonical_url, use_reputation=_is_destination(resolved)
+    )
+    if canonical_url != canonicalise_url(url) and isinstance(
+        result.get("result"), dict
+    ):
+        result["result"]["resolved_url"] = canonical_url
+    return result
+
+
+def _is_destination(resolved: ResolvedUrl) -> bool:
+    """Returns whether a link was resolved to its destination, rather than left at a
+    short link, e.g. go.gov.sg, whose domain says nothing about the destination."""
+    return not resolved.error and not url_resolver.is_shortener(resolved.url)
+
+
+async def check_canonical_url(url, use_reputation: bool = True):
+    # Links to domains with a known reputation don't need a scan
+    verdict = domain_reputation.lookup(url) if use_reputation else None
+    DOMAIN_REPUTATION_LOOKUPS.labels(
+        verdict=verdict.classification if verdict else "unknown"
+    ).inc()
+    if verdict:
+        return verdict.as_result()
+
+    hostname = os.environ.get("RMSE_HOSTNAME")
+
+    # Authenticate with the hostname as the audience
+    response = await http_client.post(
         f"{hostname}/evaluate",
         json={"url": url, "source": "checkmate"},
-        headers=headers,
+        headers=get_headers(),
     )
 
     if response.status_code != 200:
@@ -29,13 +155,7 @@ async def check_malicious_url(url):
         if results.get("success", False):
             overall_result = results.get("overall_result", {})
             if overall_result:
-                return {
-                    "success": True,
-                    "result": {
-                        "classification": overall_result["classification"],
-                        "score": overall_result["score"],
-                    },
-                }
+                return format_result(overall_result)
             else:
                 request_id = results.get("request_id")
                 if not request_id:
@@ -43,27 +163,7 @@ async def check_malicious_url(url):
                         "success": False,
                         "error": results.get("message", "Request ID missing"),
                     }
-
-                while not overall_result:
-                    time.sleep(1)
-                    evaluation_response = requests.get(
-                        f"{hostname}/url/{request_id}/evaluation", headers=headers
-                    )
-                    if evaluation_response.status_code != 200:
-                        return {"success": False, "error": evaluation_response.content}
-                    evaluation_result = evaluation_response.json()
-                    if evaluation_result:
-                        overall_result = evaluation_result.get("overall_result", {})
-                        if overall_result:
-                            return {
-                                "success": True,
-                                "result": {
-                                    "classification": overall_result["classification"],
-                                    "score": overall_result["score"],
-                                },
-                            }
-                        else:
-                            return {"success": False, "error": "Overall result missing"}
+                return await poll_evaluation(hostname, request_id)
         else:
             return {
                 "success": False,
@@ -71,6 +171,44 @@ async def check_malicious_url(url):
             }
 
 
+@observe()
+async def check_malicious_urls(urls: List[str]):
+    """Checks several URLs concurrently, returning the result of each by URL.
+
+    URLs leading to the same destination are only checked once.
+    """
+    resolved_urls = await asyncio.gather(
+        *(url_resolver.resolve_details(url) for url in urls)
+    )
+    canonical_urls = [resolved.url for resolved in resolved_urls]
+    # url -> whether the reputation index may answer for it
+    use_reputation = {}
+    for resolved in resolved_urls:
+        use_reputation[resolved.url] = use_reputation.get(
+            resolved.url, True
+        ) and _is_destination(resolved)
+    unique_urls = list(use_reputation)
+    results = await asyncio.gather(
+        *(check_canonical_url(url, use_reputation[url]) for url in unique_urls),
+        return_exceptions=True,
+    )
+    results_by_url = {
+        url: (
+            result
+            if isinstance(result, dict)
+            else {"success": False, "error": str(result)}
+        )
+        for url, result in zip(unique_urls, results)
+    }
+    return {
+        "success": any(result.get("success") for result in results_by_url.values()),
+        "result": {
+            url: results_by_url[canonical_url]
+            for url, canonical_url in zip(urls, canonical_urls)
+        },
+    }
+
+
 check_malicious_url_definition = dict(
     name="check_malicious_url",
     description="Runs a check on the provided URL to determine if it is malicious.\
@@ -93,3 +231,25 @@ check_malicious_url_tool = {
     "function": check_malicious_url,
     "definition": check_malicious_url_definition,
 }
+
+check_malicious_urls_definition = dict(
+    name="check_malicious_urls",
+    description="Runs the same check as check_malicious_url on several URLs at once, \
+        e.g. all the links in a message. Returns the result for each URL.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {
+            "urls": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": "The URLs of the websites to check.",
+            },
+        },
+        "required": ["urls"],
+    },
+)
+
+check_malicious_urls_tool = {
+    "function": check_malicious_urls,
+    "definition": check_malicious_urls_definition,
+}
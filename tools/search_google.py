@@ -1,39 +1,91 @@
-import requests
+import asyncio
+import itertools
 import json
 import dotenv
 import os
+from typing import List
 from langfuse.decorators import observe
+from clients.http import http_client
+from .search_projection import project_results
 
 dotenv.load_dotenv()
 
 
-@observe()
-async def search_google(q):
-    url = "https://google.serper.dev/search"
+async def search_serper(q: str) -> dict:
+    url = os.environ.get("SERPER_URL", "https://google.serper.dev/search")
     headers = {
         "X-API-KEY": os.environ.get("SERPER_API_KEY"),
         "Content-Type": "application/json",
     }
     payload = json.dumps({"q": q, "location": "Singapore", "gl": "sg"})
-    response = requests.request("POST", url, headers=headers, data=payload)
-    return {
-        "result": response.json().get("organic"),
-        "cost": 1 / 1000,  # https://serper.dev/
+    response = await http_client.post(url, headers=headers, content=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+def merge_results(results_per_query: List[list]) -> list:
+    """Interleaves the results of several queries by rank, dropping repeated links."""
+    merged, seen_links = [], set()
+    for rank_results in itertools.zip_longest(*results_per_query):
+        for result in rank_results:
+            if result is None or result.get("link") in seen_links:
+                continue
+            seen_links.add(result.get("link"))
+            merged.append(result)
+    return merged
+
+
+@observe()
+async def search_google(
+    q: str = None, queries: List[str] = None, skipped_queries: List[str] = None
+):
+    """Searches Google for one or more queries concurrently, merging the results.
+
+    The agents cap `queries` to the searches remaining in their budget before
+    calling this, and pass the rest as `skipped_queries`, which are reported back
+    to the model.
+    """
+    queries = list(dict.fromkeys(([q] if q else []) + list(queries or [])))
+    if not queries:
+        if skipped_queries:
+            return {
+                "success": False,
+                "error": "The search budget is used up, so no more searches can be "
+                "run. Skipped queries: " + "; ".join(skipped_queries),
+                "skippedQueries": skipped_queries,
+                "cost": 0,
+            }
+        return {"success": False, "error": "No search query provided"}
+    results = await asyncio.gather(
+        *(search_serper(query) for query in queries), return_exceptions=True
+    )
+    responses = [result for result in results if not isinstance(result, Exception)]
+    if not responses:
+        return {"success": False, "error": str(results[0]), "cost": 0}
+    organic = merge_results([response.get("organic") or [] for response in responses])
+    result = {
+        "result": project_results(organic, responses),
+        "cost": len(queries) / 1000,  # https://serper.dev/
     }
+    if skipped_queries:
+        # beyond the remaining searches
+        result["skippedQueries"] = skipped_queries
+    return result
 
 
 search_function_definition = dict(
     name="search_google",
-    description="Searches Google for the given query and returns organic search results using serper.dev. Call this when you need to retrieve information from Google search results.",
+    description="Searches Google for the given queries and returns organic search results using serper.dev. Call this when you need to retrieve information from Google search results. Pass several related queries at once, e.g. different phrasings or aspects of a claim, rather than searching for them one turn at a time. The queries are run concurrently and their results merged. Each query counts as one search. Queries beyond the remaining searches are not run, and are listed in skippedQueries.",
     parameters={
         "type": "OBJECT",
         "properties": {
-            "q": {
-                "type": "STRING",
-                "description": "The search query to use on Google.",
+            "queries": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": "The search queries to use on Google, no more than the remaining searches.",
             },
         },
-        "required": ["q"],
+        "required": ["queries"],
     },
 )
 
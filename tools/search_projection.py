@@ -0,0 +1,132 @@
+# tools/search_projection.py
+# Reduces Serper responses to the fields the agent uses. Search results stay in the
+# agent history and are resent on every later turn, so fields like sitelinks,
+# attributes and positions cost tokens many times over without helping the agent.
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+
+@dataclass(frozen=True)
+class SearchProjection:
+    """Configures which parts of the Serper response are passed to the agent.
+
+    Attributes:
+        enabled: Whether to project results at all. If not, the organic results are
+            passed on as Serper returns them.
+        snippet_chars: Maximum number of characters of each snippet.
+        include_date: Whether to keep the date of results, when Serper has one.
+        include_answer: Whether to add the answer box or knowledge graph, if any, as
+            one line before the results.
+        max_results: Maximum number of results, across all queries.
+    """
+
+    enabled: bool = True
+    snippet_chars: int = 300
+    include_date: bool = True
+    include_answer: bool = True
+    max_results: int = 20
+
+    @classmethod
+    def from_env(cls) -> "SearchProjection":
+        return cls(
+            enabled=os.getenv("SEARCH_PROJECTION_ENABLED", "true").lower() == "true",
+            snippet_chars=int(os.getenv("SEARCH_SNIPPET_CHARS", 300)),
+            include_date=os.getenv("SEARCH_INCLUDE_DATE", "true").lower() == "true",
+            include_answer=os.getenv("SEARCH_INCLUDE_ANSWER", "true").lower() == "true",
+            max_results=int(os.getenv("SEARCH_MAX_RESULTS", 20)),
+        )
+
+
+search_projection = SearchProjection.from_env()
+
+
+def _cap(text: Optional[str], limit: int) -> Optional[str]:
+    if not text or len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def result_key(link: str) -> str:
+    """Identifies a page by its domain and path, ignoring www, queries and fragments."""
+    parts = urlsplit(link or "")
+    host = (parts.hostname or "").removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def project_result(result: dict, projection: SearchProjection) -> dict:
+    projected = {
+        "title": result.get("title"),
+        "link": result.get("link"),
+        "snippet": _cap(result.get("snippet"), projection.snippet_chars),
+    }
+    if projection.include_date and result.get("date"):
+        projected["date"] = result["date"]
+    return {key: value for key, value in projected.items() if value}
+
+
+def answer_line(response: dict, projection: SearchProjection) -> Optional[str]:
+    """Summarises the answer box or knowledge graph of a response in one line."""
+    if answer_box := response.get("answerBox"):
+        text = answer_box.get("answer") or answer_box.get("snippet")
+        if text:
+            source = f" ({answer_box['link']})" if answer_box.get("link") else ""
+            return f"Answer box: {_cap(text, projection.snippet_chars)}{source}"
+    if knowledge_graph := response.get("knowledgeGraph"):
+        text = " - ".join(
+            value
+            for value in (
+                knowledge_graph.get("title"),
+                knowledge_graph.get("type"),
+                knowledge_graph.get("description"),
+            )
+            if value
+        )
+        if text:
+            return f"Knowledge graph: {_cap(text, projection.snippet_chars)}"
+    return None
+
+
+def project_results(
+    organic: List[dict],
+    responses: List[dict] = (),
+    projection: SearchProjection = None,
+) -> list:
+    """Projects merged organic results, dropping pages that were already listed.
+
+    Args:
+        organic: The organic results, in the order they should be shown.
+        responses: The full Serper responses, for the answer box or knowledge graph.
+        projection: Defaults to the projection configured in the environment.
+
+    Returns:
+        The results to pass to the agent, preceded by at most one answer line.
+    """
+    projection = projection or search_projection
+    if not projection.enabled:
+        return organic
+    projected, seen = [], set()
+    for result in organic:
+        if not isinstance(result, dict):
+            continue
+        key = result_key(result.get("link"))
+        if key in seen:
+            continue
+        seen.add(key)
+        projected.append(project_result(result, projection))
+    projected = projected[: projection.max_results]
+    if projection.include_answer:
+        answer = next(
+            (
+                line
+                for line in (
+                    answer_line(response, projection) for response in responses
+                )
+                if line
+            ),
+            None,
+        )
+        if answer:
+            projected.insert(0, answer)
+    return projected
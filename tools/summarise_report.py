@@ -1,24 +1,41 @@
 from google.genai import types
 import os
-from clients.openai import create_openai_client
+from clients.hedging import create_chat_completion
 from typing import Union
 from langfuse.decorators import observe
 import json
 from logger import StructuredLogger
-from langfuse import Langfuse
+from clients.langfuse import langfuse
 
-langfuse = Langfuse()
-client = create_openai_client("openai")
 logger = StructuredLogger("summarise_report")
 
 
+def get_summarise_prompt(bilingual: bool, child_logger=logger):
+    """Returns the summarisation prompt, falling back to the English-only prompt if the
+    bilingual one cannot be fetched."""
+    label = os.getenv("ENVIRONMENT")
+    if bilingual:
+        try:
+            return langfuse.get_prompt("summarise_report_bilingual", label=label)
+        except Exception as e:
+            child_logger.warn(
+                "Bilingual summarise prompt unavailable, using English-only prompt",
+                error=str(e),
+            )
+    return langfuse.get_prompt("summarise_report", label=label)
+
+
 def summarise_report_factory(
     input_text: Union[str, None] = None,
     input_image_url: Union[str, None] = None,
     input_caption: Union[str, None] = None,
+    bilingual: bool = False,
 ):
     """
     Factory function that returns a summarise_report function with input_text, input_image_url, input_caption pre-set.
+
+    If bilingual is True, the note is also translated into Simplified Chinese in the same call and
+    returned as community_note_cn. Callers should fall back to translate_text when it is missing.
     """
 
     @observe()
@@ -31,7 +48,7 @@ def summarise_report_factory(
             raise ValueError(
                 "Only one of input_text or input_image_url should be provided"
             )
-        prompt = langfuse.get_prompt("summarise_report", label=os.getenv("ENVIRONMENT"))
+        prompt = get_summarise_prompt(bilingual, child_logger)
         messages = prompt.compile()
         config = prompt.config
         if input_text:
@@ -67,7 +84,8 @@ def summarise_report_factory(
             }
         )
         try:
-            response = client.chat.completions.create(
+            response = await create_chat_completion(
+                "summarise_report",
                 model=config.get("model", "gpt-4o"),
                 messages=messages,
                 temperature=config.get("temperature", 0),
@@ -91,7 +109,13 @@ def summarise_report_factory(
                 "error": "Response from summariser is not a dictionary",
             }
         if response_json.get("community_note"):
-            return {"community_note": response_json["community_note"], "success": True}
+            result = {
+                "community_note": response_json["community_note"],
+                "success": True,
+            }
+            if bilingual and response_json.get("community_note_cn"):
+                result["community_note_cn"] = response_json["community_note_cn"]
+            return result
         else:
             return {"success": False, "error": "No community note generated"}
 
@@ -1,14 +1,11 @@
 from google.genai import types
 from langfuse.decorators import observe, langfuse_context
-from clients.openai import create_openai_client
+from clients.hedging import create_chat_completion
 from logger import StructuredLogger
 from enum import Enum
-from langfuse import Langfuse
+from clients.langfuse import langfuse
 import os
 
-client = create_openai_client("openai")
-langfuse = Langfuse()
-
 
 class SupportedLanguage(Enum):
     CN = "cn"
@@ -32,7 +29,8 @@ async def translate_text(text: str, language: str = SupportedLanguage.CN.value):
         prompt = langfuse.get_prompt("translation", label=os.getenv("ENVIRONMENT"))
         messages = prompt.compile(language=language, text=text)
         config = prompt.config
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
+            "translate_text",
             model=config.get("model", "deepseek-chat"),
             temperature=config.get("temperature", 0.0),
             messages=messages,
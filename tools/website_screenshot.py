@@ -1,30 +1,23 @@
 # tools/website_screenshot.py
 
-import requests
 import os
-from google.auth.transport.requests import Request
-from google.oauth2.id_token import fetch_id_token
 from langfuse.decorators import observe
-
-
-def get_identity_token(audience: str) -> str:
-    """Fetch the identity token for Service B."""
-    request = Request()
-    id_token = fetch_id_token(request, audience)
-    return id_token
+from clients.http import http_client
+from clients.identity_tokens import identity_tokens
+from utils.url_resolver import url_resolver
 
 
 @observe()
 async def get_website_screenshot(url):
     hostname = os.environ.get("SCREENSHOT_HOSTNAME")
 
-    identity_token = get_identity_token(hostname)
+    identity_token = await identity_tokens.get_token(hostname)
     headers = {
         "Authorization": f"Bearer {identity_token}",
         "Content-Type": "application/json",
     }
-    payload = {"url": url}
-    response = requests.post(
+    payload = {"url": await url_resolver.resolve(url)}
+    response = await http_client.post(
         f"{hostname}/get-screenshot", json=payload, headers=headers
     )
 
@@ -0,0 +1,66 @@
+# utils/cache.py
+# A small in-process cache with a time to live and a size bound, for results that are
+# expensive to compute but only valid for a while, e.g. resolved URLs.
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """A least recently used cache whose entries expire after `ttl` seconds.
+
+    Safe to use from several threads. Expired entries are dropped when they are read,
+    or when the cache is full.
+
+    Args:
+        maxsize: Maximum number of entries. The least recently used entry is evicted
+            when a new one is added to a full cache.
+        ttl: Default number of seconds an entry is kept.
+        clock: Returns the current time in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None):
+        with self._lock:
+            now = self.clock()
+            self._entries[key] = (now + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                expired = [k for k, (at, _) in self._entries.items() if at <= now]
+                for k in expired:
+                    del self._entries[k]
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,180 @@
+# utils/domain_reputation.py
+# A local index of domains whose reputation is already known, e.g. government sites
+# and banks. Links to them get a verdict without a round trip to RMSE, which is only
+# asked about unknown domains.
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from logger import StructuredLogger
+
+logger = StructuredLogger("domain_reputation")
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tools",
+    "data",
+    "domain_reputation.json",
+)
+# Classification and score given to links in each list, in the format RMSE uses
+VERDICTS = {"allow": ("BENIGN", 0.0), "block": ("MALICIOUS", 1.0)}
+_VERDICT = ""  # key of the verdict in a trie node, never a domain label
+
+
+@dataclass(frozen=True)
+class DomainVerdict:
+    classification: str
+    score: float
+    matched: str  # the entry the domain matched, e.g. "gov.sg"
+    version: str  # the version of the index file
+
+    def as_result(self) -> dict:
+        return {
+            "success": True,
+            "result": {
+                "classification": self.classification,
+                "score": self.score,
+                "source": "local_index",
+                "matched_domain": self.matched,
+            },
+        }
+
+
+class DomainIndex:
+    """A suffix trie over reversed domain labels.
+
+    An entry matches the domain and all of its subdomains, and the most specific entry
+    wins, so that e.g. a blocked subdomain of an allowed domain is still blocked. A
+    lookup walks one dict per label of the host.
+    """
+
+    def __init__(self, entries: Dict[str, DomainVerdict], version: str = ""):
+        self.version = version
+        self.size = len(entries)
+        self._root = {}
+        for domain, verdict in entries.items():
+            node = self._root
+            for label in reversed(domain.split(".")):
+                node = node.setdefault(label, {})
+            node[_VERDICT] = verdict
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DomainIndex":
+        version = str(data.get("version", ""))
+        entries = {}
+        for list_name, (classification, score) in VERDICTS.items():
+            for domain in data.get(list_name) or []:
+                domain = normalise_host(domain)
+                if domain:
+                    entries[domain] = DomainVerdict(
+                        classification, score, domain, version
+                    )
+        return cls(entries, version)
+
+    @classmethod
+    def from_file(cls, path: str) -> "DomainIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def lookup(self, host: str) -> Optional[DomainVerdict]:
+        node = self._root
+        verdict = None
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            verdict = node.get(_VERDICT, verdict)
+        return verdict
+
+
+def normalise_host(host: str) -> str:
+    return host.strip().lower().rstrip(".").removeprefix("*.")
+
+
+def host_of(url: str) -> str:
+    if "://" not in url:
+        url = f"https://{url}"
+    try:
+        return normalise_host(urlsplit(url).hostname or "")
+    except ValueError:
+        return ""
+
+
+class DomainReputation:
+    """Looks up links in a `DomainIndex` loaded from a JSON file.
+
+    The file is checked for changes at most every `reload_interval` seconds, and
+    reloaded without a restart when it has changed. A file that can't be read leaves
+    the current index in place.
+
+    Args:
+        path: JSON file with a "version", and "allow" and "block" lists of domains.
+        reload_interval: Minimum seconds between checks for changes.
+        enabled: Whether to look links up at all.
+        clock: Returns the current time in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reload_interval: float = 60.0,
+        enabled: bool = True,
+        clock=time.monotonic,
+    ):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.enabled = enabled
+        self.clock = clock
+        self.index = DomainIndex({})
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        if enabled:
+            self.reload()
+
+    @classmethod
+    def from_env(cls) -> "DomainReputation":
+        return cls(
+            os.getenv("DOMAIN_REPUTATION_PATH", DEFAULT_PATH),
+            reload_interval=float(os.getenv("DOMAIN_REPUTATION_RELOAD_INTERVAL", 60)),
+            enabled=os.getenv("DOMAIN_REPUTATION_ENABLED", "true").lower() == "true",
+        )
+
+    def reload(self, force: bool = False) -> bool:
+        """Reloads the index if the file has changed. Returns whether it was."""
+        with self._lock:
+            self._next_check = self.clock() + self.reload_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime and not force:
+                    return False
+                index = DomainIndex.from_file(self.path)
+            except (OSError, ValueError) as e:
+                logger.warn(
+                    "Could not load domain reputation index",
+                    path=self.path,
+                    error=str(e),
+                )
+                return False
+            self.index, self._mtime = index, mtime
+        logger.info(
+            "Loaded domain reputation index", version=index.version, domains=index.size
+        )
+        return True
+
+    def lookup_host(self, host: str) -> Optional[DomainVerdict]:
+        if not self.enabled:
+            return None
+        if self.clock() >= self._next_check:
+            self.reload()
+        return self.index.lookup(normalise_host(host))
+
+    def lookup(self, url: str) -> Optional[DomainVerdict]:
+        """Returns the verdict for the domain of a link, or None if it is unknown."""
+        return self.lookup_host(host_of(url))
+
+
+domain_reputation = DomainReputation.from_env()
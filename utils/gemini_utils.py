@@ -1,36 +1,23 @@
-from google.cloud import storage
 from google.genai import types
-import httpx
+from utils.image_processing import load_images
 
 
-def get_image_part(image_url: str):
-    # Step 3: Define the bucket and file path
-    if image_url.startswith("gs://"):
-        gcs_path = image_url
-    else:
-        gcs_path = image_url.replace("https://storage.googleapis.com/", "gs://")
-
-    bucket_name, blob_name = gcs_path.replace("gs://", "").split("/", 1)
-
-    # Initialize the client#
-    client = storage.Client()  #
-    #
-    # Get the bucket#
-    bucket = client.bucket(bucket_name)  #
-    #
-    # Get the blob (file)#
-    blob = bucket.blob(blob_name)
-
-    # Download the blob content as bytes
-    file_content = blob.download_as_bytes()
+async def load_image_parts(image_url: str):
+    """Downloads an image and prepares it for the model, see utils/image_processing.py.
 
-    # # Step 4: Encode the file content as Base64
-    # base64_encoded_string = base64.b64encode(file_content).decode('utf-8')
+    Args:
+        image_url: The URL of the image, on GCS or elsewhere.
 
-    return types.Part.from_bytes(data=file_content, mime_type="image/jpeg")
+    Returns:
+        A list of parts, with one part per tile if the image was split into tiles.
+    """
+    return [
+        types.Part.from_bytes(data=image.data, mime_type=image.mime_type)
+        for image in await load_images(image_url)
+    ]
 
 
-def generate_image_parts(image_url: str, caption: str = None):
+async def generate_image_parts(image_url: str, caption: str = None):
     """Generates a list of parts for an image with an optional caption.
 
     Args:
@@ -40,16 +27,9 @@ def generate_image_parts(image_url: str, caption: str = None):
     Returns:
         A list of parts containing the image and caption.
     """
-    parts = []
     if image_url is None:
         raise ValueError("Image URL is required when data_type is 'image'")
-    if image_url.startswith("gs://"):
-        # parts.append(types.Part.from_uri(image_url, mime_type="image/jpeg")) #TODO: Change in future
-        parts.append(get_image_part(image_url))
-    else:
-        image = httpx.get(image_url)
-        file_content = image.content
-        parts.append(types.Part.from_bytes(data=file_content, mime_type="image/jpeg"))
+    parts = await load_image_parts(image_url)
     if caption:
         parts.append(
             types.Part.from_text(
@@ -0,0 +1,199 @@
+# utils/image_fetcher.py
+# Fetches the images the pipeline works on, from GCS or any other URL, over the shared
+# async HTTP client. Downloads are streamed and capped, their type is sniffed from
+# their first bytes, and recent images are kept in memory, since the OCR and the
+# agents often read the same image in quick succession.
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+import google.auth
+import google.auth.transport.requests
+import httpx
+from clients.http import http_client
+from metrics import IMAGE_FETCH_LATENCY, track_latency
+from utils.cache import TTLCache
+
+GCS_URL_PREFIX = "https://storage.googleapis.com/"
+GCS_ENDPOINT = "https://storage.googleapis.com"
+GCS_READ_SCOPE = "https://www.googleapis.com/auth/devstorage.read_only"
+# Leading bytes of the image formats the models accept
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+HEIF_BRANDS = {b"heic": "image/heic", b"heix": "image/heic", b"mif1": "image/heif"}
+
+
+class ImageFetchError(Exception):
+    """Raised when an image can't be downloaded, is too large, or isn't an image."""
+
+
+@dataclass(frozen=True)
+class ImageFetchConfig:
+    """Configures how images are fetched.
+
+    Attributes:
+        max_bytes: Maximum size of an image. Larger downloads are aborted.
+        timeout: Maximum seconds to fetch an image.
+        cache_size: Maximum number of recent images kept in memory.
+        cache_ttl: Seconds a fetched image is kept in memory.
+        max_cached_bytes: Images larger than this are not kept in memory.
+        gcs_endpoint: GCS endpoint to download from. Set STORAGE_EMULATOR_HOST to
+            use a local fake GCS server, which is then called without credentials.
+    """
+
+    max_bytes: int = 20_000_000
+    timeout: float = 20.0
+    cache_size: int = 32
+    cache_ttl: float = 300.0
+    max_cached_bytes: int = 5_000_000
+    gcs_endpoint: str = GCS_ENDPOINT
+
+    @classmethod
+    def from_env(cls) -> "ImageFetchConfig":
+        return cls(
+            max_bytes=int(os.getenv("IMAGE_FETCH_MAX_BYTES", 20_000_000)),
+            timeout=float(os.getenv("IMAGE_FETCH_TIMEOUT", 20.0)),
+            cache_size=int(os.getenv("IMAGE_FETCH_CACHE_SIZE", 32)),
+            cache_ttl=float(os.getenv("IMAGE_FETCH_CACHE_TTL", 300.0)),
+            gcs_endpoint=os.getenv("STORAGE_EMULATOR_HOST", GCS_ENDPOINT).rstrip("/"),
+        )
+
+
+@dataclass(frozen=True)
+class FetchedImage:
+    url: str
+    data: bytes
+    mime_type: str
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Returns the MIME type of an image from its first bytes, or None if the data
+    isn't an image in a supported format, e.g. an HTML error page."""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp":
+        return HEIF_BRANDS.get(data[8:12])
+    return None
+
+
+def parse_gcs_url(url: str) -> Optional[Tuple[str, str]]:
+    """Returns the bucket and object name of a gs:// or storage.googleapis.com URL."""
+    if url.startswith("gs://"):
+        path = url[len("gs://") :]
+    elif url.startswith(GCS_URL_PREFIX):
+        path = unquote(urlsplit(url).path.lstrip("/"))
+    else:
+        return None
+    bucket, _, name = path.partition("/")
+    return (bucket, name) if bucket and name else None
+
+
+class GcsCredentials:
+    """Access tokens for GCS from the application default credentials. Tokens are
+    refreshed on a worker thread once they expire."""
+
+    def __init__(self):
+        self._credentials = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> str:
+        with self._lock:
+            if self._credentials is None:
+                self._credentials, _ = google.auth.default(scopes=[GCS_READ_SCOPE])
+            if not self._credentials.valid:
+                self._credentials.refresh(google.auth.transport.requests.Request())
+            return self._credentials.token
+
+    async def token(self) -> str:
+        if self._credentials is not None and self._credentials.valid:
+            return self._credentials.token
+        return await asyncio.to_thread(self._refresh)
+
+
+class ImageFetcher:
+    """Fetches images over the shared HTTP client, keeping recent ones in memory."""
+
+    def __init__(self, config: ImageFetchConfig):
+        self.config = config
+        self.cache = TTLCache(config.cache_size, config.cache_ttl)
+        self.gcs_credentials = GcsCredentials()
+
+    async def _download(self, url: str, headers: dict) -> bytes:
+        async with http_client.stream(
+            "GET", url, headers=headers, follow_redirects=True
+        ) as response:
+            if response.status_code != 200:
+                raise ImageFetchError(f"HTTP {response.status_code} fetching image")
+            content_length = response.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > self.config.max_bytes:
+                raise ImageFetchError(
+                    f"Image of {content_length} bytes exceeds {self.config.max_bytes}"
+                )
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.config.max_bytes:
+                    raise ImageFetchError(
+                        f"Image exceeds {self.config.max_bytes} bytes"
+                    )
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _request_for(self, url: str) -> Tuple[str, str, dict]:
+        """Returns the source, download URL and headers for an image URL."""
+        gcs_object = parse_gcs_url(url)
+        if gcs_object is None:
+            if urlsplit(url).scheme not in ("http", "https"):
+                raise ImageFetchError(f"Unsupported image URL: {url}")
+            return "http", url, {}
+        bucket, name = gcs_object
+        download_url = (
+            f"{self.config.gcs_endpoint}/storage/v1/b/{quote(bucket, safe='')}"
+            f"/o/{quote(name, safe='')}?alt=media"
+        )
+        if self.config.gcs_endpoint != GCS_ENDPOINT:
+            return "gcs", download_url, {}
+        token = await self.gcs_credentials.token()
+        return "gcs", download_url, {"Authorization": f"Bearer {token}"}
+
+    async def fetch(self, url: str) -> FetchedImage:
+        """Downloads an image from GCS, with credentials, or from any other URL.
+
+        Raises:
+            ImageFetchError: If the image can't be downloaded within the timeout, is
+                larger than `max_bytes`, or isn't an image.
+        """
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        source, download_url, headers = await self._request_for(url)
+        with track_latency(IMAGE_FETCH_LATENCY, source=source):
+            try:
+                data = await asyncio.wait_for(
+                    self._download(download_url, headers), self.config.timeout
+                )
+            except asyncio.TimeoutError:
+                raise ImageFetchError(
+                    f"Timed out fetching image after {self.config.timeout} seconds"
+                )
+            except httpx.HTTPError as e:
+                raise ImageFetchError(f"{type(e).__name__} fetching image: {e}") from e
+        mime_type = sniff_mime_type(data)
+        if mime_type is None:
+            raise ImageFetchError("The URL does not point to a supported image")
+        image = FetchedImage(url, data, mime_type)
+        if len(data) <= self.config.max_cached_bytes:
+            self.cache.set(url, image)
+        return image
+
+
+image_fetcher = ImageFetcher(ImageFetchConfig.from_env())
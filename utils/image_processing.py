@@ -0,0 +1,225 @@
+# utils/image_processing.py
+# Prepares images before they enter the context of a model. Screenshots and user
+# images are resent on every later turn of the agent, so they are downscaled and
+# recompressed once, and tall pages can be split into readable tiles instead of
+# being shrunk to a thin strip.
+import asyncio
+import base64
+import io
+import os
+from dataclasses import dataclass, replace
+from typing import List
+from PIL import Image, ImageOps, UnidentifiedImageError
+from logger import StructuredLogger
+from utils.image_fetcher import image_fetcher
+
+logger = StructuredLogger("image_processing")
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "HEIC": "image/heic",
+    "HEIF": "image/heif",
+}
+# Formats that both Gemini and OpenAI accept as they are
+PASSTHROUGH_FORMATS = ("JPEG", "PNG", "WEBP")
+MIN_QUALITY = 40
+
+
+@dataclass(frozen=True)
+class ImageProcessingConfig:
+    """Configures how images are prepared for the models.
+
+    Attributes:
+        enabled: Whether to preprocess images. If not, images are passed on as they
+            were downloaded.
+        max_dimension: Maximum width and height of an image that is not tiled.
+        max_bytes: Maximum size of each encoded image. The quality, then the
+            dimensions, are reduced until the image fits.
+        quality: JPEG quality to recompress images with.
+        tile_tall_images: Whether to split images taller than `tile_aspect_ratio`
+            times their width into tiles, e.g. full-page screenshots.
+        tile_aspect_ratio: Height to width ratio above which an image is tiled.
+        tile_dimension: Maximum width and height of each tile. 768 is the tile size
+            of Gemini, so each tile costs the minimum number of tokens.
+        max_tiles: Maximum number of tiles per image. The rest of the image is
+            dropped, since the top of a page usually matters most.
+    """
+
+    enabled: bool = True
+    max_dimension: int = 1536
+    max_bytes: int = 1_000_000
+    quality: int = 80
+    tile_tall_images: bool = False
+    tile_aspect_ratio: float = 2.0
+    tile_dimension: int = 768
+    max_tiles: int = 4
+
+    @classmethod
+    def from_env(cls) -> "ImageProcessingConfig":
+        return cls(
+            enabled=os.getenv("IMAGE_PREPROCESSING_ENABLED", "true").lower() == "true",
+            max_dimension=int(os.getenv("IMAGE_MAX_DIMENSION", 1536)),
+            max_bytes=int(os.getenv("IMAGE_MAX_BYTES", 1_000_000)),
+            quality=int(os.getenv("IMAGE_QUALITY", 80)),
+            tile_tall_images=os.getenv("IMAGE_TILE_TALL_IMAGES", "false").lower()
+            == "true",
+            tile_dimension=int(os.getenv("IMAGE_TILE_DIMENSION", 768)),
+            max_tiles=int(os.getenv("IMAGE_MAX_TILES", 4)),
+        )
+
+
+image_processing_config = ImageProcessingConfig.from_env()
+
+
+@dataclass(frozen=True)
+class ProcessedImage:
+    data: bytes
+    mime_type: str
+    width: int = 0
+    height: int = 0
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode()}"
+
+
+def detect_mime_type(data: bytes, default: str = "image/jpeg") -> str:
+    """Returns the MIME type of an image from its contents."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return MIME_TYPES.get(image.format, default)
+    except (UnidentifiedImageError, OSError):
+        return default
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _split_into_tiles(image: Image.Image, config: ImageProcessingConfig):
+    width, height = image.size
+    if not config.tile_tall_images or height <= config.tile_aspect_ratio * width:
+        return [image]
+    tile_height = width
+    return [
+        image.crop((0, top, width, min(top + tile_height, height)))
+        for top in range(0, height, tile_height)[: config.max_tiles]
+    ]
+
+
+def _save(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        image.save(buffer, format="PNG")
+    else:
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _encode(
+    image: Image.Image, config: ImageProcessingConfig, lossless_source: bool
+) -> ProcessedImage:
+    """Encodes a downscaled image as JPEG, or as PNG if the source was lossless and
+    PNG is smaller, as for flat page screenshots, reducing quality then dimensions
+    until it fits in `max_bytes`."""
+    image = image.copy()
+    image.thumbnail((config.max_dimension, config.max_dimension))
+    quality = config.quality
+    while True:
+        candidates = [("JPEG", _save(image, "JPEG", quality))]
+        if lossless_source:
+            candidates.append(("PNG", _save(image, "PNG", quality)))
+        image_format, data = min(candidates, key=lambda candidate: len(candidate[1]))
+        if len(data) <= config.max_bytes or min(image.size) <= 64:
+            return ProcessedImage(data, MIME_TYPES[image_format], *image.size)
+        if quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - 15)
+        else:
+            image = image.resize(
+                (int(image.width * 0.75), int(image.height * 0.75)),
+                Image.Resampling.LANCZOS,
+            )
+
+
+def preprocess_image(
+    data: bytes,
+    config: ImageProcessingConfig = None,
+    mime_type: str = "image/jpeg",
+) -> List[ProcessedImage]:
+    """Downscales and recompresses an image, splitting tall images into tiles if
+    enabled. Images that are already small enough are returned as they are, and data
+    that can't be decoded, e.g. HEIC without a plugin, is returned with `mime_type`.
+
+    Args:
+        data: The encoded image.
+        config: Defaults to the configuration from the environment.
+        mime_type: The type of the image, as sniffed when it was fetched.
+
+    Returns:
+        The images to send to the model, in order.
+    """
+    config = config or image_processing_config
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            image = ImageOps.exif_transpose(image)
+            width, height = image.size
+            tiles = _split_into_tiles(image, config)
+            if (
+                len(tiles) == 1
+                and image_format in PASSTHROUGH_FORMATS
+                and max(width, height) <= config.max_dimension
+                and len(data) <= config.max_bytes
+            ):
+                return [ProcessedImage(data, MIME_TYPES[image_format], width, height)]
+            lossless_source = image_format not in ("JPEG", "WEBP")
+            return [
+                _encode(
+                    _to_rgb(tile),
+                    (
+                        replace(config, max_dimension=config.tile_dimension)
+                        if len(tiles) > 1
+                        else config
+                    ),
+                    lossless_source,
+                )
+                for tile in tiles
+            ]
+    except (UnidentifiedImageError, OSError):
+        return [ProcessedImage(data, mime_type)]
+
+
+async def load_images(
+    image_url: str, config: ImageProcessingConfig = None
+) -> List[ProcessedImage]:
+    """Downloads an image and prepares it for the models."""
+    config = config or image_processing_config
+    image = await image_fetcher.fetch(image_url)
+    if not config.enabled:
+        return [ProcessedImage(image.data, image.mime_type)]
+    return await asyncio.to_thread(
+        preprocess_image, image.data, config, image.mime_type
+    )
+
+
+async def openai_image_parts(image_url: str) -> List[dict]:
+    """Returns the image_url content parts for an image, sent inline as data URLs.
+
+    If the image can't be loaded, OpenAI fetches it from its URL instead.
+    """
+    try:
+        images = await load_images(image_url)
+        return [
+            {"type": "image_url", "image_url": {"url": image.data_url}}
+            for image in images
+        ]
+    except Exception as e:
+        logger.warn("Failed to load image", image_url=image_url, error=str(e))
+    return [{"type": "image_url", "image_url": {"url": image_url}}]
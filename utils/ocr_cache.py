@@ -0,0 +1,167 @@
+# utils/ocr_cache.py
+# Caches OCR results by image. The same screenshot is often forwarded by many users,
+# so images are matched by a hash of their exact contents. Near-duplicates, e.g. the
+# same screenshot recompressed or cropped, are deliberately not matched: scam
+# screenshots often share a template and differ only in a link or phone number,
+# which a perceptual hash can't see, and reusing the wrong OCR result is worse than
+# running OCR again.
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from logger import StructuredLogger
+from metrics import OCR_CACHE_LOOKUPS
+from utils.cache import TTLCache
+
+logger = StructuredLogger("ocr_cache")
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "checkmate-ocr-cache.sqlite3")
+
+
+@dataclass(frozen=True)
+class OcrCacheConfig:
+    """Configures the OCR result cache.
+
+    Attributes:
+        enabled: Whether to cache OCR results.
+        ttl: Seconds an OCR result is kept.
+        maxsize: Maximum number of images cached, in memory and on disk.
+        path: SQLite file the cache is persisted to, so it survives restarts. Empty
+            to keep the cache in memory only.
+    """
+
+    enabled: bool = True
+    ttl: float = 7 * 24 * 3600.0
+    maxsize: int = 5000
+    path: str = DEFAULT_PATH
+
+    @classmethod
+    def from_env(cls) -> "OcrCacheConfig":
+        return cls(
+            enabled=os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true",
+            ttl=float(os.getenv("OCR_CACHE_TTL", 7 * 24 * 3600.0)),
+            maxsize=int(os.getenv("OCR_CACHE_SIZE", 5000)),
+            path=os.getenv("OCR_CACHE_PATH", DEFAULT_PATH),
+        )
+
+
+class SqliteOcrStore:
+    """Persists cached OCR results in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                "content_hash TEXT PRIMARY KEY, "
+                "result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def load(self, now: float) -> List[Tuple[str, dict, float]]:
+        """Returns the unexpired entries, oldest first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT content_hash, result, expires_at "
+                "FROM ocr_results WHERE expires_at > ? ORDER BY expires_at",
+                (now,),
+            ).fetchall()
+        return [
+            (content_hash, json.loads(result), expires_at)
+            for content_hash, result, expires_at in rows
+        ]
+
+    def save(self, key: str, result: dict, now: float, expires_at: float, maxsize: int):
+        """Saves an entry, dropping expired entries and the oldest beyond maxsize."""
+        with self._lock, self._connection:
+            # Columns are named since caches written by earlier versions have an
+            # extra perceptual_hash column
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ocr_results "
+                "(content_hash, result, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result), expires_at),
+            )
+            self._connection.execute(
+                "DELETE FROM ocr_results WHERE expires_at <= ? OR content_hash NOT IN "
+                "(SELECT content_hash FROM ocr_results "
+                "ORDER BY expires_at DESC LIMIT ?)",
+                (now, maxsize),
+            )
+
+
+class OcrCache:
+    """Caches validated OCR results by the SHA-256 of an image's contents, in memory
+    and optionally on disk.
+
+    Args:
+        config: Defaults to the configuration from the environment.
+        clock: Returns the current time in seconds. Defaults to time.time, since
+            expiry times are persisted.
+    """
+
+    def __init__(self, config: OcrCacheConfig = None, clock=time.time):
+        self.config = config or OcrCacheConfig.from_env()
+        self.clock = clock
+        self.entries = TTLCache(self.config.maxsize, self.config.ttl, clock=clock)
+        self.store = None
+        if self.config.enabled and self.config.path:
+            try:
+                self.store = SqliteOcrStore(self.config.path)
+                self._load()
+            except sqlite3.Error as e:
+                logger.warn(
+                    "Could not open OCR cache, caching in memory only",
+                    path=self.config.path,
+                    error=str(e),
+                )
+                self.store = None
+
+    def _load(self):
+        now = self.clock()
+        for key, result, expires_at in self.store.load(now):
+            self.entries.set(key, result, ttl=expires_at - now)
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns a copy of the cached result for an image, or None."""
+        if not self.config.enabled:
+            return None
+        result = self.entries.get(key)
+        if result is None:
+            OCR_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+        OCR_CACHE_LOOKUPS.labels(result="hit").inc()
+        return dict(result)
+
+    def lookup(self, data: bytes) -> Tuple[str, Optional[dict]]:
+        """Hashes an image and returns its key and cached result, if any. Hashing
+        large images takes a few milliseconds, so run it off the event loop."""
+        key = self.key(data)
+        return key, self.get(key)
+
+    def set(self, key: str, result: dict):
+        """Caches a validated OCR result. Writes to disk, so run it off the event
+        loop."""
+        if not self.config.enabled:
+            return
+        self.entries.set(key, dict(result))
+        if self.store is not None:
+            now = self.clock()
+            try:
+                self.store.save(
+                    key, result, now, now + self.config.ttl, self.config.maxsize
+                )
+            except sqlite3.Error as e:
+                logger.warn("Could not persist OCR result", error=str(e))
+
+
+ocr_cache = OcrCache()
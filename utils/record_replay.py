@@ -0,0 +1,407 @@
+# utils/record_replay.py
+# Records the outbound calls made by the pipeline (LLM providers, Serper, RMSE, the
+# screenshot service, Langfuse prompts, GCS and Firestore writes) into a cassette
+# file, and serves them back without network access.
+#
+# HTTP calls are intercepted at the transport level of requests and httpx, which
+# covers every client used by the pipeline. Firestore, which uses gRPC, is
+# intercepted at clients.firestore_db.get_db.
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import google.auth
+import httpx
+import requests
+from google.auth.credentials import AnonymousCredentials
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import clients.firestore_db as firestore_db
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Langfuse trace ingestion runs in the background and is not part of the pipeline
+IGNORED_PATHS = ("/api/public/ingestion",)
+IGNORED_RESPONSE = {"successes": [], "errors": []}
+# Query parameters that carry credentials are neither stored nor matched on
+SECRET_QUERY_PARAMS = ("key", "api_key")
+# Bodies are stored decoded, so these no longer describe them
+DROPPED_HEADERS = (
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+    "connection",
+    "set-cookie",
+)
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def normalise_url(url: str) -> str:
+    parts = urlsplit(str(url))
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in SECRET_QUERY_PARAMS
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def hash_body(body) -> str:
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def encode_body(content: bytes) -> dict:
+    try:
+        return {"body": content.decode("utf-8"), "body_encoding": "utf-8"}
+    except UnicodeDecodeError:
+        return {
+            "body": base64.b64encode(content).decode("ascii"),
+            "body_encoding": "base64",
+        }
+
+
+def decode_body(interaction: dict) -> bytes:
+    if interaction.get("body_encoding") == "base64":
+        return base64.b64decode(interaction["body"])
+    return interaction["body"].encode("utf-8")
+
+
+def is_ignored(url: str) -> bool:
+    return any(path in urlsplit(str(url)).path for path in IGNORED_PATHS)
+
+
+class Cassette:
+    """The recorded interactions of one or more pipeline runs.
+
+    In replay mode, a request is served by the first unused interaction with the
+    same method, URL and body. If there is none, e.g. because the body contains the
+    current date, it is served by the next unused interaction with the same method
+    and URL, so that runs are replayed in their recorded order.
+
+    `metadata` holds free-form information about the recorded run, e.g. its inputs.
+
+    Args:
+        path: The JSON file to record to or replay from.
+        mode: Either "record" or "replay".
+        latency_scale: In replay mode, the recorded latency of each interaction is
+            multiplied by this before responding. Use 0 to respond immediately.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, latency_scale: float = 1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unsupported cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.metadata = {}
+        self.interactions = []
+        self.documents = []
+        self.recorded_documents = []
+        self._used = set()
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            with open(path) as f:
+                data = json.load(f)
+            self.metadata = data.get("metadata", {})
+            self.interactions = data.get("interactions", [])
+            self.recorded_documents = data.get("documents", [])
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(
+                {
+                    "metadata": self.metadata,
+                    "interactions": self.interactions,
+                    "documents": self.documents,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+                default=str,
+            )
+
+    def record(self, method, url, body, status, headers, content, duration):
+        interaction = {
+            "method": method.upper(),
+            "url": normalise_url(url),
+            "request_hash": hash_body(body),
+            "status": status,
+            "headers": {
+                key: value
+                for key, value in headers.items()
+                if key.lower() not in DROPPED_HEADERS
+            },
+            **encode_body(content),
+            "duration": duration,
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def find(self, method: str, url: str, body) -> dict:
+        method, url, request_hash = method.upper(), normalise_url(url), hash_body(body)
+        with self._lock:
+            candidates = [
+                index
+                for index, interaction in enumerate(self.interactions)
+                if index not in self._used
+                and interaction["method"] == method
+                and interaction["url"] == url
+            ]
+            if not candidates:
+                raise CassetteMiss(f"No recorded response for {method} {url}")
+            index = next(
+                (
+                    index
+                    for index in candidates
+                    if self.interactions[index]["request_hash"] == request_hash
+                ),
+                candidates[0],
+            )
+            self._used.add(index)
+            return self.interactions[index]
+
+    def record_document(self, collection: str, document_id: str, data: dict):
+        with self._lock:
+            self.documents.append(
+                {"collection": collection, "document_id": document_id, "data": data}
+            )
+
+    def replay_delay(self, interaction: dict) -> float:
+        return interaction.get("duration", 0) * self.latency_scale
+
+
+class RecordingDocument:
+    def __init__(self, cassette, collection, document_id, document=None):
+        self.cassette = cassette
+        self.collection = collection
+        self.document_id = document_id
+        self.document = document
+
+    def set(self, data: dict):
+        self.cassette.record_document(self.collection, self.document_id, data)
+        if self.document is not None:
+            return self.document.set(data)
+
+
+class RecordingCollection:
+    def __init__(self, cassette, name, collection=None):
+        self.cassette = cassette
+        self.name = name
+        self.collection = collection
+
+    def document(self, document_id: str):
+        document = (
+            self.collection.document(document_id)
+            if self.collection is not None
+            else None
+        )
+        return RecordingDocument(self.cassette, self.name, document_id, document)
+
+
+class RecordingDatabase:
+    """Captures Firestore writes, forwarding them to the database when recording."""
+
+    def __init__(self, cassette, db=None):
+        self.cassette = cassette
+        self.db = db
+
+    def collection(self, name: str):
+        collection = self.db.collection(name) if self.db is not None else None
+        return RecordingCollection(self.cassette, name, collection)
+
+    def batch(self):
+        return RecordingBatch(self.cassette, self.db.batch() if self.db else None)
+
+
+class RecordingBatch:
+    """Captures the writes of a batch, forwarding them to the database when
+    recording."""
+
+    def __init__(self, cassette, batch=None):
+        self.cassette = cassette
+        self.batch = batch
+
+    def set(self, document: RecordingDocument, data: dict):
+        self.cassette.record_document(document.collection, document.document_id, data)
+        if self.batch is not None:
+            self.batch.set(document.document, data)
+
+    def commit(self):
+        if self.batch is not None:
+            return self.batch.commit()
+
+
+def _requests_response(interaction: dict, request) -> requests.Response:
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response._content = decode_body(interaction)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def _httpx_response(interaction: dict, request) -> httpx.Response:
+    return httpx.Response(
+        interaction["status"],
+        headers=interaction["headers"],
+        content=decode_body(interaction),
+        request=request,
+    )
+
+
+def _ignored_interaction() -> dict:
+    return {
+        "status": 200,
+        "headers": {"content-type": "application/json"},
+        **encode_body(json.dumps(IGNORED_RESPONSE).encode("utf-8")),
+        "duration": 0,
+    }
+
+
+def _patch_requests(cassette: Cassette):
+    original_send = HTTPAdapter.send
+
+    def send(adapter, request, *args, **kwargs):
+        if cassette.mode == REPLAY:
+            if is_ignored(request.url):
+                return _requests_response(_ignored_interaction(), request)
+            interaction = cassette.find(request.method, request.url, request.body)
+            time.sleep(cassette.replay_delay(interaction))
+            return _requests_response(interaction, request)
+        start_time = time.perf_counter()
+        response = original_send(adapter, request, *args, **kwargs)
+        if not is_ignored(request.url):
+            cassette.record(
+                request.method,
+                request.url,
+                request.body,
+                response.status_code,
+                response.headers,
+                response.content,
+                time.perf_counter() - start_time,
+            )
+        return response
+
+    HTTPAdapter.send = send
+    return lambda: setattr(HTTPAdapter, "send", original_send)
+
+
+def _patch_httpx(cassette: Cassette):
+    original_handle = httpx.HTTPTransport.handle_request
+    original_handle_async = httpx.AsyncHTTPTransport.handle_async_request
+
+    def handle_request(transport, request):
+        if cassette.mode == REPLAY:
+            if is_ignored(request.url):
+                return _httpx_response(_ignored_interaction(), request)
+            interaction = cassette.find(request.method, request.url, request.read())
+            time.sleep(cassette.replay_delay(interaction))
+            return _httpx_response(interaction, request)
+        start_time = time.perf_counter()
+        response = original_handle(transport, request)
+        if not is_ignored(request.url):
+            content = response.read()
+            cassette.record(
+                request.method,
+                request.url,
+                request.read(),
+                response.status_code,
+                response.headers,
+                content,
+                time.perf_counter() - start_time,
+            )
+        return response
+
+    async def handle_async_request(transport, request):
+        if cassette.mode == REPLAY:
+            if is_ignored(request.url):
+                return _httpx_response(_ignored_interaction(), request)
+            interaction = cassette.find(
+                request.method, request.url, await request.aread()
+            )
+            await asyncio.sleep(cassette.replay_delay(interaction))
+            return _httpx_response(interaction, request)
+        start_time = time.perf_counter()
+        response = await original_handle_async(transport, request)
+        if not is_ignored(request.url):
+            content = await response.aread()
+            cassette.record(
+                request.method,
+                request.url,
+                await request.aread(),
+                response.status_code,
+                response.headers,
+                content,
+                time.perf_counter() - start_time,
+            )
+        return response
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+    def restore():
+        httpx.HTTPTransport.handle_request = original_handle
+        httpx.AsyncHTTPTransport.handle_async_request = original_handle_async
+
+    return restore
+
+
+def _patch_firestore(cassette: Cassette):
+    original_get_db = firestore_db.get_db
+    if cassette.mode == REPLAY:
+        firestore_db.get_db = lambda: RecordingDatabase(cassette)
+    else:
+        firestore_db.get_db = lambda: RecordingDatabase(cassette, original_get_db())
+    return lambda: setattr(firestore_db, "get_db", original_get_db)
+
+
+def _patch_google_auth(cassette: Cassette):
+    """Lets Google clients be created without credentials when replaying."""
+    original_default = google.auth.default
+    if cassette.mode == REPLAY:
+        google.auth.default = lambda *args, **kwargs: (
+            AnonymousCredentials(),
+            "replay",
+        )
+    return lambda: setattr(google.auth, "default", original_default)
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = REPLAY, latency_scale: float = 1.0):
+    """Records or replays every outbound call made within the block.
+
+    In record mode, the cassette is saved when the block exits. In replay mode, the
+    Firestore documents written within the block are available as
+    `cassette.documents`, and the recorded ones as `cassette.recorded_documents`.
+    """
+    cassette = Cassette(path, mode, latency_scale)
+    restores = [
+        patch(cassette)
+        for patch in (
+            _patch_requests,
+            _patch_httpx,
+            _patch_firestore,
+            _patch_google_auth,
+        )
+    ]
+    try:
+        yield cassette
+    finally:
+        for restore in reversed(restores):
+            restore()
+        if mode == RECORD:
+            cassette.save()
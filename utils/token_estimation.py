@@ -0,0 +1,99 @@
+import json
+import math
+from typing import List, Union
+from google.genai import types
+
+# Rough heuristics, good enough to compare prompt sizes before and after a change.
+# They are not a substitute for the providers' own usage figures.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+OPENAI_IMAGE_TOKENS = 765  # high detail 1024x1024 image, see OpenAI vision pricing
+GEMINI_IMAGE_TOKENS = 258  # flat per-image cost for Gemini 2.0 models
+
+
+def estimate_text_tokens(text: Union[str, None]) -> int:
+    """Estimates the number of tokens in a string."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_openai_image_tokens(width: int, height: int) -> int:
+    """Estimates the tokens of a high detail image sent to OpenAI. The image is scaled
+    to fit in 2048x2048, then its shortest side to 768, and costs 170 tokens per
+    512x512 tile plus 85."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
+
+
+def estimate_gemini_image_tokens(width: int, height: int) -> int:
+    """Estimates the tokens of an image sent to Gemini 2.0. Images up to 384x384 cost
+    258 tokens, larger ones 258 tokens per 768x768 tile."""
+    if width <= 384 and height <= 384:
+        return GEMINI_IMAGE_TOKENS
+    return GEMINI_IMAGE_TOKENS * math.ceil(width / 768) * math.ceil(height / 768)
+
+
+def _estimate_json_tokens(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return estimate_text_tokens(value)
+    return estimate_text_tokens(json.dumps(value, default=str))
+
+
+def estimate_openai_message_tokens(messages: List[dict]) -> int:
+    """Estimates the input tokens of an OpenAI-style chat completion request.
+
+    Args:
+        messages: The list of messages sent to the chat completions API.
+
+    Returns:
+        The estimated number of input tokens.
+    """
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_text_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    total += OPENAI_IMAGE_TOKENS
+                else:
+                    total += estimate_text_tokens(part.get("text"))
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            total += estimate_text_tokens(function.get("name"))
+            total += estimate_text_tokens(function.get("arguments"))
+    return total
+
+
+def estimate_gemini_content_tokens(contents: List[types.Content]) -> int:
+    """Estimates the input tokens of a Gemini generate_content request.
+
+    Args:
+        contents: The list of contents sent to the Gemini API.
+
+    Returns:
+        The estimated number of input tokens.
+    """
+    total = 0
+    for content in contents:
+        total += MESSAGE_OVERHEAD_TOKENS
+        for part in content.parts or []:
+            if part.inline_data is not None or part.file_data is not None:
+                total += GEMINI_IMAGE_TOKENS
+            elif part.text is not None:
+                total += estimate_text_tokens(part.text)
+            elif part.function_call is not None:
+                total += estimate_text_tokens(part.function_call.name)
+                total += _estimate_json_tokens(part.function_call.args)
+            elif part.function_response is not None:
+                total += estimate_text_tokens(part.function_response.name)
+                total += _estimate_json_tokens(part.function_response.response)
+    return total
@@ -0,0 +1,247 @@
+# utils/url_resolver.py
+# Expands short links and strips tracking parameters, so that the tools see the
+# destination of a link, and links to the same page reached in different ways share
+# cache entries.
+import asyncio
+import ipaddress
+import os
+import socket
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional
+from urllib.parse import unquote_plus, urljoin, urlsplit, urlunsplit
+import httpx
+from clients.http import http_client
+from logger import StructuredLogger
+from utils.cache import TTLCache
+
+logger = StructuredLogger("url_resolver")
+
+SHORTENER_HOSTS = frozenset(
+    {
+        "bit.ly",
+        "bitly.com",
+        "buff.ly",
+        "cutt.ly",
+        "go.gov.sg",
+        "goo.gl",
+        "is.gd",
+        "lnkd.in",
+        "ow.ly",
+        "rb.gy",
+        "rebrand.ly",
+        "s.id",
+        "shorturl.at",
+        "t.co",
+        "t.ly",
+        "tiny.cc",
+        "tinyurl.com",
+    }
+)
+TRACKING_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "dclid",
+        "gbraid",
+        "wbraid",
+        "msclkid",
+        "yclid",
+        "igshid",
+        "mc_cid",
+        "mc_eid",
+        "_ga",
+        "_gl",
+        "ref_src",
+        "spm",
+    }
+)
+TRACKING_PREFIXES = ("utm_",)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Some servers don't implement HEAD, in which case the request is retried with GET
+HEAD_UNSUPPORTED_STATUSES = (400, 403, 404, 405, 501)
+BLOCKED_HOSTS = ("localhost", "metadata.google.internal")
+
+
+@dataclass(frozen=True)
+class UrlResolverConfig:
+    """Configures how links are resolved.
+
+    Attributes:
+        max_hops: Maximum number of redirects followed.
+        timeout: Maximum seconds spent resolving a link.
+        cache_ttl: Seconds a resolved link is cached.
+        error_cache_ttl: Seconds a link that could not be fully resolved is cached,
+            so that a transient failure isn't remembered for long. 0 to not cache
+            such links.
+        cache_size: Maximum number of resolved links cached.
+        shortener_hosts: Hosts whose links are expanded. Links to other hosts are
+            only canonicalised, without a request, unless `resolve_all` is set.
+        resolve_all: Whether to follow redirects of every link.
+        allow_private_hosts: Whether to follow links to private, loopback and
+            link-local addresses. Only for tests.
+    """
+
+    max_hops: int = 5
+    timeout: float = 5.0
+    cache_ttl: float = 3600.0
+    error_cache_ttl: float = 30.0
+    cache_size: int = 4096
+    shortener_hosts: FrozenSet[str] = field(default=SHORTENER_HOSTS)
+    resolve_all: bool = False
+    allow_private_hosts: bool = False
+
+    @classmethod
+    def from_env(cls) -> "UrlResolverConfig":
+        extra_hosts = os.getenv("URL_RESOLVER_SHORTENER_HOSTS", "")
+        return cls(
+            max_hops=int(os.getenv("URL_RESOLVER_MAX_HOPS", 5)),
+            timeout=float(os.getenv("URL_RESOLVER_TIMEOUT", 5.0)),
+            cache_ttl=float(os.getenv("URL_RESOLVER_CACHE_TTL", 3600.0)),
+            error_cache_ttl=float(os.getenv("URL_RESOLVER_ERROR_CACHE_TTL", 30.0)),
+            cache_size=int(os.getenv("URL_RESOLVER_CACHE_SIZE", 4096)),
+            shortener_hosts=SHORTENER_HOSTS
+            | {host.strip() for host in extra_hosts.split(",") if host.strip()},
+            resolve_all=os.getenv("URL_RESOLVER_RESOLVE_ALL", "false").lower()
+            == "true",
+        )
+
+
+def _is_tracking(segment: str) -> bool:
+    key = unquote_plus(segment.partition("=")[0]).lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalise_url(url: str) -> str:
+    """Returns a canonical form of a URL: with a scheme, a lowercase host, no fragment
+    or tracking parameters, and at least "/" as path. The rest of the URL is kept as
+    given, since servers may treat e.g. "?a" and "?a=" differently."""
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    userinfo, at, host_and_port = parts.netloc.rpartition("@")
+    query = "&".join(
+        segment for segment in parts.query.split("&") if not _is_tracking(segment)
+    )
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            f"{userinfo}{at}{host_and_port.lower()}",
+            parts.path or "/",
+            query,
+            "",
+        )
+    )
+
+
+async def _is_private_host(host: str) -> bool:
+    """Returns whether a host is, or resolves to, a private, loopback or link-local
+    address.
+
+    Raises:
+        socket.gaierror: If the host can't be resolved.
+    """
+    if host in BLOCKED_HOSTS:
+        return True
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, type=socket.SOCK_STREAM
+        )
+        # IPv6 addresses may carry a scope, e.g. fe80::1%eth0
+        addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    return any(
+        address.is_private or address.is_loopback or address.is_link_local
+        for address in addresses
+    )
+
+
+@dataclass
+class ResolvedUrl:
+    url: str  # the canonical destination
+    hops: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class UrlResolver:
+    """Resolves links to their canonical destination, caching the results."""
+
+    def __init__(self, config: UrlResolverConfig):
+        self.config = config
+        self.cache = TTLCache(config.cache_size, config.cache_ttl)
+
+    def is_shortener(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return host.removeprefix("www.") in self.config.shortener_hosts
+
+    def should_follow(self, url: str) -> bool:
+        return self.config.resolve_all or self.is_shortener(url)
+
+    async def _request(self, url: str) -> httpx.Response:
+        response = await http_client.request(
+            "HEAD", url, follow_redirects=False, timeout=self.config.timeout
+        )
+        if response.status_code in HEAD_UNSUPPORTED_STATUSES:
+            response = await http_client.request(
+                "GET", url, follow_redirects=False, timeout=self.config.timeout
+            )
+        return response
+
+    async def _follow(self, url: str, resolved: ResolvedUrl):
+        for _ in range(self.config.max_hops):
+            host = urlsplit(url).hostname or ""
+            if not self.config.allow_private_hosts and await _is_private_host(host):
+                resolved.error = f"Not following link to private host {host}"
+                return
+            response = await self._request(url)
+            location = response.headers.get("location")
+            if response.status_code not in REDIRECT_STATUSES or not location:
+                return
+            url = canonicalise_url(urljoin(url, location))
+            resolved.url = url
+            resolved.hops.append(url)
+        resolved.error = f"Stopped after {self.config.max_hops} redirects"
+
+    async def resolve_details(self, url: str) -> ResolvedUrl:
+        """Resolves a link, returning the redirects followed and any error.
+
+        On errors and timeouts, the last URL reached is returned.
+        """
+        try:
+            canonical = canonicalise_url(url)
+        except ValueError as e:  # e.g. an unterminated IPv6 address
+            return ResolvedUrl(url, error=f"{type(e).__name__}: {e}")
+        cached = self.cache.get(canonical)
+        if cached is not None:
+            return cached
+        resolved = ResolvedUrl(canonical)
+        if self.should_follow(canonical):
+            try:
+                await asyncio.wait_for(
+                    self._follow(canonical, resolved), self.config.timeout
+                )
+            except (
+                asyncio.TimeoutError,
+                httpx.HTTPError,
+                httpx.InvalidURL,
+                socket.gaierror,
+                ValueError,  # a malformed Location header
+            ) as e:
+                resolved.error = f"{type(e).__name__}: {e}"
+            if resolved.error:
+                logger.info(
+                    "Could not fully resolve link", url=canonical, error=resolved.error
+                )
+        if not resolved.error:
+            self.cache.set(canonical, resolved)
+        elif self.config.error_cache_ttl > 0:
+            self.cache.set(canonical, resolved, ttl=self.config.error_cache_ttl)
+        return resolved
+
+    async def resolve(self, url: str) -> str:
+        """Returns the canonical destination of a link."""
+        return (await self.resolve_details(url)).url
+
+
+url_resolver = UrlResolver(UrlResolverConfig.from_env())